@@ -53,15 +53,20 @@ def read_measurement(conn) -> Optional[Tuple[float, str]]:
     Returns a tuple (timestamp, payload) or ``None`` if no full line was
     available yet.
     """
-    raw = conn.readline()
-    if not raw:
+    decoded = parse_line(conn.readline())
+    if decoded is None:
         return None
 
-    decoded = raw.decode("utf-8", errors="replace").strip()
-    if not decoded:
+    return time.time(), decoded
+
+
+def parse_line(raw: bytes) -> Optional[str]:
+    """Decode one raw serial line; ``None`` for empty lines."""
+    if not raw:
         return None
 
-    return time.time(), decoded
+    decoded = raw.decode("utf-8", errors="replace").strip()
+    return decoded or None
 
 
 def iter_measurements(**kwargs):
@@ -4,9 +4,11 @@ import time
 import csv
 from datetime import datetime
 from math import atan2, sqrt, degrees
-from typing import Optional
+from typing import List, Optional, Tuple
 
-import RPi.GPIO as GPIO
+import imu_batch
+import zero_accel_gpio
+from flight_events import FlightEventDetector
 
 #--Constantes
 I2C_BUS = 1
@@ -19,13 +21,27 @@ ALPHA_FUSION = 0.96
 SMOOTHING = 0.9         
 DT_SLEEP = 0.05         
 
-#--Config de la aceleracion
-TOLERANCE = 0.04   
-QUIET_DELAY = 1.0
-GPIO_PIN = 25 
-GPIO_SECOND_PIN = 7
-GPIO_ACTIVATED_MSG = f"\033[31m[GPIO {GPIO_PIN} ACTIVADO]\033[0m"
-GPIO_SECOND_ACTIVATED_MSG = f"\033[31m[GPIO {GPIO_SECOND_PIN} ACTIVADO]\033[0m"
+#--Registros para lectura en bloque y FIFO
+REG_SMPLRT_DIV = 0x19
+REG_CONFIG = 0x1A
+REG_FIFO_EN = 0x23
+REG_INT_STATUS = 0x3A
+REG_ACCEL_XOUT_H = 0x3B
+REG_TEMP_OUT_H = 0x41
+REG_USER_CTRL = 0x6A
+REG_FIFO_COUNT_H = 0x72
+REG_FIFO_R_W = 0x74
+FIFO_EN_ACCEL_GYRO = 0x78   # XG | YG | ZG | ACCEL
+USER_CTRL_FIFO_EN = 0x40
+USER_CTRL_FIFO_RESET = 0x04
+INT_FIFO_OFLOW = 0x10
+FIFO_SIZE = 1024
+FIFO_SAMPLE_BYTES = 12      # accel XYZ + gyro XYZ, 16 bits c/u
+FIFO_CHUNK = 24             # SMBus limita los bloques a 32 bytes; 2 muestras completas
+DLPF_CFG = 1                # 188 Hz; con DLPF el reloj base es 1 kHz
+
+#--Deteccion de eventos: mismas reglas y GPIO que el agregador (flight_events)
+GPIO_ACTIVATED_MSG = f"\033[31m[GPIO {zero_accel_gpio.GPIO_PINS} ACTIVADO]\033[0m"
 
 _bus: Optional[smbus.SMBus] = None
 
@@ -71,27 +87,120 @@ def read_word(reg: int, retries: int = 3, retry_delay: float = 0.05) -> int:
                 raise
             time.sleep(retry_delay)
 
+def read_block(reg: int, length: int, retries: int = 3, retry_delay: float = 0.05) -> List[int]:
+    """Read ``length`` consecutive registers in one I2C transaction."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return _get_bus().read_i2c_block_data(MPU_ADDR, reg, length)
+        except OSError:
+            _reset_bus()
+            if attempt >= retries:
+                raise
+            time.sleep(retry_delay)
+
+def _int16(high: int, low: int) -> int:
+    val = (high << 8) | low
+    return val - 0x10000 if val >= 0x8000 else val
+
+def read_raw_motion() -> Tuple[int, int, int, int, int, int]:
+    """Accel and gyro counts from 0x3B-0x48 in a single burst (same instant)."""
+    block = read_block(REG_ACCEL_XOUT_H, 14)
+    # bytes 6-7 son la temperatura
+    return (
+        _int16(block[0], block[1]), _int16(block[2], block[3]), _int16(block[4], block[5]),
+        _int16(block[8], block[9]), _int16(block[10], block[11]), _int16(block[12], block[13]),
+    )
+
+def _scale(raw, offsets):
+    ax, ay, az, gx, gy, gz = raw
+    return (
+        (ax - offsets['accel']['x']) / ACCEL_SCALE,
+        (ay - offsets['accel']['y']) / ACCEL_SCALE,
+        (az - offsets['accel']['z']) / ACCEL_SCALE,
+        (gx - offsets['gyro']['x']) / GYRO_SCALE,
+        (gy - offsets['gyro']['y']) / GYRO_SCALE,
+        (gz - offsets['gyro']['z']) / GYRO_SCALE,
+    )
+
 def read_accel_gyro(offsets):
-    ax = (read_word(0x3B) - offsets['accel']['x']) / ACCEL_SCALE
-    ay = (read_word(0x3D) - offsets['accel']['y']) / ACCEL_SCALE
-    az = (read_word(0x3F) - offsets['accel']['z']) / ACCEL_SCALE
-    gx = (read_word(0x43) - offsets['gyro']['x']) / GYRO_SCALE
-    gy = (read_word(0x45) - offsets['gyro']['y']) / GYRO_SCALE
-    gz = (read_word(0x47) - offsets['gyro']['z']) / GYRO_SCALE
-    return ax, ay, az, gx, gy, gz
+    return _scale(read_raw_motion(), offsets)
+
+def read_temperature() -> float:
+    """Die temperature in °C (datasheet: raw / 340 + 36.53)."""
+    high, low = read_block(REG_TEMP_OUT_H, 2)
+    return _int16(high, low) / 340.0 + 36.53
+
+def fifo_sample_rate(sample_rate_div: int) -> float:
+    """Samples per second the FIFO fills at for ``sample_rate_div`` (DLPF on)."""
+    return 1000.0 / (1 + sample_rate_div)
+
+def enable_fifo(sample_rate_div: int = 9) -> float:
+    """Start filling the FIFO with accel+gyro at 1 kHz / (1 + div); returns the rate."""
+    bus = _get_bus()
+    div = max(0, min(255, int(sample_rate_div)))
+    bus.write_byte_data(MPU_ADDR, REG_CONFIG, DLPF_CFG)
+    bus.write_byte_data(MPU_ADDR, REG_SMPLRT_DIV, div)
+    bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, 0)
+    bus.write_byte_data(MPU_ADDR, REG_FIFO_EN, FIFO_EN_ACCEL_GYRO)
+    bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, USER_CTRL_FIFO_RESET)
+    bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, USER_CTRL_FIFO_EN)
+    return fifo_sample_rate(div)
+
+def disable_fifo() -> None:
+    bus = _get_bus()
+    bus.write_byte_data(MPU_ADDR, REG_FIFO_EN, 0)
+    bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, USER_CTRL_FIFO_RESET)
+
+def read_fifo(offsets) -> Tuple[list, bool]:
+    """Drain whole samples from the FIFO, oldest first.
+
+    Returns ``(samples, overflowed)``; on overflow the FIFO is reset and its
+    content discarded, since the sample boundaries are no longer known.
+    """
+    status = read_block(REG_INT_STATUS, 1)[0]
+    high, low = read_block(REG_FIFO_COUNT_H, 2)
+    count = (high << 8) | low
+    if status & INT_FIFO_OFLOW or count >= FIFO_SIZE:
+        bus = _get_bus()
+        bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, USER_CTRL_FIFO_RESET)
+        bus.write_byte_data(MPU_ADDR, REG_USER_CTRL, USER_CTRL_FIFO_EN)
+        return [], True
+    count -= count % FIFO_SAMPLE_BYTES
+    samples = []
+    data: List[int] = []
+    while count > 0:
+        length = min(FIFO_CHUNK, count)
+        data.extend(read_block(REG_FIFO_R_W, length))
+        count -= length
+    for base in range(0, len(data), FIFO_SAMPLE_BYTES):
+        raw = tuple(_int16(data[base + i], data[base + i + 1]) for i in range(0, FIFO_SAMPLE_BYTES, 2))
+        samples.append(_scale(raw, offsets))
+    return samples, False
 
 def calibrate_sensor():
     _get_bus()
     print("Calibrando... No muevas el sensor.")
+    if imu_batch.HAS_NUMPY:
+        raw = []
+        for _ in range(N_CALIB):
+            raw.append(read_raw_motion())
+            time.sleep(0.002)
+        means, rejected = imu_batch.robust_mean(raw)
+        print(f"Calibracion completada ({rejected} lecturas atipicas descartadas).\n")
+        return {'accel': dict(zip('xyz', means[:3])), 'gyro': dict(zip('xyz', means[3:]))}
+
     accel_offset = {'x': 0, 'y': 0, 'z': 0}
     gyro_offset = {'x': 0, 'y': 0, 'z': 0}
     for _ in range(N_CALIB):
-        accel_offset['x'] += read_word(0x3B)
-        accel_offset['y'] += read_word(0x3D)
-        accel_offset['z'] += read_word(0x3F)
-        gyro_offset['x'] += read_word(0x43)
-        gyro_offset['y'] += read_word(0x45)
-        gyro_offset['z'] += read_word(0x47)
+        ax, ay, az, gx, gy, gz = read_raw_motion()
+        accel_offset['x'] += ax
+        accel_offset['y'] += ay
+        accel_offset['z'] += az
+        gyro_offset['x'] += gx
+        gyro_offset['y'] += gy
+        gyro_offset['z'] += gz
         time.sleep(0.002)
 
     accel_offset = {k: v / N_CALIB for k, v in accel_offset.items()}
@@ -140,19 +249,10 @@ def main():
     alpha_filter = {'ax': 0.0, 'ay': 0.0, 'az': 0.0,
                     'gx': 0.0, 'gy': 0.0, 'gz': 0.0}
 
-    quiet_count = 0
-    last_detection = 0  # tiempo de la ultima deteccion
+    detector = FlightEventDetector(actuate=zero_accel_gpio.activate)
     signal_sent = False
-    gpio_initialized = False
 
     try:
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setwarnings(False)
-        GPIO.setup(GPIO_PIN, GPIO.OUT, initial=GPIO.LOW)
-        GPIO.setup(GPIO_SECOND_PIN, GPIO.OUT, initial=GPIO.LOW)
-        GPIO.output(GPIO_PIN, GPIO.LOW)
-        GPIO.output(GPIO_SECOND_PIN, GPIO.LOW)
-        gpio_initialized = True
         offsets = calibrate_sensor()
 
         filename = f"mpu6050_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -188,28 +288,16 @@ def main():
                         dt, state
                     )
 
-                    # ---- Detección de aceleración 0
-                    a_magnitude = sqrt(
-                        alpha_filter['ax']**2 +
-                        alpha_filter['ay']**2 +
-                        alpha_filter['az']**2
-                    )
-
-                    if abs(a_magnitude - 1.0) < TOLERANCE:
-                        if (current_time - last_detection) > QUIET_DELAY:
-                            quiet_count += 1
-                            last_detection = current_time
-                            print(f"Detección {quiet_count}: sin aceleración lineal")
-
-                            if quiet_count == 2 and not signal_sent:
-                                print("Segunda detección de aceleracion cero")
-                                GPIO.output(GPIO_PIN, GPIO.HIGH)
-                                GPIO.output(GPIO_SECOND_PIN, GPIO.HIGH)
-                                print(GPIO_ACTIVATED_MSG)
-                                print(GPIO_SECOND_ACTIVATED_MSG)
-                                print("[INFO] HACIENDO TIME SLEEP UWU")
-                                signal_sent = True
-                                break
+                    # ---- Detección de eventos de vuelo
+                    events = detector.feed("mpu6050", current_time, {"accel_g": {
+                        "ax": alpha_filter['ax'], "ay": alpha_filter['ay'], "az": alpha_filter['az'],
+                    }})
+                    if any(event.rule.gpio for event in events):
+                        print("Segunda detección de aceleracion cero")
+                        print(GPIO_ACTIVATED_MSG)
+                        print("[INFO] HACIENDO TIME SLEEP UWU")
+                        signal_sent = True
+                        break
 
                     log_debug_sample(alpha_filter, state, ciclo)
 
@@ -226,13 +314,10 @@ def main():
             except KeyboardInterrupt:
                 print("Lectura detenida por el usuario.")
     finally:
-        if gpio_initialized:
-            if signal_sent:
-                print("GPIO mantenido en HIGH; recuerde reiniciar manualmente si es necesario.")
-            else:
-                GPIO.output(GPIO_PIN, GPIO.LOW)
-                GPIO.output(GPIO_SECOND_PIN, GPIO.LOW)
-                GPIO.cleanup()
+        if signal_sent:
+            print("GPIO mantenido en HIGH; recuerde reiniciar manualmente si es necesario.")
+        else:
+            zero_accel_gpio.cleanup()
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
-import math
-import queue
+import bisect
+import heapq
+import itertools
 import sys
 import threading
 import time
-from typing import Any, Callable, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from logger import log, log_payload
+from alignment import Aligner, annotate
+from decimation import WindowStats
+from emission_policy import EmissionPolicy
+from fast_trigger import TELEMETRY_RULES, TriggerPath
+from flight_events import FlightEvent, FlightEventDetector
 from lora_transport import has_link_failure
+from sensor_buffers import SensorBuffers
 from sensor_messages import SensorMessage, build_payload
+from topics import TopicSpec, legacy_topics
 try:
     from zero_accel_gpio import activate as gpio_activate
     from zero_accel_gpio import cleanup as gpio_cleanup
@@ -21,10 +29,16 @@ except Exception:
     def gpio_cleanup() -> None:
         log("MPU6050", "GPIO no disponible, nada que limpiar uwu", "DEBUG")
 
-ZERO_ACCEL_REF = 1.0
-ZERO_ACCEL_TOLERANCE = 0.05
-ZERO_ACCEL_REQUIRED = 2
-ZERO_ACCEL_MIN_DELAY = 1.0
+# Cada cuánto el agregador revisa los anillos de los sensores.
+AGGREGATOR_TICK = 0.02
+# Un sensor sin muestras por más de STALE_AFTER s se reporta como detenido.
+STALE_AFTER = 2.0
+STALE_CHECK_EVERY = 1.0
+HOUSEKEEPING_EVERY = 5.0
+# Límites superiores (ms) de los buckets del histograma de jitter; el último es "más".
+JITTER_BUCKETS_MS = (1, 2, 5, 10, 20, 50)
+
+_SCHEDULER_STATS: Dict[str, Dict[str, Any]] = {}
 
 class ActivityTracker:
     def __init__(self, sensors: Iterable[str]):
@@ -80,101 +94,287 @@ class ActivityTracker:
     # favour of a simpler zero-acceleration signal, so there is intentionally
     # no extra state beyond bookkeeping above.
 
+
+def _job_stats(kind: str) -> Dict[str, Any]:
+    stats = _SCHEDULER_STATS.get(kind)
+    if stats is None:
+        stats = _SCHEDULER_STATS[kind] = {
+            "fired": 0,
+            "skipped": 0,
+            "max_jitter_ms": 0.0,
+            "histogram": [0] * (len(JITTER_BUCKETS_MS) + 1),
+        }
+    return stats
+
+
+def get_scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Per job kind: firings, skipped periods, max jitter and jitter histogram."""
+    return {
+        kind: {**stats, "histogram": list(stats["histogram"]), "buckets_ms": list(JITTER_BUCKETS_MS)}
+        for kind, stats in _SCHEDULER_STATS.items()
+    }
+
+
+class _Scheduler:
+    """Heap of periodic jobs fired on exact deadlines of the monotonic clock.
+
+    Each deadline is the previous one plus the period, so a late job does not
+    push the next ones back; if a job falls more than a period behind, the
+    missed deadlines are skipped and counted. A job may return a new period.
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, str, float, Callable[[float], Optional[float]]]] = []
+        self._seq = itertools.count()
+
+    def every(self, kind: str, period: float, job: Callable[[float], Optional[float]]) -> None:
+        period = max(period, 1e-3)
+        heapq.heappush(self._heap, (time.monotonic() + period, next(self._seq), kind, period, job))
+
+    def run(self, stop_event: threading.Event) -> None:
+        while self._heap and not stop_event.is_set():
+            due, _, kind, period, job = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0 and stop_event.wait(delay):
+                return
+            heapq.heappop(self._heap)
+            now = time.monotonic()
+            stats = _job_stats(kind)
+            jitter_ms = (now - due) * 1000.0
+            stats["fired"] += 1
+            stats["max_jitter_ms"] = max(stats["max_jitter_ms"], jitter_ms)
+            stats["histogram"][bisect.bisect_left(JITTER_BUCKETS_MS, jitter_ms)] += 1
+            period = max(job(now) or period, 1e-3)
+            next_due = due + period
+            if next_due <= now:
+                missed = int((now - next_due) // period) + 1
+                stats["skipped"] += missed
+                next_due += missed * period
+            heapq.heappush(self._heap, (next_due, next(self._seq), kind, period, job))
+
+
+class _TopicState:
+    """Emission bookkeeping of one topic inside the aggregator loop."""
+
+    def __init__(self, spec: TopicSpec):
+        self.spec = spec
+        self.last_emit = 0.0
+        self.emitted: Dict[str, float] = {}
+        self.windows: Dict[str, WindowStats] = (
+            {sensor: WindowStats() for sensor in spec.sensors} if spec.window_stats else {}
+        )
+        self.policy: Optional[EmissionPolicy] = (
+            EmissionPolicy(spec.deadband, spec.rate_trigger, spec.heartbeat) if spec.event_driven else None
+        )
+
+    def observe(self, sensor: str, samples: List[SensorMessage]) -> None:
+        if self.policy is not None:
+            self.policy.observe(sensor, samples)
+        window = self.windows.get(sensor)
+        if window is None:
+            return
+        for message in samples:
+            window.add(message.data)
+
+    def decorate(self, payload: Dict[str, Any]) -> None:
+        """Attach each sensor's window summary next to its latest reading."""
+        for sensor, window in self.windows.items():
+            entry = payload["sensors"].get(sensor)
+            summary = window.summary()
+            if entry is not None and summary is not None:
+                entry["window"] = summary
+
+    def due(self, latest: Dict[str, SensorMessage], now: float, interval: float) -> bool:
+        if self.policy is not None:
+            if not self.policy.due(now, self.last_emit, interval):
+                return False
+        elif now - self.last_emit < interval:
+            return False
+        if self.spec.on_new:
+            return any(
+                sensor in latest and latest[sensor].monotonic > self.emitted.get(sensor, 0.0)
+                for sensor in self.spec.sensors
+            )
+        return True
+
+    def fresh(self, latest: Dict[str, SensorMessage], now: float) -> Dict[str, SensorMessage]:
+        max_age = self.spec.max_age
+        return {
+            sensor: latest[sensor]
+            for sensor in self.spec.sensors
+            if sensor in latest and (max_age is None or now - latest[sensor].monotonic <= max_age)
+        }
+
+    def mark(self, readings: Dict[str, SensorMessage], now: float) -> None:
+        self.last_emit = now
+        for sensor, message in readings.items():
+            self.emitted[sensor] = message.monotonic
+        for window in self.windows.values():
+            window.reset()
+        if self.policy is not None:
+            self.policy.mark(readings)
+
+
 def aggregator_loop(
-    inbox: queue.Queue[SensorMessage],
+    inbox: SensorBuffers,
     stop_event: threading.Event,
     expected_sensors: Iterable[str],
     tracker: ActivityTracker,
-    send_payload: Callable[[Dict[str, Any]], None],
+    send_payload: Callable[..., None],
     emit_every: float = 0.5,
+    send_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    pace: Optional[Callable[[float, str], float]] = None,
+    topics: Optional[Sequence[TopicSpec]] = None,
+    tick: float = AGGREGATOR_TICK,
+    trigger: Optional[TriggerPath] = None,
 ) -> None:
     latest: Dict[str, SensorMessage] = {}
     expected = list(expected_sensors)
-    last_emit = 0.0
-    zero_acc_count = 0
-    zero_acc_last_detection = 0.0
+    states = [_TopicState(spec) for spec in (topics or legacy_topics(expected, emit_every))]
+    aligner = Aligner() if any(state.spec.align for state in states) else None
+    # Con el camino rápido el GPIO lo decide el worker de la IMU; aquí sólo se reportan sus eventos.
+    detector = FlightEventDetector(TELEMETRY_RULES) if trigger is not None else FlightEventDetector(actuate=gpio_activate)
+    cursors: Dict[str, int] = {}
+    lost = 0
+    reported_lost = 0
+    stale: Set[str] = set()
     warned_link_failure = False
-    try:
-        while not stop_event.is_set():
-            try:
-                message = inbox.get(timeout=0.2)
-            except queue.Empty:
-                continue
-            tracker.update(message.sensor, bool(message.data.get("dummy", False)))
-            magnitude: Optional[float] = None
-            if message.sensor == "mpu6050":
-                accel = message.data.get("accel_g")
-                if isinstance(accel, dict):
-                    ax_raw = accel.get("ax", accel.get("x", 0.0))
-                    ay_raw = accel.get("ay", accel.get("y", 0.0))
-                    az_raw = accel.get("az", accel.get("z", 0.0))
-                    try:
-                        ax = float(ax_raw)
-                        ay = float(ay_raw)
-                        az = float(az_raw)
-                    except (TypeError, ValueError):
-                        ax = ay = az = 0.0
-                    magnitude = math.sqrt(ax * ax + ay * ay + az * az)
-            if (
-                message.sensor == "mpu6050"
-                and magnitude is not None
-                and not tracker.zero_accel_signal_sent()
-                and not message.data.get("dummy", False)
-            ):
-                if abs(magnitude - ZERO_ACCEL_REF) <= ZERO_ACCEL_TOLERANCE:
-                    if message.timestamp - zero_acc_last_detection > ZERO_ACCEL_MIN_DELAY:
-                        zero_acc_count += 1
-                        zero_acc_last_detection = message.timestamp
-                        log(
-                            "MPU6050",
-                            f"Detección {zero_acc_count}: sin aceleración lineal (|a|={magnitude:.3f}g)",
-                            "INFO",
-                        )
-                        if zero_acc_count >= ZERO_ACCEL_REQUIRED:
-                            tracker.record_zero_accel_signal(message.timestamp, magnitude)
-                            if gpio_activate():
-                                log("MPU6050", "GPIO 26 activado uwu", "WARN")
-                            log(
-                                "MPU6050",
-                                "Señal registrada por aceleración cero",
-                                "WARN",
-                            )
-            latest[message.sensor] = message
-            now = time.time()
-            if now - last_emit < emit_every:
+
+    def interval_of(spec: TopicSpec) -> float:
+        return pace(spec.emit_every, spec.name) if pace is not None else spec.emit_every
+
+    def emit(state: _TopicState, now: float) -> None:
+        nonlocal warned_link_failure
+        spec = state.spec
+        readings = state.fresh(latest, now)
+        if not readings:
+            return
+        if aligner is not None and spec.align:
+            _, aligned = aligner.align(list(readings), now)
+            payload = build_payload({s: r.message for s, r in aligned.items()}, spec.sensors, time.time())
+            annotate(payload, aligned)
+        else:
+            payload = build_payload(readings, spec.sensors, time.time())
+        state.decorate(payload)
+        log_payload(payload)
+        state.mark(readings, now)
+        if has_link_failure():
+            if not warned_link_failure:
+                log(
+                    "LORA",
+                    "LoRa sin respuesta: omito envíos y sólo imprimiré lecturas",
+                    "ERROR",
+                    sys.stderr,
+                )
+                warned_link_failure = True
+            return
+        warned_link_failure = False
+        try:
+            send_payload(payload, spec.name, rank=spec.priority)
+        except Exception as exc:
+            log("LORA", f"error inesperado al enviar uwu: {exc}", "ERROR", sys.stderr)
+
+    def poll(now: float) -> None:
+        # Los workers escriben en sus anillos sin avisar a nadie; el agregador los
+        # recorre a su propio ritmo y procesa todo lo nuevo de una vez.
+        nonlocal lost
+        events: List[Tuple[FlightEvent, SensorMessage]] = []
+        for ring in inbox.rings():
+            samples, cursors[ring.sensor], dropped = ring.read_since(cursors.get(ring.sensor, 0))
+            if not samples:
                 continue
-            payload = build_payload(latest, expected, now)
-            log_payload(payload)
-            if has_link_failure():
-                if not warned_link_failure:
-                    log(
-                        "LORA",
-                        "LoRa sin respuesta: omito envíos y sólo imprimiré lecturas",
-                        "ERROR",
-                        sys.stderr,
-                    )
-                    warned_link_failure = True
+            lost += dropped
+            newest = samples[-1]
+            tracker.update(ring.sensor, bool(newest.data.get("dummy", False)))
+            for message in samples:
+                for event in detector.feed(ring.sensor, message.timestamp, message.data):
+                    events.append((event, message))
+            for state in states:
+                state.observe(ring.sensor, samples)
+            if aligner is not None:
+                aligner.add(ring.sensor, samples)
+            latest[ring.sensor] = newest
+        if trigger is not None:
+            events.extend(trigger.drain())
+        for event, message in events:
+            if event.rule.event == "zero_accel":
+                tracker.record_zero_accel_signal(event.timestamp, event.value or 0.0)
+                log("MPU6050", "Señal registrada por aceleración cero", "WARN")
+            if send_event is None or has_link_failure():
                 continue
-            warned_link_failure = False
             try:
-                send_payload(payload)
+                readings = {**latest, message.sensor: message}
+                send_event({**build_payload(readings, expected, time.time()), "event": event.to_payload()})
             except Exception as exc:
-                log("LORA", f"error inesperado al enviar uwu: {exc}", "ERROR", sys.stderr)
-            last_emit = now
+                log("LORA", f"error inesperado al enviar evento uwu: {exc}", "ERROR", sys.stderr)
+        # Los topics por eventos deciden en cada revisión; también cuentan su heartbeat sin muestras.
+        for state in states:
+            if state.policy is not None and state.due(latest, now, interval_of(state.spec)):
+                emit(state, now)
+
+    def emit_job(state: _TopicState) -> Callable[[float], float]:
+        def run(now: float) -> float:
+            poll(now)  # emite con lo último que dejaron los workers, no con lo de hace un tick
+            # El plazo ya garantiza el periodo; due() sólo aplica on_new.
+            if state.due(latest, now, 0.0):
+                emit(state, now)
+            return interval_of(state.spec)
+
+        return run
+
+    def check_stale(now: float) -> None:
+        for sensor in expected:
+            message = latest.get(sensor)
+            if message is None:
+                continue
+            age = now - message.monotonic
+            if age > STALE_AFTER and sensor not in stale:
+                stale.add(sensor)
+                log("SYSTEM", f"{sensor} sin datos nuevos hace {age:.1f} s", "WARN")
+            elif age <= STALE_AFTER and sensor in stale:
+                stale.discard(sensor)
+                log("SYSTEM", f"{sensor} volvió a enviar datos", "INFO")
+
+    def housekeeping(now: float) -> None:
+        nonlocal reported_lost
+        if lost > reported_lost:
+            log("SYSTEM", f"El agregador perdió {lost - reported_lost} muestras viejas (anillos de {inbox.capacity})", "WARN")
+            reported_lost = lost
+
+    scheduler = _Scheduler()
+    scheduler.every("poll", tick, poll)
+    for state in states:
+        if state.policy is None:
+            scheduler.every("emit", interval_of(state.spec), emit_job(state))
+    scheduler.every("stale", STALE_CHECK_EVERY, check_stale)
+    scheduler.every("housekeeping", HOUSEKEEPING_EVERY, housekeeping)
+    try:
+        scheduler.run(stop_event)
     finally:
+        for state in states:
+            if state.policy is not None:
+                counts = ", ".join(f"{reason}={count}" for reason, count in state.policy.triggers.items())
+                log("SYSTEM", f"Emisiones de '{state.spec.name}' por disparador: {counts}", "INFO")
+        housekeeping(time.monotonic())
         gpio_cleanup()
 
+
 def create_aggregator_thread(
-    inbox: queue.Queue[SensorMessage],
+    inbox: SensorBuffers,
     stop_event: threading.Event,
     expected_sensors: Iterable[str],
     tracker: ActivityTracker,
-    send_payload: Callable[[Dict[str, Any]], None],
+    send_payload: Callable[..., None],
     emit_every: float = 0.5,
+    send_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    pace: Optional[Callable[[float, str], float]] = None,
+    topics: Optional[Sequence[TopicSpec]] = None,
+    tick: float = AGGREGATOR_TICK,
+    trigger: Optional[TriggerPath] = None,
 ) -> threading.Thread:
     return threading.Thread(
         target=aggregator_loop,
-        args=(inbox, stop_event, expected_sensors, tracker, send_payload, emit_every),
+        args=(inbox, stop_event, expected_sensors, tracker, send_payload, emit_every, send_event, pace, topics, tick, trigger),
         name="Agregador",
         daemon=True,
     )
@@ -0,0 +1,119 @@
+"""Resample the latest readings of several sensors onto one instant.
+
+Workers stamp each :class:`SensorMessage` with ``time.monotonic()``; the
+aligner keeps a short history per sensor and, at emission time, picks the
+newest instant every recently-updated sensor has reached. Numeric fields are
+interpolated linearly between the two samples around it; strings, flags and
+sensors slower than ``max_lag`` keep their nearest sample and report the gap.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence, Tuple
+
+from sensor_messages import SensorMessage
+
+ALIGN_MAX_LAG = 0.25
+ALIGN_HISTORY = 32
+
+
+def _decimals(value: Any) -> int:
+    text = repr(value)
+    return len(text) - text.index(".") - 1 if "." in text and "e" not in text else 0
+
+
+def _blend(before: Any, after: Any, ratio: float) -> Any:
+    if isinstance(before, dict) and isinstance(after, dict):
+        return {key: _blend(value, after.get(key), ratio) if key in after else value for key, value in before.items()}
+    numeric = (int, float)
+    if (
+        isinstance(before, numeric)
+        and isinstance(after, numeric)
+        and not isinstance(before, bool)
+        and not isinstance(after, bool)
+    ):
+        # Conserva la resolución con la que el worker redondeó el campo.
+        digits = min(6, max(_decimals(before), _decimals(after), 1))
+        return round(before + (after - before) * ratio, digits)
+    return before if ratio < 0.5 else after
+
+
+class AlignedReading:
+    """One sensor resampled at the alignment instant."""
+
+    __slots__ = ("message", "age", "skew")
+
+    def __init__(self, message: SensorMessage, age: float, skew: float):
+        self.message = message
+        self.age = age
+        self.skew = skew
+
+
+class Aligner:
+    """Per-sensor histories plus the resampling step used by the aggregator."""
+
+    def __init__(self, max_lag: float = ALIGN_MAX_LAG, history: int = ALIGN_HISTORY):
+        self.max_lag = max_lag
+        self._history: Dict[str, Deque[SensorMessage]] = {}
+        self._size = max(2, history)
+
+    def add(self, sensor: str, samples: Iterable[SensorMessage]) -> None:
+        history = self._history.get(sensor)
+        if history is None:
+            history = self._history[sensor] = deque(maxlen=self._size)
+        history.extend(samples)
+
+    def instant(self, sensors: Sequence[str], now: float) -> Optional[float]:
+        """Newest monotonic instant reached by every sensor updated within ``max_lag``."""
+        newest = [self._history[s][-1].monotonic for s in sensors if self._history.get(s)]
+        if not newest:
+            return None
+        fresh = [stamp for stamp in newest if now - stamp <= self.max_lag]
+        return min(fresh) if fresh else max(newest)
+
+    def resample(self, sensor: str, at: float, now: float, wall_offset: float) -> Optional[AlignedReading]:
+        history = self._history.get(sensor)
+        if not history:
+            return None
+        newest = history[-1]
+        age = now - newest.monotonic
+        if at >= newest.monotonic:
+            data, skew = newest.data, at - newest.monotonic
+        elif at <= history[0].monotonic:
+            data, skew = history[0].data, history[0].monotonic - at
+        else:
+            after = newest
+            for before in reversed(history):
+                if before.monotonic <= at:
+                    break
+                after = before
+            span = after.monotonic - before.monotonic
+            ratio = (at - before.monotonic) / span if span > 0 else 0.0
+            data, skew = _blend(before.data, after.data, ratio), 0.0
+        message = SensorMessage(sensor, at + wall_offset, data, at)
+        return AlignedReading(message, age, skew)
+
+    def align(self, sensors: Sequence[str], now: Optional[float] = None) -> Tuple[Optional[float], Dict[str, AlignedReading]]:
+        """Resample ``sensors`` onto their common instant; returns ``(instant, readings)``."""
+        now = time.monotonic() if now is None else now
+        at = self.instant(sensors, now)
+        if at is None:
+            return None, {}
+        wall_offset = time.time() - time.monotonic()
+        readings: Dict[str, AlignedReading] = {}
+        for sensor in sensors:
+            reading = self.resample(sensor, at, now, wall_offset)
+            if reading is not None:
+                readings[sensor] = reading
+        return at, readings
+
+
+def annotate(payload: Dict[str, Any], readings: Dict[str, AlignedReading]) -> None:
+    """Add ``age_ms`` and ``skew_ms`` to every aligned sensor entry."""
+    for sensor, reading in readings.items():
+        entry = payload["sensors"].get(sensor)
+        if entry is not None:
+            entry["age_ms"] = int(round(reading.age * 1000))
+            entry["skew_ms"] = int(round(reading.skew * 1000))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Optional
+
+# Grupos vectoriales cuyo módulo máximo importa (picos de aceleración y giro).
+PEAK_GROUPS = ("accel_g", "gyro_dps")
+_DIGITS = 4
+
+
+def _numeric(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class WindowStats:
+    """Running min, max, mean and peak magnitude of one sensor between emissions.
+
+    Only numeric groups (``{"ax": 0.1, ...}`` style dicts) are tracked; each
+    sample updates the accumulators in place, so nothing is kept per sample.
+    """
+
+    __slots__ = ("count", "_min", "_max", "_sum", "_peak")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._min: Dict[str, Dict[str, float]] = {}
+        self._max: Dict[str, Dict[str, float]] = {}
+        self._sum: Dict[str, Dict[str, float]] = {}
+        self._peak: Dict[str, float] = {}
+
+    def reset(self) -> None:
+        self.count = 0
+        self._min.clear()
+        self._max.clear()
+        self._sum.clear()
+        self._peak.clear()
+
+    def add(self, data: Dict[str, Any]) -> None:
+        for group, block in data.items():
+            if not isinstance(block, dict) or not block or not all(_numeric(v) for v in block.values()):
+                continue
+            mins = self._min.get(group)
+            if mins is None:
+                self._min[group] = dict(block)
+                self._max[group] = dict(block)
+                self._sum[group] = {key: float(value) for key, value in block.items()}
+            else:
+                maxs = self._max[group]
+                sums = self._sum[group]
+                for key, value in block.items():
+                    if key not in sums:
+                        continue
+                    if value < mins[key]:
+                        mins[key] = value
+                    elif value > maxs[key]:
+                        maxs[key] = value
+                    sums[key] += value
+            if group in PEAK_GROUPS:
+                magnitude = math.sqrt(sum(value * value for value in block.values()))
+                if magnitude > self._peak.get(group, -1.0):
+                    self._peak[group] = magnitude
+        self.count += 1
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Window summary for the payload, or None if nothing numeric arrived."""
+        if not self.count or not self._min:
+            return None
+        n = self.count
+        window: Dict[str, Any] = {
+            "n": n,
+            "min": {group: dict(values) for group, values in self._min.items()},
+            "max": {group: dict(values) for group, values in self._max.items()},
+            "mean": {
+                group: {key: round(total / n, _DIGITS) for key, total in sums.items()}
+                for group, sums in self._sum.items()
+            },
+        }
+        if self._peak:
+            window["peak"] = {group: round(value, _DIGITS) for group, value in self._peak.items()}
+        return window
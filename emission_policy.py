@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sensor_messages import SensorMessage
+
+DEFAULT_HEARTBEAT = 5.0
+
+Field = Tuple[str, Tuple[str, ...]]
+
+
+def split_field(name: str) -> Field:
+    """``"mpu6050.accel_g.az"`` -> ``("mpu6050", ("accel_g", "az"))``."""
+    sensor, _, path = name.partition(".")
+    return sensor, tuple(part for part in path.split(".") if part)
+
+
+def _value(data: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    node: Any = data
+    for key in path:
+        if not isinstance(node, dict):
+            return None
+        node = node.get(key)
+    if isinstance(node, bool) or not isinstance(node, (int, float)):
+        return None
+    return float(node)
+
+
+class EmissionPolicy:
+    """Event-driven emission rules of one topic.
+
+    A payload is due once the rate cap (the topic interval) has elapsed and
+    either a ``deadband`` field moved further than its threshold from the
+    value last emitted, a ``rate_trigger`` field changed faster than its
+    threshold per second between two samples, or ``heartbeat`` seconds passed
+    without emitting. A trigger that arrives inside the cap stays pending.
+    """
+
+    def __init__(
+        self,
+        deadband: Iterable[Tuple[str, float]] = (),
+        rate_trigger: Iterable[Tuple[str, float]] = (),
+        heartbeat: Optional[float] = None,
+    ):
+        self.heartbeat = DEFAULT_HEARTBEAT if heartbeat is None else heartbeat
+        self._deadband: Dict[str, List[Tuple[Tuple[str, ...], float]]] = {}
+        self._rates: Dict[str, List[Tuple[Tuple[str, ...], float]]] = {}
+        for target, fields in ((self._deadband, deadband), (self._rates, rate_trigger)):
+            for name, threshold in fields:
+                sensor, path = split_field(name)
+                target.setdefault(sensor, []).append((path, threshold))
+        self._reference: Dict[Field, float] = {}
+        self._previous: Dict[Field, Tuple[float, float]] = {}
+        self.pending: Optional[str] = None
+        self.triggers = {"deadband": 0, "rate": 0, "heartbeat": 0}
+
+    def observe(self, sensor: str, samples: Iterable[SensorMessage]) -> None:
+        bands = self._deadband.get(sensor, ())
+        rates = self._rates.get(sensor, ())
+        if not bands and not rates:
+            return
+        for message in samples:
+            for path, threshold in bands:
+                value = _value(message.data, path)
+                reference = self._reference.get((sensor, path))
+                if value is not None and reference is not None and abs(value - reference) > threshold:
+                    self._trigger("deadband")
+            for path, threshold in rates:
+                value = _value(message.data, path)
+                if value is None:
+                    continue
+                previous = self._previous.get((sensor, path))
+                self._previous[(sensor, path)] = (message.monotonic, value)
+                if previous is None or message.monotonic <= previous[0]:
+                    continue
+                if abs(value - previous[1]) / (message.monotonic - previous[0]) > threshold:
+                    self._trigger("rate")
+
+    def _trigger(self, reason: str) -> None:
+        if self.pending is None:
+            self.pending = reason
+
+    def due(self, now: float, last_emit: float, interval: float) -> bool:
+        elapsed = now - last_emit
+        if elapsed < interval:
+            return False
+        if self.pending is not None:
+            return True
+        if elapsed >= self.heartbeat:
+            self.pending = "heartbeat"
+            return True
+        return False
+
+    def mark(self, readings: Dict[str, SensorMessage]) -> None:
+        """Record the emitted values as the new deadband reference."""
+        if self.pending is not None:
+            self.triggers[self.pending] += 1
+            self.pending = None
+        for sensor, message in readings.items():
+            for path, _ in self._deadband.get(sensor, ()):
+                value = _value(message.data, path)
+                if value is not None:
+                    self._reference[(sensor, path)] = value
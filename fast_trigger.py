@@ -0,0 +1,150 @@
+"""Low-latency path from an IMU sample to the GPIO actuator.
+
+The GPIO rules of :mod:`flight_events` run inside the MPU6050 worker, right
+after each read, so a trigger never waits for the aggregator tick, the other
+sensors or the LoRa link. Pins are driven by a dedicated actuator thread and
+every trigger records how long each hop took.
+"""
+
+from __future__ import annotations
+
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Iterable, List, Optional, Tuple
+
+from flight_events import DEFAULT_RULES, FlightEvent, FlightEventDetector, Rule
+from logger import log
+from sensor_messages import SensorMessage
+
+try:
+    from zero_accel_gpio import activate as gpio_activate
+except Exception:
+    def gpio_activate() -> bool:
+        log("MPU6050", "GPIO no disponible, omitiendo activación física uwu", "WARN")
+        return False
+
+# Demora máxima aceptable entre la lectura de la IMU y el pin en alto.
+TRIGGER_LATENCY_BUDGET = 0.05
+
+GPIO_RULES: Tuple[Rule, ...] = tuple(rule for rule in DEFAULT_RULES if rule.gpio)
+TELEMETRY_RULES: Tuple[Rule, ...] = tuple(rule for rule in DEFAULT_RULES if not rule.gpio)
+
+
+@dataclass
+class TriggerLatency:
+    """Monotonic timestamps of one trigger: IMU read, rule decision, pin driven.
+
+    ``driven`` stays None unless the pin actually went high.
+    """
+
+    event: str
+    sampled: float
+    decided: float
+    driven: Optional[float] = None
+    activated: bool = False
+
+    @property
+    def decision_delay(self) -> float:
+        return self.decided - self.sampled
+
+    @property
+    def pin_delay(self) -> Optional[float]:
+        return self.driven - self.decided if self.driven is not None else None
+
+    @property
+    def total(self) -> Optional[float]:
+        return self.driven - self.sampled if self.driven is not None else None
+
+
+class GpioActuator:
+    """Thread that drives the pins as soon as a trigger is queued."""
+
+    def __init__(self, stop_event: threading.Event, actuate: Callable[[], bool] = gpio_activate):
+        self.actuate = actuate
+        self._stop = stop_event
+        self._requests: "queue.SimpleQueue[TriggerLatency]" = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="GPIO", daemon=True)
+
+    def request(self, record: TriggerLatency) -> None:
+        self._requests.put(record)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                record = self._requests.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self._drive(record)
+        # Un disparo decidido justo antes de parar igual se ejecuta.
+        while True:
+            try:
+                record = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            self._drive(record)
+
+    def _drive(self, record: TriggerLatency) -> None:
+        try:
+            record.activated = bool(self.actuate())
+        except Exception as exc:
+            log("MPU6050", f"no pude activar el GPIO uwu: {exc}", "ERROR", sys.stderr)
+        if not record.activated:
+            # Sin pin en alto no hay demora que reportar: ``driven`` queda vacío.
+            log("MPU6050", f"GPIO por '{record.event}' NO se activó", "ERROR", sys.stderr)
+            return
+        record.driven = time.monotonic()
+        total = record.total or 0.0
+        log(
+            "MPU6050",
+            f"GPIO por '{record.event}' en {total * 1000:.1f} ms "
+            f"(muestra→decisión {record.decision_delay * 1000:.1f} ms, "
+            f"decisión→pin {(record.pin_delay or 0.0) * 1000:.1f} ms)",
+            "WARN" if total <= TRIGGER_LATENCY_BUDGET else "ERROR",
+        )
+
+
+class TriggerPath:
+    """Run the GPIO rules on every IMU sample from the worker thread.
+
+    Fired events are handed to the aggregator through :meth:`drain` so it can
+    still report them over LoRa; the aggregator keeps the other rules.
+    """
+
+    def __init__(
+        self,
+        stop_event: threading.Event,
+        actuate: Callable[[], bool] = gpio_activate,
+        rules: Tuple[Rule, ...] = GPIO_RULES,
+    ):
+        self.detector = FlightEventDetector(rules)
+        self.actuator = GpioActuator(stop_event, actuate)
+        self.records: List[TriggerLatency] = []
+        self._fired: Deque[Tuple[FlightEvent, SensorMessage]] = deque()
+
+    def start(self) -> threading.Thread:
+        self.actuator.thread.start()
+        return self.actuator.thread
+
+    def feed(self, message: SensorMessage, sampled: Optional[float] = None) -> None:
+        """``sampled`` is the ``time.monotonic()`` of the read, if known."""
+        sampled = time.monotonic() if sampled is None else sampled
+        for event in self.detector.feed(message.sensor, message.timestamp, message.data):
+            if event.rule.gpio:
+                record = TriggerLatency(event.rule.event, sampled, time.monotonic())
+                self.actuator.request(record)
+                self.records.append(record)
+            self._fired.append((event, message))
+
+    def relay(self, fired: Iterable[Tuple[FlightEvent, SensorMessage]]) -> None:
+        """Queue events decided elsewhere (the IMU process) for :meth:`drain`."""
+        self._fired.extend(fired)
+
+    def drain(self) -> List[Tuple[FlightEvent, SensorMessage]]:
+        fired: List[Tuple[FlightEvent, SensorMessage]] = []
+        while self._fired:
+            fired.append(self._fired.popleft())
+        return fired
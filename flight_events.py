@@ -0,0 +1,263 @@
+"""Streaming flight-event detection over the IMU and BMP180 readings.
+
+Rules are declarative: a set of value ranges over derived signals (``|a|``,
+pressure, pressure rate) that must hold for ``hold`` seconds, optionally
+after another event. Every signal keeps a bounded window and every sample
+only re-evaluates the rules that read the signals it touched, so the cost per
+sample does not grow with flight time.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from logger import log
+from sensor_messages import isoformat_utc
+
+ZERO_ACCEL_REF = 1.0
+ZERO_ACCEL_TOLERANCE = 0.05
+ZERO_ACCEL_REQUIRED = 2
+ZERO_ACCEL_MIN_DELAY = 1.0
+
+# Ventana de la regresión de presión: segundos y muestras máximas.
+PRESSURE_WINDOW = 1.0
+PRESSURE_WINDOW_SAMPLES = 64
+_PRESSURE_RE = re.compile(r"P\s*[:=]\s*(-?\d+(?:\.\d+)?)")
+
+
+@dataclass(frozen=True)
+class Condition:
+    """``low <= signal <= high``; a signal without value never matches."""
+
+    signal: str
+    low: float = -math.inf
+    high: float = math.inf
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One flight event.
+
+    It fires once every condition held for ``hold`` seconds, ``repeat``
+    times at least ``gap`` seconds apart, and only after ``after`` fired.
+    ``report`` names the signal sent with the event; ``gpio`` rules drive
+    the actuator handed to :class:`FlightEventDetector`.
+    """
+
+    event: str
+    description: str
+    when: Tuple[Condition, ...]
+    hold: float = 0.0
+    after: Optional[str] = None
+    repeat: int = 1
+    gap: float = 0.0
+    report: str = "magnitude"
+    gpio: bool = False
+
+
+DEFAULT_RULES: Tuple[Rule, ...] = (
+    Rule(
+        "zero_accel",
+        "sin aceleración lineal",
+        (Condition("magnitude", ZERO_ACCEL_REF - ZERO_ACCEL_TOLERANCE, ZERO_ACCEL_REF + ZERO_ACCEL_TOLERANCE),),
+        repeat=ZERO_ACCEL_REQUIRED,
+        gap=ZERO_ACCEL_MIN_DELAY,
+        gpio=True,
+    ),
+    Rule("liftoff", "despegue", (Condition("magnitude", low=2.5),), hold=0.05),
+    Rule("burnout", "fin de combustión", (Condition("magnitude", high=1.0),), hold=0.1, after="liftoff"),
+    Rule("free_fall", "caída libre", (Condition("magnitude", high=0.3),), hold=0.25, after="liftoff"),
+    Rule(
+        "apogee",
+        "apogeo",
+        (Condition("pressure_rate", low=0.05),),
+        hold=0.5,
+        after="burnout",
+        report="pressure",
+    ),
+    Rule(
+        "landing",
+        "aterrizaje",
+        (Condition("pressure_rate", -0.05, 0.05), Condition("magnitude", 0.9, 1.1)),
+        hold=3.0,
+        after="apogee",
+        report="pressure",
+    ),
+)
+
+
+@dataclass
+class FlightEvent:
+    rule: Rule
+    timestamp: float
+    value: Optional[float]
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "type": self.rule.event,
+            "timestamp": isoformat_utc(self.timestamp),
+            self.rule.report: round(self.value, 4) if self.value is not None else None,
+        }
+
+
+class RollingSlope:
+    """Least-squares slope of the last ``span`` seconds, kept with running sums."""
+
+    def __init__(self, span: float = PRESSURE_WINDOW, maxlen: int = PRESSURE_WINDOW_SAMPLES):
+        self.span = span
+        self._points: Deque[Tuple[float, float]] = deque()
+        self._maxlen = max(3, maxlen)
+        self._origin: Optional[float] = None
+        self._st = self._sv = self._stt = self._stv = 0.0
+
+    def _drop(self) -> None:
+        t, v = self._points.popleft()
+        self._st -= t
+        self._sv -= v
+        self._stt -= t * t
+        self._stv -= t * v
+
+    def push(self, timestamp: float, value: float) -> Optional[float]:
+        if self._origin is None:
+            self._origin = timestamp
+        t = timestamp - self._origin
+        self._points.append((t, value))
+        self._st += t
+        self._sv += value
+        self._stt += t * t
+        self._stv += t * value
+        while len(self._points) > self._maxlen or t - self._points[0][0] > self.span:
+            self._drop()
+        n = len(self._points)
+        if n < 3:
+            return None
+        denominator = n * self._stt - self._st * self._st
+        if denominator <= 1e-12:
+            return None
+        return (n * self._stv - self._st * self._sv) / denominator
+
+
+def accel_magnitude(data: Dict[str, Any]) -> Optional[float]:
+    accel = data.get("accel_g")
+    if not isinstance(accel, dict):
+        return None
+    try:
+        ax = float(accel.get("ax", accel.get("x", 0.0)))
+        ay = float(accel.get("ay", accel.get("y", 0.0)))
+        az = float(accel.get("az", accel.get("z", 0.0)))
+    except (TypeError, ValueError):
+        return None
+    return math.sqrt(ax * ax + ay * ay + az * az)
+
+
+def pressure_hpa(data: Dict[str, Any]) -> Optional[float]:
+    raw = data.get("raw")
+    if isinstance(raw, dict):
+        value = raw.get("P")
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if isinstance(raw, str):
+        match = _PRESSURE_RE.search(raw)
+        return float(match.group(1)) if match else None
+    return None
+
+
+@dataclass
+class _RuleState:
+    rule: Rule
+    since: Optional[float] = None
+    count: int = 0
+    last: float = field(default=-math.inf)
+    fired: bool = False
+
+
+class FlightEventDetector:
+    """Run :class:`Rule` objects over the sensor streams, one sample at a time.
+
+    ``actuate`` is called once per ``gpio`` rule that fires; both the
+    aggregator and ``acceleration.main`` pass the same GPIO action here.
+    """
+
+    def __init__(
+        self,
+        rules: Tuple[Rule, ...] = DEFAULT_RULES,
+        actuate: Optional[Callable[[], bool]] = None,
+    ):
+        self.actuate = actuate
+        self.signals: Dict[str, float] = {}
+        self.fired: Dict[str, FlightEvent] = {}
+        self._pressure = RollingSlope()
+        self._states = [_RuleState(rule) for rule in rules]
+        self._by_signal: Dict[str, List[_RuleState]] = {}
+        for state in self._states:
+            for signal in {condition.signal for condition in state.rule.when}:
+                self._by_signal.setdefault(signal, []).append(state)
+
+    def feed(self, sensor: str, timestamp: float, data: Dict[str, Any]) -> List[FlightEvent]:
+        """Update the signals with one reading and return the events it fired."""
+        if data.get("dummy", False):
+            return []
+        touched: List[str] = []
+        if sensor == "mpu6050":
+            magnitude = accel_magnitude(data)
+            if magnitude is not None:
+                self.signals["magnitude"] = magnitude
+                touched.append("magnitude")
+        elif sensor == "bmp180":
+            pressure = pressure_hpa(data)
+            if pressure is not None:
+                self.signals["pressure"] = pressure
+                touched.append("pressure")
+                rate = self._pressure.push(timestamp, pressure)
+                if rate is not None:
+                    self.signals["pressure_rate"] = rate
+                    touched.append("pressure_rate")
+        events: List[FlightEvent] = []
+        seen = set()
+        for signal in touched:
+            for state in self._by_signal.get(signal, ()):
+                if id(state) in seen:
+                    continue
+                seen.add(id(state))
+                event = self._evaluate(state, timestamp)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def _matches(self, rule: Rule) -> bool:
+        for condition in rule.when:
+            value = self.signals.get(condition.signal)
+            if value is None or not condition.low <= value <= condition.high:
+                return False
+        return True
+
+    def _evaluate(self, state: _RuleState, timestamp: float) -> Optional[FlightEvent]:
+        rule = state.rule
+        if state.fired or (rule.after is not None and rule.after not in self.fired):
+            return None
+        if not self._matches(rule):
+            state.since = None
+            return None
+        if state.since is None:
+            state.since = timestamp
+        if timestamp - state.since < rule.hold or timestamp - state.last <= rule.gap:
+            return None
+        state.count += 1
+        state.last = timestamp
+        state.since = None
+        value = self.signals.get(rule.report)
+        if rule.repeat > 1:
+            shown = f" (|a|={value:.3f}g)" if rule.report == "magnitude" and value is not None else ""
+            log("EVENTS", f"Detección {state.count}: {rule.description}{shown}", "INFO")
+        if state.count < rule.repeat:
+            return None
+        state.fired = True
+        event = FlightEvent(rule, timestamp, value)
+        self.fired[rule.event] = event
+        log("EVENTS", f"Evento '{rule.event}': {rule.description}", "WARN")
+        if rule.gpio and self.actuate is not None and self.actuate():
+            log("EVENTS", f"GPIO activado por '{rule.event}' uwu", "WARN")
+        return event
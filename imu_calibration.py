@@ -0,0 +1,119 @@
+"""On-disk cache of the MPU6050 offsets plus a stationary re-calibration.
+
+``calibrate_sensor`` needs the rocket still for several seconds; after a
+restart on the pad the worker reuses the last offsets instead, as long as they
+are recent and were measured at a similar die temperature. While the sensor
+sits still the worker keeps refining them and refreshes the cache.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from logger import log
+
+CACHE_FILE = Path(__file__).resolve().parent / "logs" / "mpu6050_calibration.json"
+MAX_AGE = 7 * 24 * 3600.0
+MAX_TEMP_DELTA = 5.0  # °C
+
+# Detección de reposo sobre ventanas de muestras ya corregidas (g y °/s).
+STATIONARY_SAMPLES = 200
+STATIONARY_GYRO_STD = 0.5
+STATIONARY_ACCEL_STD = 0.02
+# Si la aceleración media se aleja de la calibrada, el cohete cambió de postura: no se recalibra.
+STATIONARY_ACCEL_SHIFT = 0.1
+RECALIBRATE_EVERY = 600.0
+
+Offsets = Dict[str, Dict[str, float]]
+_AXES = ("x", "y", "z")
+
+
+def load_cached(temperature: Optional[float], path: Path = CACHE_FILE, now: Optional[float] = None) -> Optional[Offsets]:
+    """Return cached offsets if they are recent and from a similar temperature."""
+    now = time.time() if now is None else now
+    try:
+        with path.open("r", encoding="utf-8") as fp:
+            data: Dict[str, Any] = json.load(fp)
+        offsets = {group: {axis: float(data["offsets"][group][axis]) for axis in _AXES} for group in ("accel", "gyro")}
+        saved_at = float(data["saved_at"])
+        saved_temp = data.get("temperature")
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        log("MPU6050", f"calibración guardada ilegible, la ignoro uwu: {exc}", "WARN")
+        return None
+    age = now - saved_at
+    if not 0 <= age <= MAX_AGE:
+        log("MPU6050", f"calibración guardada demasiado vieja ({age / 3600:.1f} h)", "INFO")
+        return None
+    if temperature is not None and isinstance(saved_temp, (int, float)):
+        if abs(temperature - saved_temp) > MAX_TEMP_DELTA:
+            log("MPU6050", f"calibración guardada a {saved_temp:.1f} °C, ahora {temperature:.1f} °C; recalibro", "INFO")
+            return None
+    return offsets
+
+
+def save(offsets: Offsets, temperature: Optional[float], path: Path = CACHE_FILE) -> None:
+    """Write the offsets atomically so a crash never leaves half a file."""
+    record = {"saved_at": time.time(), "temperature": temperature, "offsets": offsets}
+    tmp = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp.open("w", encoding="utf-8") as fp:
+            json.dump(record, fp)
+        os.replace(tmp, path)
+    except OSError as exc:
+        log("MPU6050", f"no pude guardar la calibración uwu: {exc}", "ERROR", sys.stderr)
+
+
+class StationaryCalibrator:
+    """Refine ``offsets`` in place from windows where the IMU is at rest.
+
+    Samples are the corrected accel/gyro values the worker already has; the
+    mean residual of a quiet window, converted back to counts, is added to
+    the offsets. Mean and variance are accumulated incrementally per window.
+    """
+
+    def __init__(self, offsets: Offsets, accel_scale: float, gyro_scale: float, interval: float = RECALIBRATE_EVERY):
+        self.offsets = offsets
+        self.scales = (accel_scale,) * 3 + (gyro_scale,) * 3
+        self.interval = interval
+        self.last = time.monotonic()
+        self.updates = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._n = 0
+        self._sum = [0.0] * 6
+        self._sq = [0.0] * 6
+
+    def feed(self, sample: Sequence[float], now: float) -> bool:
+        """Add one ``(ax, ay, az, gx, gy, gz)`` sample; True when offsets changed."""
+        if now - self.last < self.interval:
+            return False
+        for index, value in enumerate(sample):
+            self._sum[index] += value
+            self._sq[index] += value * value
+        self._n += 1
+        if self._n < STATIONARY_SAMPLES:
+            return False
+        n = self._n
+        means = [total / n for total in self._sum]
+        stds = [math.sqrt(max(sq / n - mean * mean, 0.0)) for sq, mean in zip(self._sq, means)]
+        self._reset()
+        if max(stds[3:]) > STATIONARY_GYRO_STD or max(stds[:3]) > STATIONARY_ACCEL_STD:
+            return False
+        if max(abs(mean) for mean in means[:3]) > STATIONARY_ACCEL_SHIFT:
+            return False
+        for index, mean in enumerate(means):
+            group = "accel" if index < 3 else "gyro"
+            self.offsets[group][_AXES[index % 3]] += mean * self.scales[index]
+        self.last = now
+        self.updates += 1
+        return True
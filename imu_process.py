@@ -0,0 +1,238 @@
+"""MPU6050 acquisition in its own process, published through shared memory.
+
+With ``"imu_process": true`` in config.json the IMU loop (reads, filters and
+the GPIO fast path) runs in a child process with its own interpreter, so
+serial parsing, JSON encoding and LoRa TX in the main process no longer add
+jitter to its period. Samples travel as fixed-size records through a
+:class:`SharedImuRing`; the aggregator reads it like any other
+:class:`sensor_buffers.SensorRing`, without locks.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import queue
+import signal
+import struct
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from fast_trigger import TriggerPath
+from logger import log
+from sensor_messages import SensorMessage
+from sensor_workers import mpu6050_worker
+try:
+    from zero_accel_gpio import cleanup as gpio_cleanup
+except Exception:
+    def gpio_cleanup() -> None:
+        log("MPU6050", "GPIO no disponible, nada que limpiar uwu", "DEBUG")
+
+IMU_RING_CAPACITY = 256
+# Tiempo que se le da al proceso para cerrar antes de matarlo.
+IMU_PROCESS_JOIN = 1.0
+
+# Cabecera: muestras escritas y capacidad. Registro: seq, timestamp, monotonic, 9 valores, dummy.
+_HEADER = struct.Struct("<QQ")
+_RECORD = struct.Struct("<Qdd9d?7x")
+_SEQ = struct.Struct("<Q")
+_ACCEL = ("ax", "ay", "az")
+_GYRO = ("gx", "gy", "gz")
+_DUMMY_AXES = ("x", "y", "z")
+
+
+def imu_process_enabled(config: Dict[str, Any]) -> bool:
+    return config.get("imu_process") is True
+
+
+def _pack(seq: int, message: SensorMessage) -> bytes:
+    data = message.data
+    dummy = bool(data.get("dummy", False))
+    accel, gyro = data.get("accel_g", {}), data.get("gyro_dps", {})
+    attitude = data.get("attitude_deg", {})
+    values = [float(accel.get(k, 0.0)) for k in (_DUMMY_AXES if dummy else _ACCEL)]
+    values += [float(gyro.get(k, 0.0)) for k in (_DUMMY_AXES if dummy else _GYRO)]
+    values += [float(attitude.get(k, 0.0)) for k in ("pitch", "roll", "yaw")]
+    return _RECORD.pack(seq, message.timestamp, message.monotonic, *values, dummy)
+
+
+def _unpack(record: Tuple[Any, ...]) -> SensorMessage:
+    _, timestamp, monotonic, *values, dummy = record
+    accel_keys, gyro_keys = (_DUMMY_AXES, _DUMMY_AXES) if dummy else (_ACCEL, _GYRO)
+    data: Dict[str, Any] = {
+        "accel_g": dict(zip(accel_keys, values[0:3])),
+        "gyro_dps": dict(zip(gyro_keys, values[3:6])),
+        "attitude_deg": dict(zip(("pitch", "roll", "yaw"), values[6:9])),
+    }
+    if dummy:
+        data["dummy"] = True
+    return SensorMessage("mpu6050", timestamp, data, monotonic)
+
+
+class SharedImuRing:
+    """Single-writer ring of MPU6050 records in ``multiprocessing.shared_memory``.
+
+    The writer marks a slot invalid, fills it, stamps it with its sequence
+    number and only then bumps the header count. Readers copy a slot and
+    accept it only if its sequence number is the expected one before and
+    after the copy, so a slot being overwritten is dropped, never torn.
+    Exposes the ``read_since``/``latest`` interface of ``SensorRing`` on the
+    reading side and ``put`` on the writing side.
+    """
+
+    sensor = "mpu6050"
+
+    def __init__(self, capacity: int = IMU_RING_CAPACITY, name: Optional[str] = None):
+        if name is None:
+            self.capacity = max(1, capacity)
+            size = _HEADER.size + self.capacity * _RECORD.size
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            _HEADER.pack_into(self._shm.buf, 0, 0, self.capacity)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self.capacity = _HEADER.unpack_from(self._shm.buf, 0)[1]
+        self.name = self._shm.name
+
+    @property
+    def seq(self) -> int:
+        return _SEQ.unpack_from(self._shm.buf, 0)[0]
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + (index % self.capacity) * _RECORD.size
+
+    def put(self, message: SensorMessage) -> None:
+        buf = self._shm.buf
+        seq = self.seq
+        offset = self._offset(seq)
+        record = _pack(seq + 1, message)
+        _SEQ.pack_into(buf, offset, 0)
+        buf[offset + _SEQ.size:offset + _RECORD.size] = record[_SEQ.size:]
+        buf[offset:offset + _SEQ.size] = record[:_SEQ.size]
+        _SEQ.pack_into(buf, 0, seq + 1)
+
+    def _read(self, index: int) -> Optional[SensorMessage]:
+        buf = self._shm.buf
+        offset = self._offset(index)
+        raw = bytes(buf[offset:offset + _RECORD.size])
+        record = _RECORD.unpack(raw)
+        if record[0] != index + 1 or _SEQ.unpack_from(buf, offset)[0] != index + 1:
+            return None
+        return _unpack(record)
+
+    @property
+    def latest(self) -> Optional[SensorMessage]:
+        end = self.seq
+        return self._read(end - 1) if end else None
+
+    def read_since(self, cursor: int) -> Tuple[List[SensorMessage], int, int]:
+        """Return ``(samples after cursor, new cursor, samples lost to overwrites)``."""
+        end = self.seq
+        start = max(cursor, end - self.capacity)
+        samples: List[SensorMessage] = []
+        for index in range(start, end):
+            message = self._read(index)
+            if message is None:
+                # El escritor dio la vuelta y pisó este slot: lo anterior también se perdió.
+                samples.clear()
+                continue
+            samples.append(message)
+        return samples, end, (end - cursor) - len(samples)
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        self._shm.unlink()
+
+
+class _RelayingTrigger(TriggerPath):
+    """TriggerPath of the child process: fired events go straight to the parent."""
+
+    def __init__(self, stop_event: Any, relay: Any):
+        super().__init__(stop_event)
+        self._relay = relay
+
+    def feed(self, message: SensorMessage, sampled: Optional[float] = None) -> None:
+        super().feed(message, sampled)
+        fired = self.drain()
+        if fired:
+            self._relay.put(("events", fired))
+
+
+def _imu_main(name: str, halt: Any, relay: Any) -> None:
+    # Ctrl+C y SIGTERM llegan a todo el grupo: el padre decide cuándo parar vía ``halt``.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    ring = SharedImuRing(name=name)
+    trigger = _RelayingTrigger(halt, relay)
+    actuator = trigger.start()
+    try:
+        mpu6050_worker(ring, halt, trigger)
+    finally:
+        halt.set()
+        actuator.join(timeout=0.5)
+        # El pin lo manejó este proceso: el cleanup del padre no sabe de él.
+        try:
+            gpio_cleanup()
+        except Exception as exc:
+            log("MPU6050", f"no pude limpiar el GPIO uwu: {exc}", "WARN")
+        relay.put(("records", trigger.records))
+        ring.close()
+
+
+class ImuProcess:
+    """Parent-side handle: owns the ring, the child process and its watcher.
+
+    ``thread`` takes the place of the MPU6050 worker thread: it lives as long
+    as the child, stops it when ``stop_event`` is set and hands relayed
+    events and latency records to the parent's :class:`TriggerPath`.
+    """
+
+    def __init__(
+        self,
+        stop_event: threading.Event,
+        trigger: Optional[TriggerPath] = None,
+        capacity: int = IMU_RING_CAPACITY,
+    ):
+        # spawn: el padre ya tiene hilos corriendo y no conviene forkearlo.
+        context = multiprocessing.get_context("spawn")
+        self.ring = SharedImuRing(capacity)
+        self.trigger = trigger
+        self._stop = stop_event
+        self._halt = context.Event()
+        self._relay = context.Queue()
+        self.process = context.Process(target=_imu_main, args=(self.ring.name, self._halt, self._relay), name="MPU6050", daemon=True)
+        self.thread = threading.Thread(target=self._watch, name="MPU6050", daemon=True)
+
+    def _forward(self, timeout: float = 0.0) -> None:
+        while True:
+            try:
+                kind, items = self._relay.get(timeout=timeout) if timeout else self._relay.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "records":
+                if self.trigger is not None:
+                    self.trigger.records.extend(items)
+                return
+            if self.trigger is not None:
+                self.trigger.relay(items)
+
+    def _watch(self) -> None:
+        self.process.start()
+        log("MPU6050", f"Proceso de la IMU arriba (pid {self.process.pid}) uwu", "SYS")
+        try:
+            while self.process.is_alive():
+                self._forward()
+                if self._stop.wait(0.05):
+                    break
+        finally:
+            self._halt.set()
+            self._forward(IMU_PROCESS_JOIN)
+            self.process.join(timeout=IMU_PROCESS_JOIN)
+            if self.process.is_alive():
+                log("MPU6050", "El proceso de la IMU no terminó, lo mato uwu", "WARN")
+                self.process.terminate()
+                self.process.join(timeout=IMU_PROCESS_JOIN)
+            # Solo se borra el nombre: el agregador puede seguir leyendo el mapeo hasta salir.
+            self.ring.unlink()
+            log("MPU6050", f"Proceso de la IMU terminado (código {self.process.exitcode})", "DEBUG")
@@ -4,7 +4,7 @@ import json
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 LEVEL_COLORS = {
     "INFO": "\033[92m",
@@ -18,6 +18,7 @@ LEVEL_COLORS = {
 
 _PAYLOAD_LOG_FILE = Path(__file__).resolve().parent / "logs" / "payloads.log"
 _CONFIG_FILE = Path(__file__).resolve().parent / "config.json"
+_CONFIG: Optional[Dict[str, Any]] = None
 
 def _load_config() -> Dict[str, Any]:
     try:
@@ -31,8 +32,15 @@ def _load_config() -> Dict[str, Any]:
         return {}
     return data if isinstance(data, dict) else {}
 
+def load_config() -> Dict[str, Any]:
+    """config.json as a dict, parsed once per process; {} when missing or invalid."""
+    global _CONFIG
+    if _CONFIG is None:
+        _CONFIG = _load_config()
+    return _CONFIG
+
 def _bool_setting(key: str, default: bool) -> bool:
-    raw = _load_config().get(key, default)
+    raw = load_config().get(key, default)
     if isinstance(raw, bool):
         return raw
     if isinstance(raw, str):
@@ -27,6 +27,8 @@
 #include <sys/time.h>
 #include <signal.h>
 #include <stdlib.h>
+#include <pthread.h>
+#include <time.h>
 
 #include <sys/ioctl.h>
 
@@ -514,6 +516,18 @@ void txlora(byte *frame, byte datalen) {
 	opmode(OPMODE_TX);
 }
 
+// Wait until DIO0 goes high (RxDone or TxDone, depending on the mapping).
+// A negative timeout waits forever. Only reads the GPIO, no SPI traffic.
+static bool waitDio0(long timeout_ms) {
+	unsigned int start = millis();
+	while (digitalRead(dio0) == 0) {
+		if (timeout_ms >= 0 && (long)(millis() - start) >= timeout_ms)
+			return false;
+		delayMicroseconds(250);
+	}
+	return true;
+}
+
 int main (int argc, char *argv[]) {
 	if (argc < 2) {
 		printf ("Usage: argv[0] sender|rec [message]\n");
@@ -572,21 +586,37 @@ int main (int argc, char *argv[]) {
 
 static PyObject * LoraError;
 
+// Serializes SPI access now that send/recv run without the GIL.
+static pthread_mutex_t radio_lock = PTHREAD_MUTEX_INITIALIZER;
+
 static PyObject* send(PyObject* self, PyObject* args)
 {
-	char * buffer;
-	int size;
+	const char * buffer;
+	Py_ssize_t size;
 
 	if (!PyArg_ParseTuple(args, "y#", &buffer, &size)){
 		return NULL;
 	}
 
-	txlora((byte *)buffer, size);
+	if (size > 255) {
+		PyErr_SetString(LoraError, "Frame too long (max 255 bytes)");
+		return NULL;
+	}
+
+	// buffer stays alive while args holds the bytes object
+	Py_BEGIN_ALLOW_THREADS
+	pthread_mutex_lock(&radio_lock);
+	txlora((byte *)buffer, (byte)size);
+	pthread_mutex_unlock(&radio_lock);
+	Py_END_ALLOW_THREADS
 
 	return PyLong_FromLong(0);
 }
 
 
+// recv([timeout]): without timeout (or 0) checks DIO0 once, as before.
+// With timeout > 0 waits up to that many seconds for RxDone; < 0 waits forever.
+// The GIL is released while waiting and during the SPI reads.
 static PyObject* recv(PyObject* self, PyObject* args)
 {
 	char buffer[256];
@@ -595,10 +625,190 @@ static PyObject* recv(PyObject* self, PyObject* args)
 	int rssi = 0;
 	long int snr = 0;
 	int error = 0;
+	double timeout = 0.0;
+
+	if (!PyArg_ParseTuple(args, "|d", &timeout)){
+		return NULL;
+	}
+
+	long timeout_ms = timeout < 0 ? -1 : (long)(timeout * 1000.0);
 
+	Py_BEGIN_ALLOW_THREADS
+	if (timeout_ms != 0)
+		waitDio0(timeout_ms);
+	pthread_mutex_lock(&radio_lock);
 	receivepacket2(buffer, &receivedbytes, &prssi, &rssi, &snr, &error);
+	pthread_mutex_unlock(&radio_lock);
+	Py_END_ALLOW_THREADS
+
+	return Py_BuildValue("y#iiiii", buffer, (Py_ssize_t)receivedbytes, receivedbytes, prssi, rssi, (int)snr, error);
+}
+
+
+// recv_into(buffer[, timeout]): same as recv() but the FIFO is read straight
+// into a writable buffer of at least 255 bytes, so no bytes object is built.
+// Returns (length, prssi, rssi, snr, error).
+static PyObject* recv_into(PyObject* self, PyObject* args)
+{
+	Py_buffer view;
+	int receivedbytes = 0;
+	int prssi = 0;
+	int rssi = 0;
+	long int snr = 0;
+	int error = 0;
+	double timeout = 0.0;
+
+	if (!PyArg_ParseTuple(args, "w*|d", &view, &timeout)){
+		return NULL;
+	}
+
+	if (view.len < 255) {
+		PyBuffer_Release(&view);
+		PyErr_SetString(PyExc_ValueError, "Buffer must hold at least 255 bytes");
+		return NULL;
+	}
+
+	long timeout_ms = timeout < 0 ? -1 : (long)(timeout * 1000.0);
+
+	// the buffer export keeps a bytearray from being resized meanwhile
+	Py_BEGIN_ALLOW_THREADS
+	if (timeout_ms != 0)
+		waitDio0(timeout_ms);
+	pthread_mutex_lock(&radio_lock);
+	receivepacket2((char *)view.buf, &receivedbytes, &prssi, &rssi, &snr, &error);
+	pthread_mutex_unlock(&radio_lock);
+	Py_END_ALLOW_THREADS
+
+	PyBuffer_Release(&view);
+	return Py_BuildValue("iiiii", receivedbytes, prssi, rssi, (int)snr, error);
+}
+
+
+static double monotonicSeconds(void)
+{
+	struct timespec ts;
+	clock_gettime(CLOCK_MONOTONIC, &ts);
+	return ts.tv_sec + ts.tv_nsec / 1e9;
+}
+
+
+// send_many(frames[, timeout]): transmit every frame back to back, waiting
+// for TxDone on DIO0 after each one (up to timeout seconds, default 10 which
+// covers 255 bytes at SF12). The GIL is released for the whole batch.
+// Returns a list with the seconds each frame took from TX start to TxDone,
+// or -1.0 when TxDone never came (the batch stops there).
+static PyObject* send_many(PyObject* self, PyObject* args)
+{
+	PyObject * frames;
+	double timeout = 10.0;
 
-	return Py_BuildValue("y#iiiii", buffer, receivedbytes, receivedbytes, prssi, rssi, snr, error);
+	if (!PyArg_ParseTuple(args, "O|d", &frames, &timeout)){
+		return NULL;
+	}
+
+	PyObject * seq = PySequence_Fast(frames, "frames must be a sequence of bytes");
+	if (seq == NULL) {
+		return NULL;
+	}
+
+	Py_ssize_t count = PySequence_Fast_GET_SIZE(seq);
+	Py_buffer * views = (Py_buffer *)PyMem_Calloc(count ? count : 1, sizeof(Py_buffer));
+	double * timings = (double *)PyMem_Calloc(count ? count : 1, sizeof(double));
+	if (views == NULL || timings == NULL) {
+		PyMem_Free(views);
+		PyMem_Free(timings);
+		Py_DECREF(seq);
+		return PyErr_NoMemory();
+	}
+
+	Py_ssize_t acquired = 0;
+	for (; acquired < count; acquired++) {
+		PyObject * item = PySequence_Fast_GET_ITEM(seq, acquired);
+		if (PyObject_GetBuffer(item, &views[acquired], PyBUF_SIMPLE) < 0)
+			break;
+		if (views[acquired].len > 255) {
+			PyBuffer_Release(&views[acquired]);
+			PyErr_SetString(LoraError, "Frame too long (max 255 bytes)");
+			break;
+		}
+	}
+
+	PyObject * result = NULL;
+	if (acquired == count) {
+		long timeout_ms = timeout < 0 ? -1 : (long)(timeout * 1000.0);
+		Py_ssize_t sent = 0;
+
+		Py_BEGIN_ALLOW_THREADS
+		pthread_mutex_lock(&radio_lock);
+		for (; sent < count; sent++) {
+			double start = monotonicSeconds();
+			txlora((byte *)views[sent].buf, (byte)views[sent].len);
+			if (!waitDio0(timeout_ms)) {
+				timings[sent++] = -1.0;
+				break;
+			}
+			timings[sent] = monotonicSeconds() - start;
+			// clear TxDone; the radio is back in standby
+			writeReg(REG_IRQ_FLAGS, IRQ_LORA_TXDONE_MASK);
+		}
+		pthread_mutex_unlock(&radio_lock);
+		Py_END_ALLOW_THREADS
+
+		result = PyList_New(sent);
+		for (Py_ssize_t i = 0; result != NULL && i < sent; i++) {
+			PyObject * value = PyFloat_FromDouble(timings[i]);
+			if (value == NULL) {
+				Py_CLEAR(result);
+				break;
+			}
+			PyList_SET_ITEM(result, i, value);
+		}
+	}
+
+	for (Py_ssize_t i = 0; i < acquired; i++)
+		PyBuffer_Release(&views[i]);
+	PyMem_Free(views);
+	PyMem_Free(timings);
+	Py_DECREF(seq);
+	return result;
+}
+
+
+// set_mode(mode): switch an initialised radio between sender (0) and
+// receiver (1) without the reset and register setup done by init(), so a
+// half-duplex turnaround (ARQ polls and NACKs) takes microseconds.
+static PyObject* set_mode(PyObject* self, PyObject* args)
+{
+	int mode;
+
+	if (!PyArg_ParseTuple(args, "i", &mode))
+		return NULL;
+
+	if(!(mode == 0 || mode == 1))
+	{
+		PyErr_SetString(LoraError, "Bad mode. Should be 0 (sender) or 1 (receiver)");
+		return NULL;
+	}
+
+	Py_BEGIN_ALLOW_THREADS
+	pthread_mutex_lock(&radio_lock);
+	opmode(OPMODE_STANDBY);
+	if (mode == 0) {
+		writeReg(RegPaRamp, (readReg(RegPaRamp) & 0xF0) | 0x08);
+		configPower(23);
+	} else {
+		// undo what txlora() left behind: TxDone mapping, masked IRQs, TX FIFO pointer
+		writeReg(REG_HOP_PERIOD, 0xFF);
+		writeReg(RegDioMapping1, MAP_DIO0_LORA_RXDONE|MAP_DIO1_LORA_NOP|MAP_DIO2_LORA_NOP);
+		writeReg(REG_IRQ_FLAGS_MASK, 0x00);
+		writeReg(REG_IRQ_FLAGS, 0xFF);
+		writeReg(REG_FIFO_ADDR_PTR, readReg(REG_FIFO_RX_BASE_AD));
+		opmode(OPMODE_RX);
+	}
+	pthread_mutex_unlock(&radio_lock);
+	Py_END_ALLOW_THREADS
+
+	return PyLong_FromLong(0);
 }
 
 
@@ -664,7 +874,10 @@ static PyObject* init(PyObject* self, PyObject* args)
 static PyMethodDef LoraMethods[] = {
 	{"init",  init, METH_VARARGS, "Initialization"},
 	{"send",  send, METH_VARARGS, "Send data"},
-	{"recv",  recv, METH_VARARGS, "Receive data"},
+	{"recv",  recv, METH_VARARGS, "Receive data; optional timeout (s) waits for RxDone without the GIL"},
+	{"send_many",  send_many, METH_VARARGS, "Send frames back to back, waiting TxDone on each; returns per-frame seconds"},
+	{"recv_into",  recv_into, METH_VARARGS, "Receive data into a writable buffer; returns (length, prssi, rssi, snr, error)"},
+	{"set_mode",  set_mode, METH_VARARGS, "Switch between sender (0) and receiver (1) without re-initialising"},
 	{NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -687,6 +900,7 @@ PyInit_loralib(void)
 	LoraError = PyErr_NewException("lora.error", NULL, NULL);
 	Py_INCREF(LoraError);
 	PyModule_AddObject(m, "error", LoraError);
+	PyModule_AddIntConstant(m, "HAS_RECV_TIMEOUT", 1);
 
 	return m;
 }
@@ -0,0 +1,142 @@
+"""Time-on-air estimates and an airtime token bucket for the LoRa link.
+
+``loralib.send`` returns as soon as the frame is in the radio FIFO, so the
+transport has to know how long the SX127x stays on air before it can queue the
+next frame. The formula follows Semtech AN1200.13 ("LoRa Modem Designer's
+Guide"); the defaults mirror the registers written by ``SetupLoRa`` in lora.c
+(BW 125 kHz, CR 4/5, explicit header, payload CRC on, 8 preamble symbols).
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+BANDWIDTH_HZ = 125_000
+CODING_RATE = 5  # denominador de 4/5
+PREAMBLE_SYMBOLS = 8
+
+
+def symbol_time(spread_factor: int, bandwidth_hz: int = BANDWIDTH_HZ) -> float:
+    return (1 << spread_factor) / float(bandwidth_hz)
+
+
+def time_on_air(
+    payload_len: int,
+    spread_factor: int,
+    bandwidth_hz: int = BANDWIDTH_HZ,
+    coding_rate: int = CODING_RATE,
+    preamble_symbols: int = PREAMBLE_SYMBOLS,
+    explicit_header: bool = True,
+    crc: bool = True,
+    low_data_rate: Optional[bool] = None,
+) -> float:
+    """Return the seconds a ``payload_len`` byte frame occupies the channel.
+
+    ``coding_rate`` is the denominator of 4/x (5-8). ``low_data_rate`` defaults
+    to the datasheet rule (symbols longer than 16 ms), which matches lora.c
+    enabling it for SF11 and SF12 at 125 kHz.
+    """
+    t_sym = symbol_time(spread_factor, bandwidth_hz)
+    if low_data_rate is None:
+        low_data_rate = t_sym > 0.016
+    de = 1 if low_data_rate else 0
+    ih = 0 if explicit_header else 1
+    numerator = 8 * payload_len - 4 * spread_factor + 28 + (16 if crc else 0) - 20 * ih
+    denominator = 4 * (spread_factor - 2 * de)
+    payload_symbols = 8 + max(math.ceil(numerator / denominator) * coding_rate, 0)
+    preamble = (preamble_symbols + 4.25) * t_sym
+    return preamble + payload_symbols * t_sym
+
+
+class AirtimeBudget:
+    """Token bucket measured in seconds of airtime.
+
+    Tokens refill at ``duty_cycle`` seconds per second up to ``burst``. A frame
+    may start once the previous one has left the air and enough tokens are
+    available; both waits are folded into :meth:`acquire`.
+    """
+
+    def __init__(self, duty_cycle: float, burst: float, guard: float = 0.005):
+        self.duty_cycle = duty_cycle
+        self.burst = max(burst, 0.0)
+        self.guard = guard
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._busy_until = 0.0
+        self._started: Optional[float] = None
+        self._stats: Dict[str, float] = {
+            "frames": 0,
+            "airtime_total": 0.0,
+            "airtime_max": 0.0,
+            "wait_total": 0.0,
+        }
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.duty_cycle)
+        self._updated = now
+
+    def delay(self, airtime: float, now: float) -> float:
+        """Seconds to wait before a frame of ``airtime`` seconds may start."""
+        with self._lock:
+            self._refill(now)
+            radio_wait = max(0.0, self._busy_until - now)
+            # Con burst menor que el frame, basta con llenar el bucket.
+            needed = min(airtime, self.burst) - self._tokens
+            token_wait = needed / self.duty_cycle if needed > 0 else 0.0
+            return max(radio_wait, token_wait)
+
+    def consume(self, airtime: float, now: float, waited: float = 0.0, frames: int = 1) -> None:
+        with self._lock:
+            self._refill(now)
+            self._tokens -= airtime
+            self._busy_until = now + airtime + self.guard
+            if self._started is None:
+                self._started = now
+            self._stats["frames"] += frames
+            self._stats["airtime_total"] += airtime
+            self._stats["airtime_max"] = max(self._stats["airtime_max"], airtime)
+            self._stats["wait_total"] += waited
+
+    def acquire(
+        self,
+        airtime: float,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+        frames: int = 1,
+    ) -> float:
+        """Block until ``airtime`` fits, book it and return the time waited.
+
+        ``frames`` > 1 books a back-to-back batch as a single reservation.
+        """
+        waited = 0.0
+        while True:
+            now = clock()
+            pause = self.delay(airtime, now)
+            if pause <= 0.0:
+                self.consume(airtime, now, waited, frames)
+                return waited
+            sleep(pause)
+            waited += pause
+
+    def busy_for(self, now: float) -> float:
+        """Seconds until the last booked frame has left the air."""
+        with self._lock:
+            return max(0.0, self._busy_until - self.guard - now)
+
+    def sustainable_interval(self, airtime: float) -> float:
+        """Shortest period at which frames of ``airtime`` seconds can repeat."""
+        return airtime / self.duty_cycle + self.guard
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, float]:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stats = dict(self._stats)
+            # El último frame puede seguir en el aire: cuenta hasta que termine.
+            end = max(now, self._busy_until - self.guard)
+            elapsed = end - self._started if self._started is not None else 0.0
+        stats["utilisation"] = stats["airtime_total"] / elapsed if elapsed > 0 else 0.0
+        return stats
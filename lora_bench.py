@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of the LoRa link on a simulated channel.
+
+Frames are built with the codec, compression, FEC and header options from
+``lora_config.json``, sent through :class:`lora_radio.LoopbackRadio` on a
+virtual clock (SF12 runs as fast as SF7) and reassembled with
+:func:`lora_transport.decode_frame`. Like the TX queue with
+``tx_queue_size: 1``, a payload that is still waiting when the next one is
+emitted gets superseded.
+
+Usage::
+
+    python3 lora_bench.py --payloads 200 --sf 9 --loss 0.05 --ber 1e-4
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from logger import log
+from lora_airtime import time_on_air
+from lora_radio import ChannelModel, LoopbackRadio
+from lora_transport import LORA_FREQ_HZ, LORA_SF, decode_frame, encode_frames, get_rx_stats
+
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_SAMPLE = REPO_ROOT / "samples" / "lora_payload_sample.json"
+_GUARD = 0.005
+
+
+def _shift_timestamp(value: Any, offset: float) -> Any:
+    if not isinstance(value, str) or not value.endswith("Z"):
+        return value
+    try:
+        moment = datetime.fromisoformat(value[:-1])
+    except ValueError:
+        return value
+    return (moment + timedelta(seconds=offset)).isoformat(timespec="microseconds") + "Z"
+
+
+def make_payloads(sample: Dict[str, Any], count: int, interval: float, rng: random.Random) -> List[Dict[str, Any]]:
+    """Copies of ``sample`` moved forward in time with a little sensor noise."""
+    payloads = []
+    for idx in range(count):
+        payload = copy.deepcopy(sample)
+        offset = idx * interval
+        payload["reported_at"] = _shift_timestamp(payload.get("reported_at"), offset)
+        for reading in (payload.get("sensors") or {}).values():
+            if not isinstance(reading, dict):
+                continue
+            for key, value in reading.items():
+                if key in ("timestamp", "fix_time"):
+                    reading[key] = _shift_timestamp(value, offset)
+                elif isinstance(value, dict):
+                    for axis, number in value.items():
+                        if isinstance(number, float):
+                            value[axis] = round(number + rng.gauss(0.0, 0.01), 3)
+        payloads.append(payload)
+    return payloads
+
+
+def run(payloads: Sequence[Dict[str, Any]], interval: float, spread_factor: int, model: ChannelModel) -> Dict[str, float]:
+    clock = [0.0]
+    radio = LoopbackRadio(model, clock=lambda: clock[0])
+    radio.init(0, LORA_FREQ_HZ, spread_factor)
+    emitted_at: Dict[str, float] = {}
+    latencies: List[float] = []
+    radio_free = 0.0
+    frames_sent = 0
+    bytes_on_air = 0
+    airtime_total = 0.0
+    superseded = 0
+    delivered_bytes = 0
+    for idx, payload in enumerate(payloads):
+        emit = idx * interval
+        start = max(emit, radio_free)
+        if idx + 1 < len(payloads) and (idx + 1) * interval <= start:
+            superseded += 1
+            continue
+        emitted_at[str(payload.get("reported_at"))] = emit
+        for frame in encode_frames(payload):
+            clock[0] = start
+            radio.send(frame)
+            airtime = time_on_air(len(frame), spread_factor)
+            frames_sent += 1
+            bytes_on_air += len(frame)
+            airtime_total += airtime
+            start += airtime + _GUARD
+        radio_free = start
+        clock[0] = start
+        while True:
+            buffer, length, last_rssi, rssi, snr, error = radio.recv()
+            if length <= 0 and error == 0:
+                break
+            if error != 0:
+                continue
+            packet = decode_frame(bytes(buffer[:length]), last_rssi, rssi, snr, now=clock[0])
+            if packet is None:
+                continue
+            sent = emitted_at.get(str(packet["payload"].get("reported_at")))
+            if sent is not None:
+                latencies.append(clock[0] - sent)
+            delivered_bytes += len(json.dumps(packet["payload"], separators=(",", ":")))
+    elapsed = max(radio_free, len(payloads) * interval)
+    latencies.sort()
+    attempted = len(payloads) - superseded
+    return {
+        "payloads": float(len(payloads)),
+        "superseded": float(superseded),
+        "attempted": float(attempted),
+        "delivered": float(len(latencies)),
+        "delivery_ratio": len(latencies) / attempted if attempted else 0.0,
+        "frames": float(frames_sent),
+        "frame_bytes": bytes_on_air / frames_sent if frames_sent else 0.0,
+        "utilisation": airtime_total / elapsed if elapsed else 0.0,
+        "goodput_bps": delivered_bytes * 8 / elapsed if elapsed else 0.0,
+        "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "latency_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        "latency_max": latencies[-1] if latencies else 0.0,
+        **{f"radio_{key}": float(value) for key, value in radio.stats().items()},
+    }
+
+
+def _report(stats: Dict[str, float], rx: Dict[str, int]) -> None:
+    log(
+        "BENCH",
+        f"payloads: {int(stats['payloads'])} emitidos, {int(stats['superseded'])} reemplazados, "
+        f"{int(stats['delivered'])}/{int(stats['attempted'])} entregados ({stats['delivery_ratio']:.1%})",
+        "INFO",
+    )
+    log(
+        "BENCH",
+        f"tramas: {int(stats['frames'])} de {stats['frame_bytes']:.1f} B promedio, canal ocupado {stats['utilisation']:.0%}",
+        "INFO",
+    )
+    log(
+        "BENCH",
+        f"canal: {int(stats['radio_lost'])} perdidas, {int(stats['radio_crc_errors'])} con error CRC, "
+        f"{int(stats['radio_aborted'])} abortadas",
+        "INFO",
+    )
+    log("BENCH", f"goodput: {stats['goodput_bps']:.0f} bit/s de JSON entregado", "INFO")
+    log(
+        "BENCH",
+        f"latencia: media {stats['latency_mean'] * 1000:.0f} ms, p95 {stats['latency_p95'] * 1000:.0f} ms, "
+        f"máx {stats['latency_max'] * 1000:.0f} ms",
+        "INFO",
+    )
+    log("BENCH", f"receptor: {json.dumps(rx, sort_keys=True)}", "INFO")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Mide el enlace LoRa de punta a punta sobre un canal simulado.")
+    parser.add_argument("--payloads", type=int, default=100, help="Cantidad de payloads (default: 100).")
+    parser.add_argument("--interval", type=float, default=0.5, help="Segundos entre payloads (default: 0.5).")
+    parser.add_argument("--sf", type=int, default=LORA_SF, help=f"Spreading factor (default: {LORA_SF}).")
+    parser.add_argument("--loss", type=float, default=0.0, help="Probabilidad de perder cada trama.")
+    parser.add_argument("--ber", type=float, default=0.0, help="Tasa de error de bit.")
+    parser.add_argument("--snr", type=float, default=9.0, help="SNR medio en dB (default: 9).")
+    parser.add_argument(
+        "--no-hw-crc",
+        action="store_true",
+        help="Entrega las tramas corruptas en vez de descartarlas como haría el CRC del SX127x.",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="Semilla del canal (default: 1).")
+    parser.add_argument("--sample", type=Path, default=DEFAULT_SAMPLE, help="Payload JSON de ejemplo.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.sf not in range(7, 13):
+        log("BENCH", "el SF debe estar entre 7 y 12", "ERROR", sys.stderr)
+        return 2
+    try:
+        sample = json.loads(args.sample.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        log("BENCH", f"no pude leer {args.sample}: {exc}", "ERROR", sys.stderr)
+        return 1
+    rng = random.Random(args.seed)
+    model = ChannelModel(
+        loss=args.loss,
+        bit_error_rate=args.ber,
+        snr_db=args.snr,
+        hardware_crc=not args.no_hw_crc,
+        seed=args.seed,
+    )
+    payloads = make_payloads(sample, max(1, args.payloads), max(0.0, args.interval), rng)
+    _report(run(payloads, max(0.0, args.interval), args.sf, model), get_rx_stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,507 @@
+"""Compact binary codec for aggregated sensor payloads.
+
+Packs the dict produced by ``sensor_messages.build_payload`` into fixed-point
+struct fields so a full three-sensor snapshot fits in a single LoRa frame.
+The layout is versioned; anything that does not match the schema raises
+:class:`CodecError` so the caller can fall back to JSON.
+"""
+
+from __future__ import annotations
+
+import struct
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+SCHEMA_VERSION = 1
+# Igual que la 1, pero cada sensor lleva age_ms y skew_ms (payloads alineados).
+SCHEMA_ALIGNED = 2
+_ALIGN_KEYS = ("age_ms", "skew_ms")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ISO_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# Orden fijo de sensores: la posición define el bit en la máscara de presencia.
+_SENSOR_ORDER: Tuple[str, ...] = ("mpu6050", "bmp180", "neo6m")
+
+_FLAG_DUMMY_KEY = 0x01
+_FLAG_DUMMY_VALUE = 0x02
+_FLAG_VARIANT = 0x04
+_NULL_SHIFT = 3
+# Sólo MPU y BMP: en el GPS los bits 3-7 son los nulos.
+_FLAG_WINDOW = 0x80
+
+_INT32_MIN = -(2**31)
+_INT32_MAX = 2**31 - 1
+
+# (grupo, llaves estándar, llaves alternas de los dummies, escala)
+_MPU_GROUPS: Tuple[Tuple[str, Tuple[str, ...], Tuple[str, ...], int], ...] = (
+    ("accel_g", ("ax", "ay", "az"), ("x", "y", "z"), 10_000),
+    ("gyro_dps", ("gx", "gy", "gz"), ("x", "y", "z"), 1_000),
+    ("attitude_deg", ("pitch", "roll", "yaw"), ("pitch", "roll", "yaw"), 100),
+)
+_BMP_FIELDS: Tuple[Tuple[str, int], ...] = (("T", 100), ("P", 100))
+# Resumen de ventana (decimation.WindowStats): n y luego min/max/mean por grupo.
+_WINDOW_STATS = ("min", "max", "mean")
+_MPU_PEAKS: Tuple[Tuple[str, int], ...] = (("accel_g", 10_000), ("gyro_dps", 1_000))
+# (llave, formato, escala); formato "s" son cadenas con prefijo de longitud.
+_GPS_FIELDS: Tuple[Tuple[str, str, int], ...] = (
+    ("latitude", "i", 10_000_000),
+    ("longitude", "i", 10_000_000),
+    ("altitude", "i", 100),
+    ("fix_time", "s", 0),
+    ("raw", "s", 0),
+)
+
+Value = Union[int, str]
+
+
+class CodecError(ValueError):
+    """Raised when a payload does not fit the binary schema."""
+
+
+def _iso_to_micros(value: Any) -> int:
+    if not isinstance(value, str):
+        raise CodecError(f"timestamp inválido: {value!r}")
+    try:
+        parsed = datetime.strptime(value, _ISO_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError as exc:
+        raise CodecError(f"timestamp inválido: {value!r}") from exc
+    return (parsed - _EPOCH) // timedelta(microseconds=1)
+
+
+def _micros_to_iso(micros: int) -> str:
+    stamp = _EPOCH + timedelta(microseconds=micros)
+    return stamp.replace(tzinfo=None).isoformat(timespec="microseconds") + "Z"
+
+
+def _fixed(value: Any, scale: int) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise CodecError(f"valor numérico inválido: {value!r}")
+    scaled = round(value * scale)
+    if scaled < _INT32_MIN or scaled > _INT32_MAX:
+        raise CodecError(f"valor fuera de rango: {value!r}")
+    return scaled
+
+
+def _unfixed(value: int, scale: int) -> float:
+    digits = len(str(scale)) - 1
+    return round(value / scale, digits)
+
+
+def _text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise CodecError(f"cadena inválida: {value!r}")
+    if len(value.encode("utf-8")) > 255:
+        raise CodecError("cadena demasiado larga para el esquema binario")
+    return value
+
+
+def _check_keys(entry: Dict[str, Any], expected: Sequence[str]) -> None:
+    extra = set(entry) - set(expected) - {"timestamp", "dummy", "window", *_ALIGN_KEYS}
+    missing = [key for key in expected if key not in entry]
+    if extra or missing or "timestamp" not in entry:
+        raise CodecError(f"forma de sensor no soportada: {sorted(entry)}")
+
+
+def _dummy_flags(entry: Dict[str, Any]) -> int:
+    if "dummy" not in entry:
+        return 0
+    dummy = entry["dummy"]
+    if not isinstance(dummy, bool):
+        raise CodecError(f"dummy inválido: {dummy!r}")
+    return _FLAG_DUMMY_KEY | (_FLAG_DUMMY_VALUE if dummy else 0)
+
+
+WindowGroups = Sequence[Tuple[str, Sequence[str], int]]
+
+
+def _window_size(groups: WindowGroups, peaks: Sequence[Tuple[str, int]]) -> int:
+    return 1 + len(_WINDOW_STATS) * sum(len(keys) for _, keys, _ in groups) + len(peaks)
+
+
+def _flatten_window(
+    window: Any, groups: WindowGroups, peaks: Sequence[Tuple[str, int]], values: List[Value]
+) -> None:
+    expected = {"n", *_WINDOW_STATS} | ({"peak"} if peaks else set())
+    if not isinstance(window, dict) or set(window) != expected:
+        raise CodecError("forma de window no soportada")
+    count = window["n"]
+    if isinstance(count, bool) or not isinstance(count, int) or not 0 < count <= _INT32_MAX:
+        raise CodecError(f"n de window inválido: {count!r}")
+    values.append(count)
+    for stat in _WINDOW_STATS:
+        block = window[stat]
+        if not isinstance(block, dict) or set(block) != {group for group, _, _ in groups}:
+            raise CodecError(f"grupos de window.{stat} no soportados")
+        for group, keys, scale in groups:
+            fields = block[group]
+            if not isinstance(fields, dict) or set(fields) != set(keys):
+                raise CodecError(f"llaves de window.{stat}.{group} no soportadas")
+            values.extend(_fixed(fields[key], scale) for key in keys)
+    if peaks:
+        peak = window["peak"]
+        if not isinstance(peak, dict) or set(peak) != {group for group, _ in peaks}:
+            raise CodecError("grupos de window.peak no soportados")
+        values.extend(_fixed(peak[group], scale) for group, scale in peaks)
+
+
+def _unflatten_window(it: Any, groups: WindowGroups, peaks: Sequence[Tuple[str, int]]) -> Dict[str, Any]:
+    window: Dict[str, Any] = {"n": int(next(it))}
+    for stat in _WINDOW_STATS:
+        window[stat] = {
+            group: {key: _unfixed(int(next(it)), scale) for key in keys} for group, keys, scale in groups
+        }
+    if peaks:
+        window["peak"] = {group: _unfixed(int(next(it)), scale) for group, scale in peaks}
+    return window
+
+
+def _mpu_window_groups(variant: bool) -> WindowGroups:
+    return [(group, alt_keys if variant else keys, scale) for group, keys, alt_keys, scale in _MPU_GROUPS]
+
+
+_BMP_WINDOW_GROUPS: WindowGroups = [("raw", [key for key, _ in _BMP_FIELDS], 100)]
+
+
+def _flatten_mpu(entry: Dict[str, Any], values: List[Value]) -> int:
+    _check_keys(entry, [group for group, _, _, _ in _MPU_GROUPS])
+    flags = _dummy_flags(entry)
+    accel = entry["accel_g"]
+    variant = isinstance(accel, dict) and set(accel) == set(_MPU_GROUPS[0][2])
+    for group, keys, alt_keys, scale in _MPU_GROUPS:
+        chosen = alt_keys if variant else keys
+        block = entry[group]
+        if not isinstance(block, dict) or set(block) != set(chosen):
+            raise CodecError(f"llaves de {group} no soportadas")
+        values.extend(_fixed(block[key], scale) for key in chosen)
+    if variant:
+        flags |= _FLAG_VARIANT
+    if "window" in entry:
+        _flatten_window(entry["window"], _mpu_window_groups(variant), _MPU_PEAKS, values)
+        flags |= _FLAG_WINDOW
+    return flags
+
+
+def _flatten_bmp(entry: Dict[str, Any], values: List[Value]) -> int:
+    _check_keys(entry, ["raw"])
+    flags = _dummy_flags(entry)
+    raw = entry["raw"]
+    if isinstance(raw, dict):
+        if set(raw) != {key for key, _ in _BMP_FIELDS}:
+            raise CodecError(f"llaves de raw no soportadas: {sorted(raw)}")
+        values.extend(_fixed(raw[key], scale) for key, scale in _BMP_FIELDS)
+        flags |= _FLAG_VARIANT
+        if "window" in entry:
+            _flatten_window(entry["window"], _BMP_WINDOW_GROUPS, (), values)
+            flags |= _FLAG_WINDOW
+    elif "window" in entry:
+        raise CodecError("window sólo se soporta con raw numérico")
+    else:
+        values.append(_text(raw))
+    return flags
+
+
+def _flatten_gps(entry: Dict[str, Any], values: List[Value]) -> int:
+    _check_keys(entry, [key for key, _, _ in _GPS_FIELDS])
+    if "window" in entry:
+        raise CodecError("window no soportado para el GPS")
+    flags = _dummy_flags(entry)
+    for bit, (key, fmt, scale) in enumerate(_GPS_FIELDS):
+        value = entry[key]
+        if value is None:
+            flags |= 1 << (_NULL_SHIFT + bit)
+            continue
+        values.append(_text(value) if fmt == "s" else _fixed(value, scale))
+    return flags
+
+
+_FLATTENERS = {
+    "mpu6050": _flatten_mpu,
+    "bmp180": _flatten_bmp,
+    "neo6m": _flatten_gps,
+}
+
+
+def flatten_payload(payload: Dict[str, Any]) -> Tuple[bytes, List[Value]]:
+    """Split a payload into its schema layout and a flat list of quantized values.
+
+    The layout (version, presence mask and per-sensor flags) determines the
+    format of every value, so two payloads with the same layout can be
+    compared field by field.
+    """
+    if not isinstance(payload, dict) or set(payload) != {"reported_at", "sensors"}:
+        raise CodecError("el payload debe tener sólo reported_at y sensors")
+    sensors = payload["sensors"]
+    if not isinstance(sensors, dict) or set(sensors) - set(_SENSOR_ORDER):
+        raise CodecError("sensores fuera del esquema binario")
+    reported_us = _iso_to_micros(payload["reported_at"])
+    entries = [entry for entry in sensors.values() if isinstance(entry, dict)]
+    aligned = any(key in entry for entry in entries for key in _ALIGN_KEYS)
+    mask = 0
+    flags: List[int] = []
+    values: List[Value] = [reported_us]
+    for bit, sensor in enumerate(_SENSOR_ORDER):
+        entry = sensors.get(sensor)
+        if entry is None:
+            continue
+        if not isinstance(entry, dict):
+            raise CodecError(f"{sensor} debe ser un objeto")
+        mask |= 1 << bit
+        delta = _iso_to_micros(entry.get("timestamp")) - reported_us
+        if delta < _INT32_MIN or delta > _INT32_MAX:
+            raise CodecError(f"timestamp de {sensor} demasiado lejos de reported_at")
+        values.append(delta)
+        if aligned:
+            for key in _ALIGN_KEYS:
+                value = entry.get(key)
+                if isinstance(value, bool) or not isinstance(value, int) or not _INT32_MIN <= value <= _INT32_MAX:
+                    raise CodecError(f"{key} de {sensor} inválido: {value!r}")
+                values.append(value)
+        flags.append(_FLATTENERS[sensor](entry, values))
+    # Los sensores esperados sin datos viajan como ausentes; se restauran como null.
+    present_keys = [sensor for sensor in _SENSOR_ORDER if sensor in sensors]
+    expected_mask = sum(1 << _SENSOR_ORDER.index(sensor) for sensor in present_keys)
+    layout = bytes([SCHEMA_ALIGNED if aligned else SCHEMA_VERSION, mask, expected_mask, *flags])
+    return layout, values
+
+
+def _parse_layout(layout: bytes) -> Tuple[int, int, List[int]]:
+    if len(layout) < 3 or layout[0] not in (SCHEMA_VERSION, SCHEMA_ALIGNED):
+        raise CodecError("versión de esquema desconocida")
+    mask = layout[1]
+    expected_mask = layout[2]
+    count = bin(mask).count("1")
+    if len(layout) != 3 + count or mask & ~expected_mask:
+        raise CodecError("layout binario inconsistente")
+    return mask, expected_mask, list(layout[3:])
+
+
+def value_formats(layout: bytes) -> List[str]:
+    """Return the struct format of every flattened value for ``layout``."""
+    mask, _, flags = _parse_layout(layout)
+    formats = ["q"]
+    flag_iter = iter(flags)
+    for bit, sensor in enumerate(_SENSOR_ORDER):
+        if not mask & (1 << bit):
+            continue
+        sensor_flags = next(flag_iter)
+        formats.append("i")
+        if layout[0] == SCHEMA_ALIGNED:
+            formats.extend("i" * len(_ALIGN_KEYS))
+        if sensor == "mpu6050":
+            formats.extend("i" * sum(len(keys) for _, keys, _, _ in _MPU_GROUPS))
+            if sensor_flags & _FLAG_WINDOW:
+                formats.extend("i" * _window_size(_mpu_window_groups(False), _MPU_PEAKS))
+        elif sensor == "bmp180":
+            formats.extend("i" * len(_BMP_FIELDS) if sensor_flags & _FLAG_VARIANT else "s")
+            if sensor_flags & _FLAG_WINDOW:
+                formats.extend("i" * _window_size(_BMP_WINDOW_GROUPS, ()))
+        else:
+            for idx, (_, fmt, _) in enumerate(_GPS_FIELDS):
+                if not sensor_flags & (1 << (_NULL_SHIFT + idx)):
+                    formats.append(fmt)
+    return formats
+
+
+def _restore_dummy(entry: Dict[str, Any], flags: int) -> None:
+    if flags & _FLAG_DUMMY_KEY:
+        entry["dummy"] = bool(flags & _FLAG_DUMMY_VALUE)
+
+
+def unflatten_payload(layout: bytes, values: Sequence[Value]) -> Dict[str, Any]:
+    """Inverse of :func:`flatten_payload`."""
+    mask, expected_mask, flags = _parse_layout(layout)
+    it = iter(values)
+    try:
+        reported_us = int(next(it))
+        body: Dict[str, Optional[Dict[str, Any]]] = {}
+        flag_iter = iter(flags)
+        for bit, sensor in enumerate(_SENSOR_ORDER):
+            if not expected_mask & (1 << bit):
+                continue
+            if not mask & (1 << bit):
+                body[sensor] = None
+                continue
+            sensor_flags = next(flag_iter)
+            entry: Dict[str, Any] = {"timestamp": _micros_to_iso(reported_us + int(next(it)))}
+            if layout[0] == SCHEMA_ALIGNED:
+                for key in _ALIGN_KEYS:
+                    entry[key] = int(next(it))
+            if sensor == "mpu6050":
+                variant = bool(sensor_flags & _FLAG_VARIANT)
+                for group, keys, alt_keys, scale in _MPU_GROUPS:
+                    chosen = alt_keys if variant else keys
+                    entry[group] = {key: _unfixed(int(next(it)), scale) for key in chosen}
+                if sensor_flags & _FLAG_WINDOW:
+                    entry["window"] = _unflatten_window(it, _mpu_window_groups(variant), _MPU_PEAKS)
+            elif sensor == "bmp180":
+                if sensor_flags & _FLAG_VARIANT:
+                    entry["raw"] = {key: _unfixed(int(next(it)), scale) for key, scale in _BMP_FIELDS}
+                    if sensor_flags & _FLAG_WINDOW:
+                        entry["window"] = _unflatten_window(it, _BMP_WINDOW_GROUPS, ())
+                else:
+                    entry["raw"] = str(next(it))
+            else:
+                for idx, (key, fmt, scale) in enumerate(_GPS_FIELDS):
+                    if sensor_flags & (1 << (_NULL_SHIFT + idx)):
+                        entry[key] = None
+                    elif fmt == "s":
+                        entry[key] = str(next(it))
+                    else:
+                        entry[key] = _unfixed(int(next(it)), scale)
+            _restore_dummy(entry, sensor_flags)
+            body[sensor] = entry
+    except StopIteration as exc:
+        raise CodecError("faltan valores para el layout binario") from exc
+    return {"reported_at": _micros_to_iso(reported_us), "sensors": body}
+
+
+def pack_values(formats: Sequence[str], values: Sequence[Value]) -> bytes:
+    out = bytearray()
+    for fmt, value in zip(formats, values):
+        if fmt == "s":
+            raw = str(value).encode("utf-8")
+            out.append(len(raw))
+            out.extend(raw)
+        else:
+            out.extend(struct.pack("<" + fmt, value))
+    return bytes(out)
+
+
+def unpack_values(formats: Sequence[str], data: bytes, offset: int = 0) -> Tuple[List[Value], int]:
+    values: List[Value] = []
+    try:
+        for fmt in formats:
+            if fmt == "s":
+                length = data[offset]
+                offset += 1
+                chunk = data[offset : offset + length]
+                if len(chunk) != length:
+                    raise CodecError("cadena truncada")
+                values.append(bytes(chunk).decode("utf-8"))
+                offset += length
+            else:
+                (value,) = struct.unpack_from("<" + fmt, data, offset)
+                values.append(value)
+                offset += struct.calcsize(fmt)
+    except (IndexError, struct.error, UnicodeDecodeError) as exc:
+        raise CodecError(f"cuerpo binario truncado: {exc}") from exc
+    return values, offset
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """Encode ``payload`` with the binary schema; raises :class:`CodecError`."""
+    layout, values = flatten_payload(payload)
+    return layout + pack_values(value_formats(layout), values)
+
+
+def split_layout(data: bytes) -> Tuple[bytes, int]:
+    """Return the layout prefix of an encoded body and the offset of its values."""
+    if len(data) < 3:
+        raise CodecError("cuerpo binario truncado")
+    size = 3 + bin(data[1]).count("1")
+    if len(data) < size:
+        raise CodecError("cuerpo binario truncado")
+    return bytes(data[:size]), size
+
+
+def decode_payload(data: bytes) -> Dict[str, Any]:
+    """Decode a body produced by :func:`encode_payload`."""
+    layout, offset = split_layout(data)
+    values, end = unpack_values(value_formats(layout), data, offset)
+    if end != len(data):
+        raise CodecError("bytes sobrantes en el cuerpo binario")
+    return unflatten_payload(layout, values)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    # zigzag: los enteros pequeños (positivos o negativos) ocupan un byte
+    zigzag = (value << 1) ^ (value >> 63)
+    while zigzag >= 0x80:
+        out.append((zigzag & 0x7F) | 0x80)
+        zigzag >>= 7
+    out.append(zigzag)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        try:
+            byte = data[offset]
+        except IndexError as exc:
+            raise CodecError("varint truncado") from exc
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 63:
+            raise CodecError("varint demasiado largo")
+    return (result >> 1) ^ -(result & 1), offset
+
+
+def pack_delta(formats: Sequence[str], reference: Sequence[Value], values: Sequence[Value]) -> bytes:
+    """Encode ``values`` as differences against ``reference`` (same layout).
+
+    A bitmap marks the fields that changed; numeric fields carry a zigzag
+    varint of the difference and strings are sent whole.
+    """
+    bitmap = bytearray((len(formats) + 7) // 8)
+    body = bytearray()
+    for idx, (fmt, ref, value) in enumerate(zip(formats, reference, values)):
+        if value == ref:
+            continue
+        bitmap[idx // 8] |= 1 << (idx % 8)
+        if fmt == "s":
+            raw = str(value).encode("utf-8")
+            body.append(len(raw))
+            body.extend(raw)
+        else:
+            _write_varint(body, int(value) - int(ref))
+    return bytes(bitmap) + bytes(body)
+
+
+def unpack_delta(
+    formats: Sequence[str],
+    reference: Sequence[Value],
+    data: bytes,
+    offset: int = 0,
+) -> List[Value]:
+    """Inverse of :func:`pack_delta`."""
+    size = (len(formats) + 7) // 8
+    bitmap = data[offset : offset + size]
+    if len(bitmap) != size:
+        raise CodecError("bitmap de delta truncado")
+    offset += size
+    values: List[Value] = []
+    for idx, (fmt, ref) in enumerate(zip(formats, reference)):
+        if not bitmap[idx // 8] & (1 << (idx % 8)):
+            values.append(ref)
+            continue
+        if fmt == "s":
+            (text,), offset = unpack_values("s", data, offset)
+            values.append(text)
+        else:
+            diff, offset = _read_varint(data, offset)
+            values.append(int(ref) + diff)
+    if offset != len(data):
+        raise CodecError("bytes sobrantes en el delta")
+    return values
+
+
+__all__ = [
+    "SCHEMA_ALIGNED",
+    "SCHEMA_VERSION",
+    "CodecError",
+    "decode_payload",
+    "encode_payload",
+    "flatten_payload",
+    "pack_delta",
+    "pack_values",
+    "split_layout",
+    "unflatten_payload",
+    "unpack_delta",
+    "unpack_values",
+    "value_formats",
+]
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Preset dictionaries for zlib-compressed LoRa frames.
+
+Payloads that do not fit the binary schema still travel as JSON, which is
+extremely repetitive (``accel_g``, ``gyro_dps``, ``$GPGGA``...). A small preset
+dictionary trained offline from recorded payloads lets raw deflate reference
+those strings from the very first byte of each frame.
+
+Usage::
+
+    python3 lora_dictionary.py build --id 1
+    python3 lora_dictionary.py evaluate --id 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from logger import log
+
+REPO_ROOT = Path(__file__).resolve().parent
+DICTIONARY_DIR = REPO_ROOT / "dictionaries"
+DEFAULT_SAMPLE = REPO_ROOT / "samples" / "lora_payload_sample.json"
+DEFAULT_LOG = REPO_ROOT / "logs" / "payloads.log"
+DEFAULT_SIZE = 2048
+MAX_SAMPLES = 2000
+_SEGMENT_LENGTHS = (6, 10, 16, 24, 32)
+_WBITS = -15  # deflate crudo: sin cabecera zlib ni adler32
+
+_CACHE: Dict[int, Optional[bytes]] = {}
+
+
+def dictionary_path(dict_id: int) -> Path:
+    return DICTIONARY_DIR / f"lora_dict_{dict_id}.bin"
+
+
+def load_dictionary(dict_id: int) -> Optional[bytes]:
+    """Return the preset dictionary ``dict_id`` or ``None`` if it is missing."""
+    if dict_id not in _CACHE:
+        try:
+            _CACHE[dict_id] = dictionary_path(dict_id).read_bytes()
+        except OSError:
+            _CACHE[dict_id] = None
+    return _CACHE[dict_id]
+
+
+def compress_body(body: bytes, zdict: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, _WBITS, 9, zlib.Z_DEFAULT_STRATEGY, zdict)
+    return compressor.compress(body) + compressor.flush()
+
+
+def decompress_body(data: bytes, zdict: bytes) -> bytes:
+    decompressor = zlib.decompressobj(_WBITS, zdict)
+    body = decompressor.decompress(data) + decompressor.flush()
+    if not decompressor.eof:
+        raise zlib.error("stream deflate incompleto")
+    return body
+
+
+def serialize(payload: Dict[str, Any]) -> bytes:
+    """Serialize exactly like the JSON frames on the wire."""
+    return json.dumps(payload, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+
+
+def read_samples(sample_paths: Sequence[Path], log_paths: Sequence[Path]) -> List[bytes]:
+    """Load payloads from JSON sample files and ``payloads.log`` style logs."""
+    samples: List[bytes] = []
+    for path in sample_paths:
+        try:
+            samples.append(serialize(json.loads(path.read_text(encoding="utf-8"))))
+        except (OSError, json.JSONDecodeError) as exc:
+            log("DICT", f"omito {path}: {exc}", "WARN")
+    for path in log_paths:
+        try:
+            lines = path.read_text(encoding="utf-8").splitlines()
+        except OSError as exc:
+            log("DICT", f"omito {path}: {exc}", "WARN")
+            continue
+        for line in lines:
+            # formato de logger._persist_payload: "<timestamp ISO> <json>"
+            _, _, raw = line.partition(" ")
+            try:
+                payload = json.loads(raw)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(payload, dict):
+                samples.append(serialize(payload))
+    if len(samples) > MAX_SAMPLES:
+        step = len(samples) / MAX_SAMPLES
+        samples = [samples[int(i * step)] for i in range(MAX_SAMPLES)]
+    return samples
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DEFAULT_SIZE) -> bytes:
+    """Greedy substring selection: the most frequent segments win.
+
+    Segments are scored by ``occurrences * length`` and the best ones are
+    placed at the end of the dictionary, where deflate distances are shortest.
+    """
+    pool = list(samples)
+    min_count = 2 if len(pool) > 1 else 1
+    counts: Counter = Counter()
+    for sample in pool:
+        for length in _SEGMENT_LENGTHS:
+            seen = {sample[i : i + length] for i in range(0, max(0, len(sample) - length + 1))}
+            counts.update(seen)
+    ranked = sorted(
+        (segment for segment, count in counts.items() if count >= min_count),
+        key=lambda segment: counts[segment] * len(segment),
+        reverse=True,
+    )
+    chosen: List[bytes] = []
+    blob = b""
+    for segment in ranked:
+        if len(blob) + len(segment) > size:
+            continue
+        half = len(segment) // 2
+        # Descarta segmentos ya cubiertos (o desplazados) por uno elegido antes.
+        if segment[:half] in blob or segment[half:] in blob:
+            continue
+        chosen.append(segment)
+        blob = b"\x00".join(chosen)
+        if len(blob) >= size:
+            break
+    return b"".join(reversed(chosen))
+
+
+def evaluate(samples: Sequence[bytes], zdict: Optional[bytes]) -> Dict[str, float]:
+    """Return size and timing figures for ``samples`` compressed with ``zdict``."""
+    raw_total = 0
+    plain_total = 0
+    dict_total = 0
+    encode_time = 0.0
+    decode_time = 0.0
+    for sample in samples:
+        raw_total += len(sample)
+        plain_total += len(compress_body(sample, b""))
+        if zdict is None:
+            continue
+        start = time.perf_counter()
+        packed = compress_body(sample, zdict)
+        encode_time += time.perf_counter() - start
+        start = time.perf_counter()
+        restored = decompress_body(packed, zdict)
+        decode_time += time.perf_counter() - start
+        if restored != sample:
+            raise RuntimeError("la descompresión no reproduce el payload original")
+        dict_total += len(packed)
+    count = max(1, len(samples))
+    return {
+        "samples": float(len(samples)),
+        "raw_bytes": raw_total / count,
+        "deflate_bytes": plain_total / count,
+        "dict_bytes": dict_total / count,
+        "ratio_plain": raw_total / plain_total if plain_total else 0.0,
+        "ratio_dict": raw_total / dict_total if dict_total else 0.0,
+        "encode_us": encode_time / count * 1e6,
+        "decode_us": decode_time / count * 1e6,
+    }
+
+
+def _report(stats: Dict[str, float]) -> None:
+    log("DICT", f"payloads evaluados: {int(stats['samples'])}", "INFO")
+    log("DICT", f"JSON promedio: {stats['raw_bytes']:.1f} B", "INFO")
+    log(
+        "DICT",
+        f"deflate sin diccionario: {stats['deflate_bytes']:.1f} B (x{stats['ratio_plain']:.2f})",
+        "INFO",
+    )
+    if stats["dict_bytes"]:
+        log(
+            "DICT",
+            f"deflate con diccionario: {stats['dict_bytes']:.1f} B (x{stats['ratio_dict']:.2f})",
+            "INFO",
+        )
+        log(
+            "DICT",
+            f"costo por payload: encode {stats['encode_us']:.1f} us, decode {stats['decode_us']:.1f} us",
+            "INFO",
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Entrena y evalúa diccionarios zlib para las tramas LoRa comprimidas."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("build", "Entrena un diccionario nuevo."), ("evaluate", "Evalúa un diccionario.")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("--id", type=int, default=1, help="ID del diccionario (1-255).")
+        cmd.add_argument(
+            "--sample",
+            type=Path,
+            action="append",
+            help=f"Payload JSON de ejemplo (default: {DEFAULT_SAMPLE.relative_to(REPO_ROOT)}).",
+        )
+        cmd.add_argument(
+            "--log",
+            type=Path,
+            action="append",
+            help=f"Log de payloads grabados (default: {DEFAULT_LOG.relative_to(REPO_ROOT)}).",
+        )
+    sub.choices["build"].add_argument(
+        "--size", type=int, default=DEFAULT_SIZE, help=f"Tamaño máximo en bytes (default: {DEFAULT_SIZE})."
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not 1 <= args.id <= 255:
+        log("DICT", "el ID del diccionario debe estar entre 1 y 255", "ERROR", sys.stderr)
+        return 2
+    samples = read_samples(args.sample or [DEFAULT_SAMPLE], args.log or [DEFAULT_LOG])
+    if not samples:
+        log("DICT", "no encontré payloads para procesar", "ERROR", sys.stderr)
+        return 1
+    if args.command == "build":
+        zdict = train_dictionary(samples, max(64, args.size))
+        path = dictionary_path(args.id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(zdict)
+        _CACHE.pop(args.id, None)
+        log("DICT", f"diccionario {args.id} guardado en {path} ({len(zdict)} B)", "SYS")
+    else:
+        zdict = load_dictionary(args.id)
+        if zdict is None:
+            log("DICT", f"no existe {dictionary_path(args.id)}; corre 'build' primero", "ERROR", sys.stderr)
+            return 1
+    _report(evaluate(samples, zdict))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
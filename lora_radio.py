@@ -0,0 +1,397 @@
+"""Radio backends used by :mod:`lora_transport`.
+
+Every backend exposes the call shape of the ``loralib`` C extension
+(``init(mode, freq_hz, sf)``, ``send(frame)`` and a non-blocking ``recv()``
+returning ``(buffer, length, packet_rssi, rssi, snr, error)``), so the
+transport does not care whether frames go through the SX127x, an in-process
+loopback or a UDP socket between two local processes. ``set_mode(mode)`` flips
+an initialised radio between sender (0) and receiver (1) for half-duplex
+exchanges such as ARQ acknowledgements.
+
+The simulated backends run every frame through a :class:`ChannelModel`
+(random loss, bit errors, RSSI/SNR with jitter and the SF demodulation floor)
+and hold it back for its time on air before ``recv()`` returns it.
+"""
+
+from __future__ import annotations
+
+import heapq
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from lora_airtime import time_on_air
+
+RecvResult = Tuple[bytes, int, int, int, int, int]
+RecvIntoResult = Tuple[int, int, int, int, int]
+
+_EMPTY: RecvResult = (b"", 0, 0, 0, 0, 0)
+_CRC_ERROR: RecvResult = (b"", 0, 0, 0, 0, -1)  # lo mismo que receive2() en lora.c
+
+# SNR mínimo demodulable por SF (datasheet SX1276, tabla 13).
+SNR_FLOOR_DB = {7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0}
+
+_UDP_HEADER = struct.Struct("!ddhhb")  # inicio, airtime, rssi, snr, error
+
+
+class RadioBackend:
+    """Common interface; the defaults describe a radio that cannot receive.
+
+    ``recv(timeout)`` with ``timeout > 0`` may block until a frame arrives when
+    ``can_wait`` is true; otherwise callers have to poll. ``send_many`` is only
+    offered when ``can_batch`` is true.
+    """
+
+    name = "base"
+    can_receive = False
+    can_wait = False
+    can_batch = False
+
+    def init(self, mode: int, freq_hz: int, spread_factor: int) -> Any:
+        raise NotImplementedError
+
+    def send(self, frame: bytes) -> Any:
+        raise NotImplementedError
+
+    def set_mode(self, mode: int) -> None:
+        raise NotImplementedError
+
+    def send_many(self, frames: Sequence[bytes]) -> List[float]:
+        """Send ``frames`` back to back; return seconds on air per frame (-1 = no TxDone)."""
+        raise NotImplementedError
+
+    def recv(self, timeout: float = 0.0) -> RecvResult:
+        return _EMPTY
+
+    def recv_into(self, buffer: bytearray, timeout: float = 0.0) -> RecvIntoResult:
+        """Write the next frame into ``buffer``; returns ``recv()`` minus the data."""
+        data, length, packet_rssi, rssi, snr, error = self.recv(timeout)
+        if length > 0:
+            buffer[:length] = data[:length]
+        return length, packet_rssi, rssi, snr, error
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+class LoralibRadio(RadioBackend):
+    """Thin pass-through to the compiled ``loralib`` module."""
+
+    name = "loralib"
+
+    def __init__(self, module: Any):
+        self._lib = module
+        self._params: Tuple[int, int] = (0, 0)
+        self.can_receive = hasattr(module, "recv")
+        # Las compilaciones viejas de lora.c no aceptan argumentos en recv().
+        self.can_wait = bool(getattr(module, "HAS_RECV_TIMEOUT", 0))
+        self.can_batch = hasattr(module, "send_many")
+
+    def init(self, mode: int, freq_hz: int, spread_factor: int) -> Any:
+        self._params = (freq_hz, spread_factor)
+        return self._lib.init(mode, freq_hz, spread_factor)
+
+    def send(self, frame: bytes) -> Any:
+        return self._lib.send(frame)
+
+    def set_mode(self, mode: int) -> None:
+        if hasattr(self._lib, "set_mode"):
+            self._lib.set_mode(mode)
+        else:
+            # Compilaciones viejas: init() resetea el chip, pero también cambia de modo.
+            self._lib.init(mode, *self._params)
+
+    def send_many(self, frames: Sequence[bytes]) -> List[float]:
+        return list(self._lib.send_many(list(frames)))
+
+    def recv(self, timeout: float = 0.0) -> RecvResult:
+        if timeout and self.can_wait:
+            return self._lib.recv(timeout)
+        return self._lib.recv()
+
+    def recv_into(self, buffer: bytearray, timeout: float = 0.0) -> RecvIntoResult:
+        if not hasattr(self._lib, "recv_into"):
+            return super().recv_into(buffer, timeout)
+        return self._lib.recv_into(buffer, timeout)
+
+    def close(self) -> None:
+        close = getattr(self._lib, "close", None)
+        if close is not None:
+            close()
+
+
+class ChannelModel:
+    """Impairments applied to each simulated frame."""
+
+    def __init__(
+        self,
+        loss: float = 0.0,
+        bit_error_rate: float = 0.0,
+        rssi_dbm: float = -80.0,
+        snr_db: float = 9.0,
+        jitter_db: float = 2.0,
+        hardware_crc: bool = True,
+        seed: Optional[int] = None,
+    ):
+        self.loss = loss
+        self.bit_error_rate = bit_error_rate
+        self.rssi_dbm = rssi_dbm
+        self.snr_db = snr_db
+        self.jitter_db = jitter_db
+        self.hardware_crc = hardware_crc
+        self._rng = random.Random(seed)
+
+    def _flip_bits(self, frame: bytes) -> Tuple[bytes, bool]:
+        if self.bit_error_rate <= 0.0:
+            return frame, False
+        data = bytearray(frame)
+        flipped = False
+        # Salta directo al siguiente bit erróneo (distribución geométrica).
+        position = -1
+        total_bits = len(data) * 8
+        while True:
+            position += 1 + int(self._rng.expovariate(self.bit_error_rate))
+            if position >= total_bits:
+                break
+            data[position >> 3] ^= 1 << (position & 7)
+            flipped = True
+        return bytes(data), flipped
+
+    def transmit(self, frame: bytes, spread_factor: int) -> Optional[Tuple[bytes, int, int, int]]:
+        """Return ``(frame, rssi, snr, error)`` as the receiver sees it, or ``None`` if lost."""
+        if self._rng.random() < self.loss:
+            return None
+        snr = self.snr_db + self._rng.gauss(0.0, self.jitter_db)
+        if snr < SNR_FLOOR_DB.get(spread_factor, -7.5):
+            return None
+        rssi = self.rssi_dbm + self._rng.gauss(0.0, self.jitter_db)
+        frame, corrupted = self._flip_bits(frame)
+        if corrupted and self.hardware_crc:
+            return b"", int(rssi), int(snr), -1
+        return frame, int(rssi), int(snr), 0
+
+
+class _SimulatedRadio(RadioBackend):
+    """Delivery queue shared by the loopback and UDP backends.
+
+    Frames become visible to ``recv()`` once their airtime has elapsed. A frame
+    that starts while the previous one is still on air aborts it, just like
+    ``txlora`` forcing the SX127x back to standby.
+    """
+
+    can_receive = True
+    can_wait = True
+    can_batch = True
+
+    def __init__(self, model: ChannelModel, clock: Callable[[], float]):
+        self.model = model
+        self._clock = clock
+        self._spread_factor = 7
+        self.mode = 0
+        self._lock = threading.Condition()
+        self._heap: List[List[Any]] = []
+        self._seq = 0
+        self._on_air: Optional[List[Any]] = None
+        self._stats: Dict[str, int] = {
+            "sent": 0,
+            "lost": 0,
+            "crc_errors": 0,
+            "aborted": 0,
+            "delivered": 0,
+        }
+
+    def init(self, mode: int, freq_hz: int, spread_factor: int) -> int:
+        self._spread_factor = spread_factor
+        self.set_mode(mode)
+        return 0
+
+    def set_mode(self, mode: int) -> None:
+        self.mode = mode
+
+    def send_many(self, frames: Sequence[bytes]) -> List[float]:
+        # Igual que lora.c: cada frame sale cuando el anterior terminó (TxDone).
+        timings = []
+        for frame in frames:
+            airtime = time_on_air(len(frame), self._spread_factor)
+            self.send(frame)
+            time.sleep(airtime)
+            timings.append(airtime)
+        return timings
+
+    def _impair(self, frame: bytes) -> Tuple[float, float, Optional[Tuple[bytes, int, int, int]]]:
+        start = self._clock()
+        airtime = time_on_air(len(frame), self._spread_factor)
+        return start, airtime, self.model.transmit(bytes(frame), self._spread_factor)
+
+    def _arrive(self, start: float, airtime: float, result: Optional[Tuple[bytes, int, int, int]]) -> None:
+        with self._lock:
+            if self._on_air is not None and self._on_air[-1] and start < self._on_air[0]:
+                self._on_air[-1] = False
+                self._stats["aborted"] += 1
+            if result is None:
+                self._stats["lost"] += 1
+                self._on_air = None
+                return
+            frame, rssi, snr, error = result
+            entry = [start + airtime, self._seq, frame, rssi, snr, error, True]
+            self._seq += 1
+            heapq.heappush(self._heap, entry)
+            self._on_air = entry
+            self._lock.notify_all()
+
+    def _pause(self, deadline: Optional[float]) -> float:
+        """Seconds until the next due frame or ``deadline`` (capped at 1 s)."""
+        now = self._clock()
+        end = self._heap[0][0] if self._heap else now + 1.0
+        if deadline is not None:
+            end = min(end, deadline)
+        return end - now
+
+    def _wait(self, deadline: Optional[float]) -> None:
+        with self._lock:
+            pause = self._pause(deadline)
+            if pause > 0:
+                self._lock.wait(pause)
+
+    def recv(self, timeout: float = 0.0) -> RecvResult:
+        deadline = self._clock() + timeout if timeout > 0 else None
+        while True:
+            result = self._pop_due()
+            if result is not _EMPTY or timeout == 0:
+                return result
+            if deadline is not None and self._clock() >= deadline:
+                return _EMPTY
+            self._wait(deadline)
+
+    def _pop_due(self) -> RecvResult:
+        now = self._clock()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deliver_at, _, frame, rssi, snr, error, alive = heapq.heappop(self._heap)
+                if not alive:
+                    continue
+                if error:
+                    self._stats["crc_errors"] += 1
+                    return _CRC_ERROR
+                self._stats["delivered"] += 1
+                return frame, len(frame), rssi, rssi, snr, 0
+        return _EMPTY
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+class LoopbackRadio(_SimulatedRadio):
+    """In-process channel: whatever this radio sends, its own ``recv()`` returns."""
+
+    name = "loopback"
+
+    def __init__(self, model: Optional[ChannelModel] = None, clock: Callable[[], float] = time.monotonic):
+        super().__init__(model or ChannelModel(), clock)
+
+    def send(self, frame: bytes) -> int:
+        with self._lock:
+            self._stats["sent"] += 1
+        self._arrive(*self._impair(frame))
+        return 0
+
+
+class UdpRadio(_SimulatedRadio):
+    """UDP link between a TX process and an RX process on the same host.
+
+    The transmitter applies the channel model and stamps each datagram with the
+    wall-clock start and airtime; the receiver releases frames once their
+    airtime is over. The process that first initialises as receiver binds
+    ``port`` and the transmitter binds ``port + 1``, so either side can answer
+    the other. Like the SX127x, a radio in sender mode is deaf: datagrams that
+    started before the last switch to receiver mode are dropped.
+    """
+
+    name = "udp"
+
+    def __init__(self, host: str, port: int, model: Optional[ChannelModel] = None):
+        super().__init__(model or ChannelModel(), time.time)
+        self.host = host
+        self.port = port
+        self._role: Optional[int] = None
+        self._listening_since = float("inf")
+        self._sock: Optional[socket.socket] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.host, self.port if self._role == 1 else self.port + 1
+
+    @property
+    def peer(self) -> Tuple[str, int]:
+        return self.host, self.port + 1 if self._role == 1 else self.port
+
+    def init(self, mode: int, freq_hz: int, spread_factor: int) -> int:
+        if self._role is None:
+            self._role = mode
+        self.close()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self.address)
+        self._sock.setblocking(False)
+        super().init(mode, freq_hz, spread_factor)
+        return 0
+
+    def set_mode(self, mode: int) -> None:
+        super().set_mode(mode)
+        self._listening_since = self._clock() if mode == 1 else float("inf")
+
+    def send(self, frame: bytes) -> int:
+        if self._sock is None:
+            raise RuntimeError("radio UDP sin inicializar")
+        start, airtime, result = self._impair(frame)
+        with self._lock:
+            self._stats["sent"] += 1
+            if result is None:
+                self._stats["lost"] += 1
+                return 0
+        data, rssi, snr, error = result
+        self._sock.sendto(_UDP_HEADER.pack(start, airtime, rssi, snr, error) + data, self.peer)
+        return 0
+
+    def _drain(self) -> None:
+        if self._sock is None:
+            return
+        while True:
+            try:
+                datagram = self._sock.recv(512)
+            except (BlockingIOError, InterruptedError):
+                break
+            if len(datagram) < _UDP_HEADER.size:
+                continue
+            start, airtime, rssi, snr, error = _UDP_HEADER.unpack_from(datagram)
+            if start < self._listening_since:
+                with self._lock:
+                    self._stats["lost"] += 1
+                continue
+            data = datagram[_UDP_HEADER.size :]
+            self._arrive(start, airtime, (data, rssi, snr, error))
+
+    def _wait(self, deadline: Optional[float]) -> None:
+        with self._lock:
+            pause = max(0.0, self._pause(deadline))
+        if self._sock is None:
+            time.sleep(pause)
+            return
+        select.select([self._sock], [], [], pause)
+
+    def _pop_due(self) -> RecvResult:
+        self._drain()
+        return super()._pop_due()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+import binascii
 import json
+import os
 import sys
 import threading
 import time
+import zlib
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 from logger import log
+from lora_airtime import AirtimeBudget, time_on_air
+from lora_dictionary import compress_body, decompress_body, load_dictionary
+from lora_radio import ChannelModel, LoopbackRadio, LoralibRadio, RadioBackend, UdpRadio
+from lora_codec import (
+    CodecError,
+    decode_payload,
+    encode_payload,
+    flatten_payload,
+    pack_delta,
+    pack_values,
+    split_layout,
+    unflatten_payload,
+    unpack_delta,
+    unpack_values,
+    value_formats,
+)
 
 def _ensure_local_loralib_path() -> None:
     """Prepend known build locations of loralib to sys.path if they exist."""
@@ -45,7 +65,42 @@ except Exception as exc:  # pragma: no cover - depends on env
 MODE_TX = "tx"
 MODE_RX = "rx"
 
+CODEC_JSON = "json"
+CODEC_BINARY = "binary"
+CODEC_DELTA = "delta"
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+
+RADIO_LORALIB = "loralib"
+RADIO_LOOPBACK = "loopback"
+RADIO_UDP = "udp"
+
+FRAME_JSON = b"J"
+FRAME_BINARY = b"B"
+FRAME_KEYFRAME = b"K"
+FRAME_DELTA = b"D"
+FRAME_ZLIB = b"Z"
+FRAME_PARITY = b"P"
+FRAME_POLL = b"Q"
+FRAME_NACK = b"N"
+FRAME_V2_MARKER = b"\x02"
+
+_DATA_KINDS = (FRAME_JSON, FRAME_BINARY, FRAME_KEYFRAME, FRAME_DELTA, FRAME_ZLIB)
+# Tramas de control del ARQ; sólo existen con cabecera v2.
+_CONTROL_KINDS = (FRAME_POLL, FRAME_NACK)
+_CONTROL_BYTES = frozenset(kind[0] for kind in _CONTROL_KINDS)
+# Byte de tipo -> constante, para no crear un objeto bytes por trama recibida.
+_KIND_BY_BYTE = {kind[0]: kind for kind in _DATA_KINDS + (FRAME_PARITY,) + _CONTROL_KINDS}
+
+EVENT_TOPIC = "events"
+SUMMARY_TOPIC = "summary"
+
 LORA_MAX_BYTES = 200
+_RECV_WAIT = 0.5
+# La FIFO del SX127x guarda hasta 255 bytes; recv_into escribe siempre aquí.
+_RX_BUFFER = bytearray(256)
+_RX_VIEW = memoryview(_RX_BUFFER)
 
 _DEFAULT_CONFIG = {
     "mode": MODE_TX,
@@ -53,9 +108,34 @@ _DEFAULT_CONFIG = {
     "spread_factor": 7,
     "poll_interval": 0.05,
     "frame_timeout": 2.0,
+    "codec": CODEC_JSON,
+    "keyframe_interval": 10,
+    "keyframe_max_age": 5.0,
+    "compression": COMPRESSION_NONE,
+    "compression_dict_id": 1,
+    "tx_queue_size": 1,
+    "tx_priority_queue_size": 8,
+    "fec_group_size": 0,
+    "frame_version": 1,
+    "max_inflight": 4,
+    "duty_cycle": 1.0,
+    "airtime_burst": 2.0,
+    "radio": RADIO_LORALIB,
+    "sim_loss": 0.0,
+    "sim_bit_error_rate": 0.0,
+    "sim_rssi_dbm": -80.0,
+    "sim_snr_db": 9.0,
+    "sim_hardware_crc": True,
+    "sim_seed": None,
+    "sim_udp_host": "127.0.0.1",
+    "sim_udp_port": 47000,
+    "reliable_topics": [],
+    "arq_window": 0.0,
+    "arq_retries": 3,
 }
 
-_CONFIG_PATH = Path(__file__).with_name("lora_config.json")
+# LORA_CONFIG permite correr TX y RX simulados en la misma máquina con archivos distintos.
+_CONFIG_PATH = Path(os.environ.get("LORA_CONFIG") or Path(__file__).with_name("lora_config.json"))
 
 
 def _coerce_int(value: Any, default: int) -> int:
@@ -86,7 +166,7 @@ def _load_config() -> Dict[str, Any]:
     if not isinstance(raw, dict):
         log("LORA", f"{_CONFIG_PATH.name} debe contener un objeto JSON; uso defaults", "ERROR", sys.stderr)
         return config
-    for key in ("mode", "frequency_hz", "spread_factor", "poll_interval", "frame_timeout"):
+    for key in _DEFAULT_CONFIG:
         if key in raw:
             config[key] = raw[key]
     mode_value = config.get("mode")
@@ -123,6 +203,114 @@ def _load_config() -> Dict[str, Any]:
         0.1,
         _coerce_float(config.get("frame_timeout"), _DEFAULT_CONFIG["frame_timeout"]),
     )
+    codec_value = config.get("codec")
+    codec_normalized = codec_value.strip().lower() if isinstance(codec_value, str) else ""
+    if codec_normalized not in (CODEC_JSON, CODEC_BINARY, CODEC_DELTA):
+        log(
+            "LORA",
+            f"Codec '{codec_value}' inválido en {_CONFIG_PATH.name}; uso '{CODEC_JSON}'",
+            "WARN",
+        )
+        codec_normalized = CODEC_JSON
+    config["codec"] = codec_normalized
+    config["keyframe_interval"] = max(
+        1,
+        _coerce_int(config.get("keyframe_interval"), _DEFAULT_CONFIG["keyframe_interval"]),
+    )
+    config["keyframe_max_age"] = max(
+        0.0,
+        _coerce_float(config.get("keyframe_max_age"), _DEFAULT_CONFIG["keyframe_max_age"]),
+    )
+    compression_value = config.get("compression")
+    compression_normalized = (
+        compression_value.strip().lower() if isinstance(compression_value, str) else ""
+    )
+    if compression_normalized not in (COMPRESSION_NONE, COMPRESSION_ZLIB):
+        log(
+            "LORA",
+            f"Compresión '{compression_value}' inválida en {_CONFIG_PATH.name}; uso '{COMPRESSION_NONE}'",
+            "WARN",
+        )
+        compression_normalized = COMPRESSION_NONE
+    config["compression"] = compression_normalized
+    config["compression_dict_id"] = _coerce_int(
+        config.get("compression_dict_id"), _DEFAULT_CONFIG["compression_dict_id"]
+    )
+    if not 1 <= config["compression_dict_id"] <= 255:
+        log(
+            "LORA",
+            f"compression_dict_id inválido en {_CONFIG_PATH.name}; uso {_DEFAULT_CONFIG['compression_dict_id']}",
+            "WARN",
+        )
+        config["compression_dict_id"] = _DEFAULT_CONFIG["compression_dict_id"]
+    for key in ("tx_queue_size", "tx_priority_queue_size"):
+        config[key] = max(1, _coerce_int(config.get(key), _DEFAULT_CONFIG[key]))
+    config["fec_group_size"] = min(
+        255,
+        max(0, _coerce_int(config.get("fec_group_size"), _DEFAULT_CONFIG["fec_group_size"])),
+    )
+    config["frame_version"] = _coerce_int(config.get("frame_version"), _DEFAULT_CONFIG["frame_version"])
+    if config["frame_version"] not in (1, 2):
+        log(
+            "LORA",
+            f"frame_version inválido en {_CONFIG_PATH.name}; uso {_DEFAULT_CONFIG['frame_version']}",
+            "WARN",
+        )
+        config["frame_version"] = _DEFAULT_CONFIG["frame_version"]
+    config["max_inflight"] = max(1, _coerce_int(config.get("max_inflight"), _DEFAULT_CONFIG["max_inflight"]))
+    config["duty_cycle"] = _coerce_float(config.get("duty_cycle"), _DEFAULT_CONFIG["duty_cycle"])
+    if not 0.0 < config["duty_cycle"] <= 1.0:
+        log(
+            "LORA",
+            f"duty_cycle inválido en {_CONFIG_PATH.name}; uso {_DEFAULT_CONFIG['duty_cycle']}",
+            "WARN",
+        )
+        config["duty_cycle"] = _DEFAULT_CONFIG["duty_cycle"]
+    config["airtime_burst"] = max(
+        0.0,
+        _coerce_float(config.get("airtime_burst"), _DEFAULT_CONFIG["airtime_burst"]),
+    )
+    radio_value = config.get("radio")
+    radio_normalized = radio_value.strip().lower() if isinstance(radio_value, str) else ""
+    if radio_normalized not in (RADIO_LORALIB, RADIO_LOOPBACK, RADIO_UDP):
+        log(
+            "LORA",
+            f"Radio '{radio_value}' inválida en {_CONFIG_PATH.name}; uso '{RADIO_LORALIB}'",
+            "WARN",
+        )
+        radio_normalized = RADIO_LORALIB
+    config["radio"] = radio_normalized
+    for key in ("sim_loss", "sim_bit_error_rate"):
+        config[key] = min(1.0, max(0.0, _coerce_float(config.get(key), _DEFAULT_CONFIG[key])))
+    for key in ("sim_rssi_dbm", "sim_snr_db"):
+        config[key] = _coerce_float(config.get(key), _DEFAULT_CONFIG[key])
+    config["sim_hardware_crc"] = bool(config.get("sim_hardware_crc"))
+    if config.get("sim_seed") is not None:
+        config["sim_seed"] = _coerce_int(config.get("sim_seed"), 0)
+    if not isinstance(config.get("sim_udp_host"), str) or not config["sim_udp_host"].strip():
+        config["sim_udp_host"] = _DEFAULT_CONFIG["sim_udp_host"]
+    config["sim_udp_port"] = _coerce_int(config.get("sim_udp_port"), _DEFAULT_CONFIG["sim_udp_port"])
+    if not 1 <= config["sim_udp_port"] <= 65535:
+        config["sim_udp_port"] = _DEFAULT_CONFIG["sim_udp_port"]
+    reliable = config.get("reliable_topics")
+    if isinstance(reliable, str):
+        reliable = [reliable]
+    if not isinstance(reliable, list) or not all(isinstance(topic, str) for topic in reliable):
+        log("LORA", f"reliable_topics inválido en {_CONFIG_PATH.name}; desactivo ARQ", "WARN")
+        reliable = []
+    config["reliable_topics"] = [topic.strip() for topic in reliable if topic.strip()]
+    if config["reliable_topics"] and config["frame_version"] != 2:
+        log(
+            "LORA",
+            f"reliable_topics requiere frame_version 2 (ID de mensaje y CRC) en {_CONFIG_PATH.name}; desactivo ARQ",
+            "WARN",
+        )
+        config["reliable_topics"] = []
+    config["arq_window"] = max(0.0, _coerce_float(config.get("arq_window"), _DEFAULT_CONFIG["arq_window"]))
+    config["arq_retries"] = min(
+        10,
+        max(0, _coerce_int(config.get("arq_retries"), _DEFAULT_CONFIG["arq_retries"])),
+    )
     return config
 
 
@@ -132,53 +320,440 @@ LORA_FREQ_HZ = _CONFIG["frequency_hz"]
 LORA_SF = _CONFIG["spread_factor"]
 _POLL_INTERVAL = _CONFIG["poll_interval"]
 _FRAME_TIMEOUT = _CONFIG["frame_timeout"]
+_CODEC = _CONFIG["codec"]
+_KEYFRAME_INTERVAL = _CONFIG["keyframe_interval"]
+_KEYFRAME_MAX_AGE = _CONFIG["keyframe_max_age"]
+_COMPRESSION = _CONFIG["compression"]
+_COMPRESSION_DICT_ID = _CONFIG["compression_dict_id"]
+_TX_QUEUE_SIZE = _CONFIG["tx_queue_size"]
+_TX_PRIORITY_QUEUE_SIZE = _CONFIG["tx_priority_queue_size"]
+_FEC_GROUP_SIZE = _CONFIG["fec_group_size"]
+_FRAME_VERSION = _CONFIG["frame_version"]
+_MAX_INFLIGHT = _CONFIG["max_inflight"]
+_DUTY_CYCLE = _CONFIG["duty_cycle"]
+_AIRTIME_BURST = _CONFIG["airtime_burst"]
+_RELIABLE_TOPICS = frozenset(_CONFIG["reliable_topics"])
+_ARQ_RETRIES = _CONFIG["arq_retries"]
+# Pausa del receptor antes de responder, para que el transmisor alcance a pasar a RX.
+_ARQ_TURNAROUND = 0.02
+# Sin arq_window explícito: respuesta del receptor (NACK de 255 fragmentos) dos veces, más margen.
+_ARQ_WINDOW = _CONFIG["arq_window"] or _ARQ_TURNAROUND + 2 * time_on_air(56, LORA_SF) + 0.1
 
 _LORA_MODE = _CONFIG["mode"]
 _LORA_READY = False
 _LORA_INIT_ERROR: Optional[str] = None
 _LORA_LINK_FAILURE = False
 
-_HAS_RECV = _LORALIB_AVAILABLE and hasattr(loralib, "recv")
+
+
+def _make_radio(config: Dict[str, Any]) -> Optional[RadioBackend]:
+    if config["radio"] == RADIO_LORALIB:
+        return LoralibRadio(loralib) if _LORALIB_AVAILABLE else None
+    model = ChannelModel(
+        loss=config["sim_loss"],
+        bit_error_rate=config["sim_bit_error_rate"],
+        rssi_dbm=config["sim_rssi_dbm"],
+        snr_db=config["sim_snr_db"],
+        hardware_crc=config["sim_hardware_crc"],
+        seed=config["sim_seed"],
+    )
+    if config["radio"] == RADIO_UDP:
+        return UdpRadio(config["sim_udp_host"], config["sim_udp_port"], model)
+    return LoopbackRadio(model)
+
+
+_RADIO = _make_radio(_CONFIG)
+_HAS_RECV = _RADIO is not None and _RADIO.can_receive
 _WARNED_RECV_UNAVAILABLE = False
 _WARNED_RX_NOT_READY = False
 _WARNED_TX_LINK_FAILURE = False
+_WARNED_CODEC_FALLBACK = False
+_WARNED_DICT_MISSING = False
+_WARNED_AIRTIME_LIMIT = False
+
+_TX_MESSAGE_IDS: Dict[str, int] = {}
+_RX_STATS: Dict[str, int] = {"crc_failures": 0, "invalid": 0}
+_ARQ_STATS: Dict[str, int] = {
+    "polls": 0,
+    "acked": 0,
+    "failed": 0,
+    "timeouts": 0,
+    "retransmitted": 0,
+    "answers": 0,
+    "refused": 0,
+}
+# Respuestas del receptor por (topic, id), para cortar consultas de un transmisor insistente.
+_ARQ_ANSWERS: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+_ARQ_BUFFER = bytearray(256)
+_ARQ_VIEW = memoryview(_ARQ_BUFFER)
+
+_AIRTIME_BUDGET = AirtimeBudget(_DUTY_CYCLE, _AIRTIME_BURST)
+# Por topic: airtime promedio por payload (EWMA) y último intervalo pedido por el agregador.
+_EMISSION: Dict[str, Dict[str, float]] = {}
+_EMISSION_ALPHA = 0.2
+
+
+def _xor_into(target: bytearray, fragment: bytes) -> None:
+    # Cada fragmento entra a la paridad como (longitud || datos) con relleno de ceros.
+    target[0] ^= len(fragment)
+    for offset, value in enumerate(fragment, 1):
+        target[offset] ^= value
+
+
+def _group_crc(fragments: List[bytes]) -> int:
+    return binascii.crc_hqx(b"".join(fragments), 0xFFFF)
+
+
+def _parity_block(fragments: List[bytes]) -> bytes:
+    block = bytearray(1 + max(len(fragment) for fragment in fragments))
+    for fragment in fragments:
+        _xor_into(block, fragment)
+    return bytes(block)
 
 
 class _FrameAssembler:
-    def __init__(self, timeout: float):
-        self._timeout = max(0.1, timeout)
-        self._pending: Dict[str, Dict[str, Any]] = {}
+    """Reassemble fragmented messages, several in flight per topic.
 
-    def push(self, topic: str, index: int, total: int, payload: bytes, now: float) -> Optional[bytes]:
+    v2 frames carry a message id, so each (topic, id) gets its own bucket and
+    the oldest one is evicted once ``max_inflight`` is exceeded. v1 frames
+    have no id and keep the historical single bucket per topic.
+    """
+
+    def __init__(self, timeout: float, max_inflight: int = 4, history: int = 32):
+        self._timeout = max(0.1, timeout)
+        self._max_inflight = max(1, max_inflight)
+        self._history = max(1, history)
+        self._pending: Dict[str, "OrderedDict[Optional[int], Dict[str, Any]]"] = {}
+        self._completed: Dict[str, Deque[int]] = {}
+        self._newest: Dict[str, int] = {}
+        self._delivered: Dict[str, Tuple[bytes, float]] = {}
+        self.stats: Dict[str, int] = {
+            "completed": 0,
+            "fec_recovered": 0,
+            "expired": 0,
+            "evicted": 0,
+            "duplicates": 0,
+            "out_of_order": 0,
+        }
+
+    def _is_completed(self, topic: str, msg_id: Optional[int]) -> bool:
+        return msg_id is not None and msg_id in self._completed.get(topic, ())
+
+    def _track_order(self, topic: str, msg_id: Optional[int]) -> None:
+        if msg_id is None:
+            return
+        newest = self._newest.get(topic)
+        if newest is None or 0 < (msg_id - newest) & 0xFFFF < 0x8000:
+            self._newest[topic] = msg_id
+        elif msg_id != newest:
+            self.stats["out_of_order"] += 1
+
+    def _bucket(
+        self,
+        topic: str,
+        msg_id: Optional[int],
+        total: int,
+        kind: bytes,
+        now: float,
+        fresh: bool = False,
+    ) -> Dict[str, Any]:
+        inflight = self._pending.setdefault(topic, OrderedDict())
+        bucket = inflight.get(msg_id)
+        if fresh or bucket is None or bucket.get("total") != total or bucket.get("kind") != kind:
+            bucket = {
+                "total": total,
+                "kind": kind,
+                "chunk": 0,
+                "buffer": None,
+                "tail": None,
+                "lengths": {},
+                "parity": {},
+                "stamp": now,
+                "last_index": 0,
+            }
+            inflight[msg_id] = bucket
+            while len(inflight) > self._max_inflight:
+                inflight.popitem(last=False)
+                self.stats["evicted"] += 1
+        inflight.move_to_end(msg_id)
+        bucket["stamp"] = now
+        return bucket
+
+    @staticmethod
+    def _store(bucket: Dict[str, Any], index: int, data: Any) -> bool:
+        """Copy ``data`` to its offset in the message buffer.
+
+        Every fragment but the last has the same size, so the first non-final
+        fragment fixes the layout; a final fragment seen before that is parked
+        in ``tail``. Returns False if ``data`` does not fit the layout.
+        """
+        total = bucket["total"]
+        chunk = bucket["chunk"]
+        if chunk == 0:
+            if index == total and total > 1:
+                bucket["tail"] = bytes(data)
+                bucket["lengths"][index] = len(data)
+                return True
+            chunk = len(data)
+            if chunk == 0:
+                return False
+            bucket["chunk"] = chunk
+            bucket["buffer"] = bytearray(total * chunk)
+            tail = bucket["tail"]
+            bucket["tail"] = None
+            if tail is not None:
+                if len(tail) <= chunk:
+                    offset = (total - 1) * chunk
+                    bucket["buffer"][offset : offset + len(tail)] = tail
+                else:
+                    del bucket["lengths"][total]
+        elif len(data) > chunk or (index < total and len(data) != chunk):
+            return False
+        offset = (index - 1) * chunk
+        bucket["buffer"][offset : offset + len(data)] = data
+        bucket["lengths"][index] = len(data)
+        return True
+
+    @staticmethod
+    def _fragment(bucket: Dict[str, Any], index: int) -> Any:
+        if bucket["chunk"] == 0:
+            return bucket["tail"]
+        offset = (index - 1) * bucket["chunk"]
+        return memoryview(bucket["buffer"])[offset : offset + bucket["lengths"][index]]
+
+    def _recover(self, bucket: Dict[str, Any]) -> None:
+        lengths = bucket["lengths"]
+        total = bucket["total"]
+        for group, (size, crc, parity) in list(bucket["parity"].items()):
+            members = range((group - 1) * size + 1, min(group * size, total) + 1)
+            missing = [idx for idx in members if idx not in lengths]
+            if len(missing) != 1:
+                continue
+            block = bytearray(parity)
+            for idx in members:
+                if idx in lengths:
+                    if lengths[idx] >= len(block):
+                        break
+                    _xor_into(block, self._fragment(bucket, idx))
+            else:
+                length = block[0]
+                if length < len(block):
+                    recovered = bytes(block[1 : 1 + length])
+                    parts = [
+                        recovered if idx == missing[0] else self._fragment(bucket, idx)
+                        for idx in members
+                    ]
+                    # El CRC del grupo delata paridades de un mensaje anterior.
+                    crc_ok = _group_crc(parts) == crc
+                    parts.clear()
+                    if crc_ok and self._store(bucket, missing[0], recovered):
+                        self.stats["fec_recovered"] += 1
+                        continue
+            del bucket["parity"][group]
+
+    def _complete(
+        self,
+        topic: str,
+        msg_id: Optional[int],
+        bucket: Dict[str, Any],
+        now: float,
+    ) -> Optional[bytearray]:
+        total = bucket["total"]
+        lengths = bucket["lengths"]
+        if bucket["parity"] and len(lengths) < total:
+            self._recover(bucket)
+        if len(lengths) != total:
+            return None
+        message = bucket["buffer"]
+        # Recorta el espacio sobrante del último fragmento (sin copiar el resto).
+        del message[(total - 1) * bucket["chunk"] + lengths[total] :]
+        del self._pending[topic][msg_id]
+        if msg_id is not None:
+            self._completed.setdefault(topic, deque(maxlen=self._history)).append(msg_id)
+        else:
+            # Sin id de mensaje, una paridad tardía podría entregar el mismo mensaje otra vez.
+            previous = self._delivered.get(topic)
+            if previous is not None and previous[0] == message and now - previous[1] <= self._timeout:
+                self.stats["duplicates"] += 1
+                return None
+            self._delivered[topic] = (message, now)
+        self.stats["completed"] += 1
+        return message
+
+    def push(
+        self,
+        topic: str,
+        index: int,
+        total: int,
+        payload: Any,
+        now: float,
+        kind: bytes = FRAME_JSON,
+        msg_id: Optional[int] = None,
+    ) -> Optional[bytearray]:
+        """Add one fragment; ``payload`` may be a view of a reused RX buffer."""
         if total <= 0:
             total = 1
         if index < 1 or index > total:
             return None
-        bucket = self._pending.get(topic)
-        if bucket is None or bucket.get("total") != total:
-            bucket = {"total": total, "frames": {}, "stamp": now}
-            self._pending[topic] = bucket
-        bucket["stamp"] = now
-        bucket["frames"][index] = payload
-        if len(bucket["frames"]) == total and all(
-            idx in bucket["frames"] for idx in range(1, total + 1)
-        ):
-            message = b"".join(bucket["frames"][idx] for idx in range(1, total + 1))
-            del self._pending[topic]
-            return message
-        return None
+        if self._is_completed(topic, msg_id):
+            self.stats["duplicates"] += 1
+            return None
+        self._track_order(topic, msg_id)
+        bucket = self._bucket(topic, msg_id, total, kind, now)
+        if index in bucket["lengths"]:
+            if msg_id is not None:
+                self.stats["duplicates"] += 1
+                return None
+            # Sin id (v1), un índice repetido es el mensaje siguiente: el anterior perdió fragmentos.
+            bucket = self._bucket(topic, msg_id, total, kind, now, fresh=True)
+        if not self._store(bucket, index, payload):
+            # Tamaño incompatible con los fragmentos previos: es otro mensaje.
+            bucket = self._bucket(topic, msg_id, total, kind, now, fresh=True)
+            if not self._store(bucket, index, payload):
+                return None
+        if index < bucket["last_index"]:
+            self.stats["out_of_order"] += 1
+        bucket["last_index"] = max(bucket["last_index"], index)
+        return self._complete(topic, msg_id, bucket, now)
+
+    def push_parity(
+        self,
+        topic: str,
+        group: int,
+        total: int,
+        group_size: int,
+        crc: int,
+        parity: bytes,
+        now: float,
+        kind: bytes = FRAME_JSON,
+        msg_id: Optional[int] = None,
+    ) -> Optional[bytes]:
+        if total <= 0 or group_size <= 0 or not parity:
+            return None
+        if group < 1 or (group - 1) * group_size >= total:
+            return None
+        if self._is_completed(topic, msg_id):
+            return None
+        bucket = self._bucket(topic, msg_id, total, kind, now)
+        bucket["parity"][group] = (group_size, crc, bytes(parity))
+        return self._complete(topic, msg_id, bucket, now)
+
+    def missing(self, topic: str, msg_id: int, total: int) -> List[int]:
+        """Fragment indexes of ``(topic, msg_id)`` not received yet (empty once delivered)."""
+        if self._is_completed(topic, msg_id):
+            return []
+        bucket = self._pending.get(topic, {}).get(msg_id)
+        if bucket is None or bucket["total"] != total:
+            return list(range(1, total + 1))
+        return [idx for idx in range(1, total + 1) if idx not in bucket["lengths"]]
 
     def cleanup(self, now: float) -> None:
-        stale = [
-            topic
-            for topic, bucket in self._pending.items()
-            if (now - bucket.get("stamp", now)) > self._timeout
-        ]
-        for topic in stale:
-            del self._pending[topic]
+        for inflight in self._pending.values():
+            stale = [
+                msg_id
+                for msg_id, bucket in inflight.items()
+                if (now - bucket.get("stamp", now)) > self._timeout
+            ]
+            for msg_id in stale:
+                del inflight[msg_id]
+                self.stats["expired"] += 1
+
+
+_FRAME_ASSEMBLER = _FrameAssembler(_FRAME_TIMEOUT, _MAX_INFLIGHT)
+
+
+class _DeltaEncoder:
+    """Emit a keyframe every ``interval`` payloads and deltas against it in between.
+
+    Deltas always reference the last keyframe (never the previous delta), so a
+    lost delta costs nothing and a lost keyframe only stalls the receiver until
+    the next one.
+    """
+
+    def __init__(self, interval: int, max_age: float):
+        self._interval = max(1, interval)
+        self._max_age = max(0.0, max_age)
+        self._seq = 0
+        self._layout: Optional[bytes] = None
+        self._formats: List[str] = []
+        self._values: List[Any] = []
+        self._since_key = 0
+        self._key_stamp = 0.0
+        self._delta_seq = 0
+
+    def reset(self) -> None:
+        self._layout = None
+
+    def encode(self, payload: Dict[str, Any], now: float) -> Tuple[bytes, bytes]:
+        layout, values = flatten_payload(payload)
+        need_key = (
+            self._layout != layout
+            or self._since_key >= self._interval
+            or (self._max_age > 0 and now - self._key_stamp >= self._max_age)
+        )
+        if not need_key:
+            self._delta_seq = (self._delta_seq + 1) & 0xFF
+            delta = pack_delta(self._formats, self._values, values)
+            body = bytes([self._seq, self._delta_seq]) + delta
+            # Si el delta ya no ahorra nada, conviene refrescar la referencia.
+            if len(body) < len(layout) + len(pack_values(self._formats, values)):
+                self._since_key += 1
+                return FRAME_DELTA, body
+        self._seq = (self._seq + 1) & 0xFF
+        self._layout = layout
+        self._formats = value_formats(layout)
+        self._values = values
+        self._since_key = 1
+        self._key_stamp = now
+        self._delta_seq = 0
+        return FRAME_KEYFRAME, bytes([self._seq]) + layout + pack_values(self._formats, values)
+
+
+class _DeltaDecoder:
+    def __init__(self) -> None:
+        self._seq: Optional[int] = None
+        self._layout = b""
+        self._formats: List[str] = []
+        self._values: List[Any] = []
+        self._last_delta_seq = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.desync_drops = 0
+        self.delta_gaps = 0
+
+    def decode(self, kind: bytes, body: bytes) -> Optional[Dict[str, Any]]:
+        if not body:
+            raise CodecError("cuerpo delta vacío")
+        if kind == FRAME_KEYFRAME:
+            layout, offset = split_layout(body[1:])
+            formats = value_formats(layout)
+            values, end = unpack_values(formats, body[1:], offset)
+            if end != len(body) - 1:
+                raise CodecError("bytes sobrantes en el keyframe")
+            self._seq = body[0]
+            self._layout = layout
+            self._formats = formats
+            self._values = values
+            self._last_delta_seq = 0
+            self.keyframes += 1
+            return unflatten_payload(layout, values)
+        if len(body) < 2:
+            raise CodecError("delta truncado")
+        if self._seq is None or body[0] != self._seq:
+            # Sin el keyframe de referencia no hay nada que reconstruir:
+            # esperamos al siguiente keyframe para resincronizar.
+            self.desync_drops += 1
+            return None
+        gap = (body[1] - self._last_delta_seq - 1) & 0xFF
+        self.delta_gaps += gap
+        self._last_delta_seq = body[1]
+        values = unpack_delta(self._formats, self._values, body, 2)
+        self.deltas += 1
+        return unflatten_payload(self._layout, values)
 
 
-_FRAME_ASSEMBLER = _FrameAssembler(_FRAME_TIMEOUT)
+_DELTA_ENCODERS: Dict[str, _DeltaEncoder] = {}
+_DELTA_DECODERS: Dict[str, _DeltaDecoder] = {}
 
 
 def _ensure_init_success(result: Any) -> None:
@@ -211,7 +786,7 @@ def _clear_link_failure() -> None:
 
 def lora_init_tx() -> None:
     global _LORA_MODE, _LORA_READY, _WARNED_RX_NOT_READY, _LORA_INIT_ERROR, _WARNED_TX_LINK_FAILURE
-    if not _LORALIB_AVAILABLE:
+    if _RADIO is None:
         _LORA_READY = False
         _LORA_INIT_ERROR = (
             f"loralib no disponible: {_LORALIB_IMPORT_ERROR}"
@@ -221,7 +796,7 @@ def lora_init_tx() -> None:
         log("LORA", f"no pude inicializar uwu (dependencia faltante): {_LORA_INIT_ERROR}", "ERROR", sys.stderr)
         return
     try:
-        result = loralib.init(0, LORA_FREQ_HZ, LORA_SF)
+        result = _RADIO.init(0, LORA_FREQ_HZ, LORA_SF)
         if result == 3:
             _mark_link_failure()
             _WARNED_TX_LINK_FAILURE = False
@@ -236,7 +811,7 @@ def lora_init_tx() -> None:
         _WARNED_RX_NOT_READY = False
         log(
             "LORA",
-            f"cargando uwu: TX @ {LORA_FREQ_HZ} Hz, SF{LORA_SF}",
+            f"cargando uwu: TX @ {LORA_FREQ_HZ} Hz, SF{LORA_SF} (radio {_RADIO.name})",
             "SYS",
         )
     except BaseException as exc:
@@ -247,7 +822,7 @@ def lora_init_tx() -> None:
 
 def lora_init_rx() -> None:
     global _LORA_MODE, _LORA_READY, _WARNED_RX_NOT_READY, _LORA_INIT_ERROR, _WARNED_TX_LINK_FAILURE
-    if not _LORALIB_AVAILABLE:
+    if _RADIO is None:
         _LORA_READY = False
         _LORA_INIT_ERROR = (
             f"loralib no disponible: {_LORALIB_IMPORT_ERROR}"
@@ -257,7 +832,7 @@ def lora_init_rx() -> None:
         log("LORA", f"no pude inicializar uwu en modo RX: {_LORA_INIT_ERROR}", "ERROR", sys.stderr)
         return
     try:
-        result = loralib.init(1, LORA_FREQ_HZ, LORA_SF)
+        result = _RADIO.init(1, LORA_FREQ_HZ, LORA_SF)
         if result == 3:
             _mark_link_failure()
             _WARNED_TX_LINK_FAILURE = False
@@ -272,7 +847,7 @@ def lora_init_rx() -> None:
         _WARNED_RX_NOT_READY = False
         log(
             "LORA",
-            f"cargando uwu: RX @ {LORA_FREQ_HZ} Hz, SF{LORA_SF}",
+            f"cargando uwu: RX @ {LORA_FREQ_HZ} Hz, SF{LORA_SF} (radio {_RADIO.name})",
             "SYS",
         )
     except BaseException as exc:
@@ -316,31 +891,148 @@ def _chunk_bytes(data: bytes, max_len: int) -> List[bytes]:
     return [data[i : i + max_len] for i in range(0, len(data), max_len)]
 
 
-def _make_frames(topic: str, payload: Dict[str, Any], max_len: int) -> List[bytes]:
+def _compress_json(body: bytes) -> Tuple[bytes, bytes, bytes]:
+    global _WARNED_DICT_MISSING
+    zdict = load_dictionary(_COMPRESSION_DICT_ID)
+    if zdict is None:
+        if not _WARNED_DICT_MISSING:
+            log(
+                "LORA",
+                f"no encontré el diccionario {_COMPRESSION_DICT_ID}; envío JSON sin comprimir",
+                "WARN",
+            )
+            _WARNED_DICT_MISSING = True
+        return FRAME_JSON, body, b""
+    packed = compress_body(body, zdict)
+    if len(packed) >= len(body):
+        return FRAME_JSON, body, b""
+    return FRAME_ZLIB, packed, bytes([_COMPRESSION_DICT_ID])
+
+
+def _encode_body(topic: str, payload: Dict[str, Any]) -> Tuple[bytes, bytes, bytes]:
+    """Return ``(kind, body, header extension)`` for ``payload``."""
+    global _WARNED_CODEC_FALLBACK
+    if _CODEC == CODEC_DELTA:
+        encoder = _DELTA_ENCODERS.get(topic)
+        if encoder is None:
+            encoder = _DeltaEncoder(_KEYFRAME_INTERVAL, _KEYFRAME_MAX_AGE)
+            _DELTA_ENCODERS[topic] = encoder
+        try:
+            kind, body = encoder.encode(payload, time.time())
+            return kind, body, b""
+        except CodecError as exc:
+            encoder.reset()
+            if not _WARNED_CODEC_FALLBACK:
+                log("LORA", f"payload fuera del esquema binario ({exc}); envío JSON", "WARN")
+                _WARNED_CODEC_FALLBACK = True
+    elif _CODEC == CODEC_BINARY:
+        try:
+            return FRAME_BINARY, encode_payload(payload), b""
+        except CodecError as exc:
+            if not _WARNED_CODEC_FALLBACK:
+                log("LORA", f"payload fuera del esquema binario ({exc}); envío JSON", "WARN")
+                _WARNED_CODEC_FALLBACK = True
     body = json.dumps(payload, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+    if _COMPRESSION == COMPRESSION_ZLIB:
+        return _compress_json(body)
+    return FRAME_JSON, body, b""
+
+
+def _next_message_id(topic: str) -> int:
+    msg_id = (_TX_MESSAGE_IDS.get(topic, -1) + 1) & 0xFFFF
+    _TX_MESSAGE_IDS[topic] = msg_id
+    return msg_id
+
+
+def _frame_header(
+    kind: bytes,
+    topic_bytes: bytes,
+    msg_id: int,
+    index: int,
+    total: int,
+    ext: bytes,
+    version: Optional[int] = None,
+) -> bytearray:
+    version = version or _FRAME_VERSION
+    head = bytearray()
+    if version == 2:
+        head.extend(FRAME_V2_MARKER)
+    head.extend(kind)
+    head.append(len(topic_bytes))
+    head.extend(topic_bytes)
+    if version == 2:
+        head.extend(msg_id.to_bytes(2, "big"))
+    head.append(index & 0xFF)
+    head.append(total & 0xFF)
+    head.extend(ext)
+    return head
+
+
+def _seal(frame: bytearray, version: Optional[int] = None) -> bytes:
+    if (version or _FRAME_VERSION) == 2:
+        frame.extend(binascii.crc_hqx(bytes(frame), 0xFFFF).to_bytes(2, "big"))
+    return bytes(frame)
+
+
+def _control_frame(kind: bytes, topic: str, msg_id: int, total: int, body: bytes = b"") -> bytes:
+    """Build an ARQ poll or NACK; always v2, whatever ``frame_version`` says."""
     topic_bytes = topic.encode("ascii", errors="ignore")[:15]
-    head_fixed = 1 + 1 + len(topic_bytes) + 1 + 1
+    frame = _frame_header(kind, topic_bytes, msg_id, 1, total, b"", version=2)
+    frame.extend(body)
+    return _seal(frame, version=2)
+
+
+def _bitmap(indexes: List[int], total: int) -> bytes:
+    bits = bytearray((total + 7) // 8)
+    for idx in indexes:
+        bits[(idx - 1) >> 3] |= 1 << ((idx - 1) & 7)
+    return bytes(bits)
+
+
+def _bitmap_indexes(bits: Any, total: int) -> List[int]:
+    return [
+        idx
+        for idx in range(1, total + 1)
+        if (idx - 1) >> 3 < len(bits) and bits[(idx - 1) >> 3] >> ((idx - 1) & 7) & 1
+    ]
+
+
+def _make_frames(topic: str, payload: Dict[str, Any], max_len: int) -> List[bytes]:
+    kind, body, ext = _encode_body(topic, payload)
+    topic_bytes = topic.encode("ascii", errors="ignore")[:15]
+    msg_id = _next_message_id(topic) if _FRAME_VERSION == 2 else 0
+    trailer = 2 if _FRAME_VERSION == 2 else 0
+    head_fixed = len(_frame_header(kind, topic_bytes, msg_id, 0, 0, ext)) + trailer
     room = max(1, max_len - head_fixed)
+    if _FEC_GROUP_SIZE:
+        # La trama de paridad lleva 5 bytes de extensión y 1 de longitud.
+        parity_head = len(_frame_header(FRAME_PARITY, topic_bytes, msg_id, 0, 0, bytes(5))) + trailer
+        room = max(1, min(room, max_len - parity_head - 1))
     parts = _chunk_bytes(body, room)
     total = len(parts)
     frames = []
     for idx, part in enumerate(parts, 1):
-        frame = bytearray()
-        frame.extend(b"J")
-        frame.append(len(topic_bytes))
-        frame.extend(topic_bytes)
-        frame.append(idx & 0xFF)
-        frame.append(total & 0xFF)
+        frame = _frame_header(kind, topic_bytes, msg_id, idx, total, ext)
         frame.extend(part)
-        frames.append(bytes(frame))
+        frames.append(_seal(frame))
+        if _FEC_GROUP_SIZE and (idx % _FEC_GROUP_SIZE == 0 or idx == total):
+            group = (idx - 1) // _FEC_GROUP_SIZE + 1
+            members = parts[(group - 1) * _FEC_GROUP_SIZE : idx]
+            parity_ext = bytearray([_FEC_GROUP_SIZE])
+            parity_ext.extend(kind)
+            parity_ext.append(ext[0] if ext else 0)
+            parity_ext.extend(_group_crc(members).to_bytes(2, "big"))
+            parity = _frame_header(FRAME_PARITY, topic_bytes, msg_id, group, total, bytes(parity_ext))
+            parity.extend(_parity_block(members))
+            frames.append(_seal(parity))
     return frames
 
 
-def send_to_lora(payload: Dict[str, Any]) -> None:
+def send_to_lora(payload: Dict[str, Any], topic: str = "sensors") -> None:
     if _LORA_MODE != MODE_TX:
         log("LORA", "modo RX activo; omito envío", "WARN")
         return
-    if not _LORALIB_AVAILABLE:
+    if _RADIO is None:
         log("LORA", "loralib no está disponible; omito envío", "ERROR", sys.stderr)
         return
     if _LORA_LINK_FAILURE:
@@ -358,42 +1050,471 @@ def send_to_lora(payload: Dict[str, Any]) -> None:
         log("LORA", "no listo; omito envío (modo test)", "WARN")
         return
     try:
-        frames = _make_frames("sensors", payload, LORA_MAX_BYTES)
-        if len(frames) == 1:
-            loralib.send(frames[0])
-            log("LORA", f"Enviado uwu: {len(frames[0])} B (1/1)", "INFO")
-        else:
-            for idx, frame in enumerate(frames, 1):
-                loralib.send(frame)
-                log("LORA", f"Enviado uwu: frame {idx}/{len(frames)} ({len(frame)} B)", "INFO")
-                time.sleep(0.05)
+        frames = _make_frames(topic, payload, LORA_MAX_BYTES)
+        airtimes = [time_on_air(len(frame), LORA_SF) for frame in frames]
+        _record_payload_airtime(topic, sum(airtimes))
+        if _transmit(frames, airtimes) and topic in _RELIABLE_TOPICS:
+            _await_ack(topic, frames)
     except Exception as exc:
         log("LORA", f"falló envío uwu: {exc}", "ERROR", sys.stderr)
 
 
+def _transmit(frames: List[bytes], airtimes: Optional[List[float]] = None) -> bool:
+    """Put ``frames`` on air within the airtime budget; False if the radio gave up."""
+    if airtimes is None:
+        airtimes = [time_on_air(len(frame), LORA_SF) for frame in frames]
+    if len(frames) > 1 and _RADIO.can_batch:
+        return _send_batch(frames, airtimes)
+    for idx, (frame, airtime) in enumerate(zip(frames, airtimes), 1):
+        # loralib.send no espera TxDone: el bucket respeta el airtime del frame previo.
+        _AIRTIME_BUDGET.acquire(airtime)
+        _RADIO.send(frame)
+        log(
+            "LORA",
+            f"Enviado uwu: frame {idx}/{len(frames)} ({len(frame)} B, {airtime * 1000:.0f} ms)",
+            "INFO",
+        )
+    return True
+
+
+def _send_batch(frames: List[bytes], airtimes: List[float]) -> bool:
+    # Un solo cruce a C: lora.c encadena los frames esperando TxDone de cada uno,
+    # así el espaciado lo marca la radio y no el scheduler de Python.
+    _AIRTIME_BUDGET.acquire(sum(airtimes), frames=len(frames))
+    timings = _RADIO.send_many(frames)
+    for idx, (frame, elapsed) in enumerate(zip(frames, timings), 1):
+        if elapsed < 0:
+            log("LORA", f"sin TxDone en frame {idx}/{len(frames)}; corto el envío uwu", "ERROR", sys.stderr)
+            return False
+        log(
+            "LORA",
+            f"Enviado uwu: frame {idx}/{len(frames)} ({len(frame)} B, {elapsed * 1000:.0f} ms)",
+            "INFO",
+        )
+    return True
+
+
+def _listen_for_nack(topic: str, msg_id: int, total: int) -> Optional[List[int]]:
+    """Switch to RX for ``arq_window`` seconds; return the missing indexes or None on timeout."""
+    # El poll tiene que terminar de salir antes de apagar el transmisor.
+    time.sleep(_AIRTIME_BUDGET.busy_for(time.monotonic()))
+    _RADIO.set_mode(1)
+    try:
+        deadline = time.monotonic() + _ARQ_WINDOW
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            length, _, _, _, error = _RADIO.recv_into(_ARQ_BUFFER, remaining if _RADIO.can_wait else 0.0)
+            if error != 0 or length <= 0:
+                if not _RADIO.can_wait:
+                    time.sleep(min(remaining, max(_POLL_INTERVAL, 0.005)))
+                continue
+            parsed = _parse_frame(_ARQ_VIEW[:length])
+            if (
+                parsed is not None
+                and parsed["kind"] == FRAME_NACK
+                and parsed["topic"] == topic
+                and parsed["message_id"] == msg_id
+            ):
+                return _bitmap_indexes(parsed["payload"], total)
+    finally:
+        _RADIO.set_mode(0)
+
+
+def _await_ack(topic: str, frames: List[bytes]) -> bool:
+    """Selective repeat: poll the receiver and resend only what its NACK lists.
+
+    The data frames of the message stay in a retransmit cache keyed by
+    fragment index; parity frames are not repeated. Each round costs one poll
+    and one listening window, up to ``arq_retries`` extra rounds.
+    """
+    cache: Dict[int, bytes] = {}
+    msg_id = total = 0
+    for frame in frames:
+        parsed = _parse_frame(frame)
+        if parsed is not None and not parsed["parity"]:
+            cache[int(parsed["index"])] = frame
+            msg_id, total = int(parsed["message_id"]), int(parsed["total"])
+    for _ in range(_ARQ_RETRIES + 1):
+        _ARQ_STATS["polls"] += 1
+        if not _transmit([_control_frame(FRAME_POLL, topic, msg_id, total)]):
+            break
+        missing = _listen_for_nack(topic, msg_id, total)
+        if missing is None:
+            _ARQ_STATS["timeouts"] += 1
+            continue
+        if not missing:
+            _ARQ_STATS["acked"] += 1
+            log("LORA", f"ARQ: {topic}#{msg_id} confirmado uwu", "DEBUG")
+            return True
+        resend = [cache[idx] for idx in missing if idx in cache]
+        _ARQ_STATS["retransmitted"] += len(resend)
+        log("LORA", f"ARQ: reenvío {len(resend)}/{total} fragmentos de {topic}#{msg_id}", "INFO")
+        if not _transmit(resend):
+            break
+    _ARQ_STATS["failed"] += 1
+    log("LORA", f"ARQ: {topic}#{msg_id} sin confirmar tras {_ARQ_RETRIES + 1} consultas", "WARN")
+    return False
+
+
+def _answer_poll(frame: Any) -> None:
+    """Receiver side: reply to a poll with the bitmap of missing fragments (empty = ACK)."""
+    parsed = _parse_frame(frame)
+    if parsed is None or parsed["kind"] != FRAME_POLL:
+        return
+    topic, msg_id, total = parsed["topic"], int(parsed["message_id"]), int(parsed["total"])
+    key = (topic, msg_id)
+    answers = _ARQ_ANSWERS.pop(key, 0) + 1
+    _ARQ_ANSWERS[key] = answers
+    while len(_ARQ_ANSWERS) > 64:
+        _ARQ_ANSWERS.popitem(last=False)
+    if answers > _ARQ_RETRIES + 1:
+        _ARQ_STATS["refused"] += 1
+        return
+    missing = _FRAME_ASSEMBLER.missing(topic, msg_id, total)
+    reply = _control_frame(FRAME_NACK, topic, msg_id, total, _bitmap(missing, total) if missing else b"")
+    time.sleep(_ARQ_TURNAROUND)
+    _RADIO.set_mode(0)
+    try:
+        _transmit([reply])
+        time.sleep(_AIRTIME_BUDGET.busy_for(time.monotonic()))
+    finally:
+        _RADIO.set_mode(1)
+    _ARQ_STATS["answers"] += 1
+    log(
+        "LORA",
+        f"ARQ: {topic}#{msg_id} -> " + (f"faltan {missing}" if missing else "ACK"),
+        "DEBUG",
+    )
+
+
+def _emission(topic: str) -> Dict[str, float]:
+    entry = _EMISSION.get(topic)
+    if entry is None:
+        entry = _EMISSION[topic] = {"payload_airtime": 0.0, "requested": 0.0, "interval": 0.0}
+    return entry
+
+
+def _record_payload_airtime(topic: str, airtime: float) -> None:
+    entry = _emission(topic)
+    previous = entry["payload_airtime"]
+    entry["payload_airtime"] = airtime if previous == 0.0 else previous + _EMISSION_ALPHA * (airtime - previous)
+
+
+def _projected_load() -> float:
+    """Fraction of airtime all topics would use at their requested cadence."""
+    return sum(
+        entry["payload_airtime"] / entry["requested"]
+        for entry in _EMISSION.values()
+        if entry["requested"] > 0.0
+    )
+
+
+# Fracción del intervalo pedido a partir de la cual el estiramiento se avisa.
+EMISSION_STRETCH_WARN = 0.01
+
+
+def emission_interval(requested: float, topic: str = "sensors") -> float:
+    """Stretch ``requested`` so the payloads of every topic fit the airtime budget.
+
+    When the topics together ask for more than ``duty_cycle``, all of them are
+    slowed down by the same factor so each keeps its share of the channel.
+    """
+    global _WARNED_AIRTIME_LIMIT
+    entry = _emission(topic)
+    entry["requested"] = requested
+    interval = requested
+    if entry["payload_airtime"] > 0.0:
+        interval = max(interval, _AIRTIME_BUDGET.sustainable_interval(entry["payload_airtime"]))
+    load = _projected_load()
+    if load > _DUTY_CYCLE:
+        interval = max(interval, requested * load / _DUTY_CYCLE + _AIRTIME_BUDGET.guard)
+    entry["interval"] = interval
+    # Estirar solo el guard (o menos del 1 %) no vale un WARN; se redondea a µs por los flotantes.
+    stretch = round(interval - requested, 6)
+    significant = stretch > max(_AIRTIME_BUDGET.guard, requested * EMISSION_STRETCH_WARN)
+    if significant and not _WARNED_AIRTIME_LIMIT:
+        log(
+            "LORA",
+            f"SF{LORA_SF} no alcanza para emitir '{topic}' cada {requested * 1000:.0f} ms; "
+            f"ajusto a {interval * 1000:.0f} ms (duty {_DUTY_CYCLE:.0%})",
+            "WARN",
+        )
+        _WARNED_AIRTIME_LIMIT = True
+    return interval
+
+
+# Al parar, tiempo máximo para vaciar el carril prioritario (eventos) antes de descartarlo.
+TX_STOP_DRAIN = 1.0
+
+
+class _TxScheduler:
+    """Bounded TX queue drained by a dedicated thread.
+
+    Every topic has its own normal lane that keeps only the newest
+    ``capacity`` payloads: a fresh snapshot supersedes the ones of the same
+    topic still waiting. The priority lane (events) is drained first and only
+    drops entries when it overflows; then the lane with the highest ``rank``
+    wins, oldest payload first among equal ranks.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any], str], None],
+        capacity: int,
+        priority_capacity: int,
+    ):
+        self._send = send
+        self._normal: Dict[str, Deque[Tuple[float, str, Dict[str, Any]]]] = {}
+        self._ranks: Dict[str, int] = {}
+        self._priority: Deque[Tuple[float, str, Dict[str, Any]]] = deque()
+        self._capacity = max(1, capacity)
+        self._priority_capacity = max(1, priority_capacity)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, float] = {
+            "enqueued": 0,
+            "sent": 0,
+            "superseded": 0,
+            "dropped": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, payload: Dict[str, Any], topic: str, priority: bool, rank: int = 0) -> None:
+        with self._cond:
+            if priority:
+                lane, limit = self._priority, self._priority_capacity
+            else:
+                lane, limit = self._normal.setdefault(topic, deque()), self._capacity
+                self._ranks[topic] = rank
+            if len(lane) >= limit:
+                lane.popleft()
+                self._stats["dropped" if priority else "superseded"] += 1
+            lane.append((time.monotonic(), topic, payload))
+            self._stats["enqueued"] += 1
+            self._cond.notify()
+
+    def _pending(self) -> int:
+        return len(self._priority) + sum(len(lane) for lane in self._normal.values())
+
+    def _next(self, stop_event: threading.Event) -> Optional[Tuple[float, str, Dict[str, Any]]]:
+        with self._cond:
+            while not self._pending():
+                if stop_event.is_set():
+                    return None
+                self._cond.wait(0.2)
+            if self._priority:
+                return self._priority.popleft()
+            topic = max(
+                (topic for topic, lane in self._normal.items() if lane),
+                key=lambda topic: (self._ranks.get(topic, 0), -self._normal[topic][0][0]),
+            )
+            return self._normal[topic].popleft()
+
+    def _transmit(self, item: Tuple[float, str, Dict[str, Any]]) -> None:
+        queued_at, topic, payload = item
+        wait = time.monotonic() - queued_at
+        with self._cond:
+            self._stats["wait_total"] += wait
+            self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+        try:
+            self._send(payload, topic)
+        except Exception as exc:
+            log("LORA", f"error inesperado en hilo TX uwu: {exc}", "ERROR", sys.stderr)
+        with self._cond:
+            self._stats["sent"] += 1
+
+    def _flush_priority(self, timeout: float) -> None:
+        """Send the events still queued at shutdown; count the rest as dropped."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                if not self._priority:
+                    return
+                item = self._priority.popleft()
+            self._transmit(item)
+        with self._cond:
+            left = len(self._priority)
+            self._priority.clear()
+            self._stats["dropped"] += left
+        if left:
+            log("LORA", f"Apagando con {left} eventos sin enviar; los descarto", "WARN")
+
+    def run(self, stop_event: threading.Event, drain: float = TX_STOP_DRAIN) -> None:
+        while not stop_event.is_set():
+            item = self._next(stop_event)
+            if item is None:
+                break
+            self._transmit(item)
+        self._flush_priority(drain)
+
+    def start(self, stop_event: threading.Event) -> threading.Thread:
+        self._thread = threading.Thread(
+            target=self.run,
+            args=(stop_event,),
+            name="LoRaTX",
+            daemon=True,
+        )
+        self._thread.start()
+        return self._thread
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending()
+        dequeued = stats["enqueued"] - stats["superseded"] - stats["dropped"] - stats["pending"]
+        stats["wait_mean"] = stats.pop("wait_total") / dequeued if dequeued > 0 else 0.0
+        return stats
+
+
+_TX_SCHEDULER = _TxScheduler(
+    lambda payload, topic: send_to_lora(payload, topic),
+    _TX_QUEUE_SIZE,
+    _TX_PRIORITY_QUEUE_SIZE,
+)
+
+
+def start_tx_worker(stop_event: threading.Event) -> threading.Thread:
+    """Start the TX thread that drains :func:`enqueue_payload`."""
+    return _TX_SCHEDULER.start(stop_event)
+
+
+def enqueue_payload(
+    payload: Dict[str, Any],
+    topic: str = "sensors",
+    priority: bool = False,
+    rank: int = 0,
+) -> None:
+    """Queue ``payload`` for the TX thread (or send inline if it is not running).
+
+    ``rank`` orders the normal lanes of different topics (higher first).
+    """
+    if not _TX_SCHEDULER.running():
+        send_to_lora(payload, topic)
+        return
+    _TX_SCHEDULER.submit(payload, topic, priority, rank)
+
+
+def enqueue_event(payload: Dict[str, Any], topic: Optional[str] = None) -> None:
+    """Queue ``payload`` on the priority lane.
+
+    Events travel on ``sensors`` unless ``events`` is a reliable topic, so
+    they get acknowledged without acknowledging every snapshot.
+    """
+    if topic is None:
+        topic = EVENT_TOPIC if EVENT_TOPIC in _RELIABLE_TOPICS else "sensors"
+    enqueue_payload(payload, topic, priority=True)
+
+
+def is_reliable(topic: str) -> bool:
+    return topic in _RELIABLE_TOPICS
+
+
+def send_summary(payload: Dict[str, Any]) -> None:
+    """Send the final summary if ``summary`` is a reliable topic (blocks until ACK or give-up)."""
+    if SUMMARY_TOPIC in _RELIABLE_TOPICS and _LORA_READY:
+        send_to_lora(payload, SUMMARY_TOPIC)
+
+
+def get_arq_stats() -> Dict[str, int]:
+    return dict(_ARQ_STATS)
+
+
+def get_tx_stats() -> Dict[str, float]:
+    return _TX_SCHEDULER.stats()
+
+
+def get_airtime_stats() -> Dict[str, float]:
+    """Projected (requested cadence) vs. actual channel utilisation."""
+    stats = _AIRTIME_BUDGET.stats()
+    stats["duty_cycle"] = _DUTY_CYCLE
+    paced = [entry for entry in _EMISSION.values() if entry["requested"] > 0.0]
+    stats["topics"] = len(paced)
+    stats["payload_airtime"] = sum(entry["payload_airtime"] for entry in paced)
+    stats["requested_interval"] = min((entry["requested"] for entry in paced), default=0.0)
+    stats["emit_interval"] = min((entry["interval"] for entry in paced), default=0.0)
+    stats["projected_utilisation"] = _projected_load()
+    return stats
+
+
+def get_rx_stats() -> Dict[str, int]:
+    return {**_FRAME_ASSEMBLER.stats, **_RX_STATS}
+
+
+def get_radio_stats() -> Dict[str, int]:
+    """Channel counters of the simulated backends (empty for loralib)."""
+    return _RADIO.stats() if _RADIO is not None else {}
+
+
+def encode_frames(payload: Dict[str, Any], topic: str = "sensors") -> List[bytes]:
+    """Frames :func:`send_to_lora` would transmit for ``payload``."""
+    return _make_frames(topic, payload, LORA_MAX_BYTES)
+
+
 def _parse_frame(frame: bytes) -> Optional[Dict[str, Any]]:
+    """Parse header fields; ``payload`` is a view into ``frame``, not a copy."""
+    frame = memoryview(frame)
+    msg_id: Optional[int] = None
+    if frame[:1] == FRAME_V2_MARKER:
+        if len(frame) < 3 or binascii.crc_hqx(frame[:-2], 0xFFFF) != int.from_bytes(frame[-2:], "big"):
+            _RX_STATS["crc_failures"] += 1
+            return None
+        frame = frame[1:-2]
+        msg_id = -1
     if len(frame) < 5:
         return None
-    if frame[0] != ord("J"):
+    kind = _KIND_BY_BYTE.get(frame[0])
+    if kind is None:
         return None
     topic_len = frame[1]
-    head = 2 + topic_len + 2
+    pos = 2 + topic_len
+    if msg_id is not None:
+        if pos + 2 > len(frame):
+            return None
+        msg_id = int.from_bytes(frame[pos : pos + 2], "big")
+        pos += 2
+    if kind == FRAME_PARITY:
+        ext_len = 5
+    else:
+        ext_len = 1 if kind == FRAME_ZLIB else 0
+    head = pos + 2 + ext_len
     if head > len(frame):
         return None
-    topic_bytes = frame[2 : 2 + topic_len]
-    topic = topic_bytes.decode("ascii", errors="ignore") or "sensors"
-    index = frame[2 + topic_len] or 1
-    total = frame[3 + topic_len] or 1
-    payload = frame[4 + topic_len :]
-    return {
+    topic = str(frame[2 : 2 + topic_len], "ascii", "ignore") or "sensors"
+    index = frame[pos] or 1
+    total = frame[pos + 1] or 1
+    ext = frame[pos + 2 : head]
+    parsed = {
+        "kind": kind,
         "topic": topic,
+        "message_id": msg_id,
         "index": index,
         "total": total,
-        "payload": payload,
+        "dict_id": ext[0] if kind == FRAME_ZLIB else 0,
+        "payload": frame[head:],
+        "parity": False,
     }
+    if kind == FRAME_PARITY:
+        data_kind = _KIND_BY_BYTE.get(ext[1])
+        if data_kind is None or data_kind == FRAME_PARITY:
+            return None
+        parsed.update(
+            kind=data_kind,
+            parity=True,
+            group_size=ext[0],
+            dict_id=ext[2],
+            crc=int.from_bytes(ext[3:5], "big"),
+        )
+    return parsed
 
 
-def poll_received_payload() -> Optional[Dict[str, Any]]:
+def poll_received_payload(timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Read one frame; ``timeout > 0`` blocks in the radio until one arrives."""
     global _WARNED_RECV_UNAVAILABLE, _WARNED_RX_NOT_READY
     if _LORA_MODE != MODE_RX:
         return None
@@ -408,31 +1529,83 @@ def poll_received_payload() -> Optional[Dict[str, Any]]:
             _WARNED_RX_NOT_READY = True
         return None
     try:
-        buffer, length, last_rssi, current_rssi, snr, error = loralib.recv()
+        length, last_rssi, current_rssi, snr, error = _RADIO.recv_into(_RX_BUFFER, timeout)
     except Exception as exc:
         log("LORA", f"falló recv uwu: {exc}", "ERROR", sys.stderr)
         return None
     if error != 0 or length <= 0:
         return None
-    frame = bytes(buffer[:length])
+    frame = _RX_VIEW[:length]
+    if length > 2 and frame[0] == FRAME_V2_MARKER[0] and frame[1] in _CONTROL_BYTES:
+        try:
+            _answer_poll(frame)
+        except Exception as exc:
+            log("LORA", f"no pude responder al ARQ uwu: {exc}", "ERROR", sys.stderr)
+        return None
+    # El assembler copia cada fragmento a su mensaje antes del siguiente recv_into.
+    return decode_frame(frame, last_rssi, current_rssi, snr)
+
+
+def decode_frame(
+    frame: bytes,
+    last_rssi: int = 0,
+    current_rssi: int = 0,
+    snr: int = 0,
+    now: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """Feed one raw frame to the reassembler; return the packet once it is complete."""
     parsed = _parse_frame(frame)
     if not parsed:
+        _RX_STATS["invalid"] += 1
         log("LORA", f"frame inválido uwu: {frame.hex()}", "WARN")
         return None
-    now = time.time()
+    if parsed["kind"] in _CONTROL_KINDS:
+        return None
+    now = time.time() if now is None else now
     _FRAME_ASSEMBLER.cleanup(now)
-    assembled = _FRAME_ASSEMBLER.push(
-        parsed["topic"],
-        int(parsed["index"]),
-        int(parsed["total"]),
-        parsed["payload"],
-        now,
-    )
+    if parsed["parity"]:
+        assembled = _FRAME_ASSEMBLER.push_parity(
+            parsed["topic"],
+            int(parsed["index"]),
+            int(parsed["total"]),
+            int(parsed["group_size"]),
+            int(parsed["crc"]),
+            parsed["payload"],
+            now,
+            parsed["kind"],
+            parsed["message_id"],
+        )
+    else:
+        assembled = _FRAME_ASSEMBLER.push(
+            parsed["topic"],
+            int(parsed["index"]),
+            int(parsed["total"]),
+            parsed["payload"],
+            now,
+            parsed["kind"],
+            parsed["message_id"],
+        )
     if assembled is None:
         return None
     try:
-        payload_json = json.loads(assembled.decode("utf-8"))
-    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        if parsed["kind"] == FRAME_BINARY:
+            payload_json = decode_payload(assembled)
+        elif parsed["kind"] in (FRAME_KEYFRAME, FRAME_DELTA):
+            decoder = _DELTA_DECODERS.setdefault(parsed["topic"], _DeltaDecoder())
+            payload_json = decoder.decode(parsed["kind"], assembled)
+            if payload_json is None:
+                if decoder.desync_drops == 1 or decoder.desync_drops % 50 == 0:
+                    log("LORA", "delta sin keyframe de referencia; espero resincronizar uwu", "WARN")
+                return None
+        elif parsed["kind"] == FRAME_ZLIB:
+            zdict = load_dictionary(int(parsed["dict_id"]))
+            if zdict is None:
+                log("LORA", f"no tengo el diccionario {parsed['dict_id']}; descarto payload", "ERROR", sys.stderr)
+                return None
+            payload_json = json.loads(decompress_body(assembled, zdict).decode("utf-8"))
+        else:
+            payload_json = json.loads(assembled.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError, CodecError, zlib.error) as exc:
         log("LORA", f"no pude decodificar payload uwu: {exc}", "ERROR", sys.stderr)
         return None
     metadata = {
@@ -441,6 +1614,7 @@ def poll_received_payload() -> Optional[Dict[str, Any]]:
         "snr": snr,
         "frame_index": int(parsed["index"]),
         "frame_total": int(parsed["total"]),
+        "message_id": parsed["message_id"],
     }
     return {
         "topic": parsed["topic"],
@@ -474,29 +1648,58 @@ def receive_loop(
         log("LORA", "LoRa RX no está listo; seguiré esperando reintentos", "WARN")
     listener = handler or _default_rx_handler
     interval = _POLL_INTERVAL if poll_interval is None else max(0.0, float(poll_interval))
+    can_wait = _RADIO is not None and _RADIO.can_wait
+    if can_wait:
+        log("LORA", "recv bloqueante disponible; espero RxDone sin sondear uwu", "DEBUG")
     while stop_event is None or not stop_event.is_set():
-        packet = poll_received_payload()
+        # Con recv(timeout) la espera ocurre en la radio (sin GIL); el timeout
+        # sólo acota cuánto tarda en notarse stop_event.
+        waiting = can_wait and _LORA_READY
+        packet = poll_received_payload(_RECV_WAIT if waiting else 0.0)
         if packet is not None:
             try:
                 listener(packet)
             except Exception as exc:
                 log("LORA", f"handler RX lanzó excepción uwu: {exc}", "ERROR", sys.stderr)
-        if interval > 0:
+        if not waiting and interval > 0:
             time.sleep(interval)
 
 
 __all__ = [
+    "CODEC_BINARY",
+    "CODEC_DELTA",
+    "CODEC_JSON",
+    "COMPRESSION_NONE",
+    "COMPRESSION_ZLIB",
+    "EVENT_TOPIC",
     "MODE_RX",
     "MODE_TX",
+    "RADIO_LOOPBACK",
+    "RADIO_LORALIB",
+    "RADIO_UDP",
+    "SUMMARY_TOPIC",
     "configure_from_config",
+    "decode_frame",
+    "emission_interval",
+    "enqueue_event",
+    "enqueue_payload",
+    "encode_frames",
+    "get_airtime_stats",
+    "get_arq_stats",
+    "get_radio_stats",
+    "get_rx_stats",
+    "get_tx_stats",
     "record_init_error",
     "get_mode",
     "get_init_error",
     "is_ready",
+    "is_reliable",
     "has_link_failure",
     "lora_init_rx",
     "lora_init_tx",
     "poll_received_payload",
     "receive_loop",
+    "send_summary",
     "send_to_lora",
+    "start_tx_worker",
 ]
@@ -62,7 +62,11 @@ def open_connection(
 
 def read_fix(conn) -> Optional[Fix]:
     """Parse the next GGA/RMC fix from the serial stream."""
-    raw = conn.readline()
+    return parse_sentence(conn.readline())
+
+
+def parse_sentence(raw: bytes) -> Optional[Fix]:
+    """Parse one raw serial line; ``None`` unless it is a valid GGA/RMC fix."""
     if not raw:
         return None
 
@@ -1,38 +1,73 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-import queue
 import signal
 import threading
 from typing import List
 
 from aggregator import ActivityTracker, create_aggregator_thread
-from logger import log
+from fast_trigger import TriggerPath
+from imu_process import ImuProcess, imu_process_enabled
+from logger import load_config, log
 from lora_transport import (
     MODE_RX,
     MODE_TX,
     configure_from_config,
+    emission_interval,
+    enqueue_event,
+    enqueue_payload,
     is_ready,
     receive_loop,
-    send_to_lora,
     record_init_error,
+    send_summary,
+    start_tx_worker,
 )
-from sensor_messages import SensorMessage
+from sensor_buffers import SensorBuffers
+from sensor_replay import load_replay, replay_thread, simulated_gpio
 from sensor_workers import SENSORS, sensor_threads
 from summaries import log_final_summary, log_start_summary
+from topics import load_topics
 
 def _run_transmitter(stop_event: threading.Event) -> None:
     log("SYSTEM", "Arrancando el agregador bonito uwu", "SYS")
     log_start_summary()
-    inbox: queue.Queue[SensorMessage] = queue.Queue()
+    inbox = SensorBuffers(SENSORS)
     tracker = ActivityTracker(SENSORS)
-    sensor_thread_list = list(sensor_threads(inbox, stop_event))
-    aggregator_thread = create_aggregator_thread(inbox, stop_event, SENSORS, tracker, send_to_lora)
+    config = load_config()
+    replay = load_replay(config)
+    sensor_thread_list: List[threading.Thread] = []
+    if replay is not None:
+        # Al reproducir una grabación el GPIO nunca se toca.
+        trigger = TriggerPath(stop_event, actuate=simulated_gpio)
+        sensor_thread_list.append(replay_thread(inbox, stop_event, *replay, trigger))
+    else:
+        trigger = TriggerPath(stop_event)
+        if imu_process_enabled(config):
+            imu = ImuProcess(stop_event, trigger)
+            inbox.attach(imu.ring)
+            sensor_thread_list.append(imu.thread)
+        sensor_thread_list.extend(sensor_threads(inbox, stop_event, trigger, mpu_thread=not sensor_thread_list))
+    aggregator_thread = create_aggregator_thread(
+        inbox,
+        stop_event,
+        SENSORS,
+        tracker,
+        enqueue_payload,
+        send_event=enqueue_event,
+        pace=emission_interval,
+        topics=load_topics(SENSORS, config),
+        trigger=trigger,
+    )
     workers: List[threading.Thread] = sensor_thread_list + [aggregator_thread]
 
+    tx_thread = start_tx_worker(stop_event)
+    log("SYSTEM", f"Hilo {tx_thread.name} arriba uwu", "SYS")
+    gpio_thread = trigger.start()
+    log("SYSTEM", f"Hilo {gpio_thread.name} arriba uwu", "SYS")
     for worker in workers:
         worker.start()
         log("SYSTEM", f"Hilo {worker.name} arriba uwu", "SYS")
+    workers.extend((tx_thread, gpio_thread))
 
     try:
         while any(worker.is_alive() for worker in sensor_thread_list):
@@ -47,7 +82,7 @@ def _run_transmitter(stop_event: threading.Event) -> None:
                     worker.join(timeout=1.0)
                 except Exception:
                     pass
-        log_final_summary(tracker)
+        send_summary(log_final_summary(tracker, trigger.records))
         log("SYSTEM", "Agregador apagado uwu", "SYS")
 
 
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sensor_messages import SensorMessage
+
+DEFAULT_CAPACITY = 64
+
+
+class SensorRing:
+    """Recent samples of one sensor plus its latest value, written by one worker.
+
+    There is no lock: ``push`` stores the slot and only then bumps ``seq``,
+    and CPython makes each of those assignments atomic, so a reader that
+    looks at ``seq`` first never sees an unwritten slot. A reader that falls
+    ``capacity`` or more samples behind loses the oldest ones (the slot the
+    worker may be rewriting is never returned).
+    """
+
+    __slots__ = ("sensor", "capacity", "seq", "latest", "_slots")
+
+    def __init__(self, sensor: str, capacity: int = DEFAULT_CAPACITY):
+        self.sensor = sensor
+        self.capacity = max(1, capacity)
+        self.seq = 0
+        self.latest: Optional[SensorMessage] = None
+        self._slots: List[Optional[SensorMessage]] = [None] * self.capacity
+
+    def push(self, message: SensorMessage) -> None:
+        seq = self.seq
+        self._slots[seq % self.capacity] = message
+        self.latest = message
+        self.seq = seq + 1
+
+    def read_since(self, cursor: int) -> Tuple[List[SensorMessage], int, int]:
+        """Return ``(samples after cursor, new cursor, samples lost to overwrites)``."""
+        end = self.seq
+        start = max(cursor, end - self.capacity)
+        samples = [self._slots[idx % self.capacity] for idx in range(start, end)]
+        # Si el worker dio la vuelta al anillo mientras copiábamos, el frente ya no es válido.
+        # ``push`` escribe el slot antes de subir ``seq``: con seq == S el índice
+        # S - capacity ya puede estar pisado, por eso el +1.
+        overwritten = min(self.seq - self.capacity + 1, end) - start
+        if overwritten > 0:
+            del samples[:overwritten]
+            start += overwritten
+        return samples, end, start - cursor
+
+
+class SensorBuffers:
+    """One :class:`SensorRing` per sensor.
+
+    ``put`` has the signature of ``queue.Queue.put``, so sensor workers keep
+    calling ``outbox.put(message)`` without knowing about the rings.
+    """
+
+    def __init__(self, sensors: Iterable[str], capacity: int = DEFAULT_CAPACITY):
+        self.capacity = max(1, capacity)
+        self._rings: Dict[str, SensorRing] = {sensor: SensorRing(sensor, self.capacity) for sensor in sensors}
+
+    def put(self, message: SensorMessage) -> None:
+        ring = self._rings.get(message.sensor)
+        if ring is None:
+            ring = self._rings.setdefault(message.sensor, SensorRing(message.sensor, self.capacity))
+        ring.push(message)
+
+    def attach(self, ring: Any) -> None:
+        """Read ``ring`` in place of the local one of its sensor.
+
+        Any object with ``sensor``, ``latest`` and ``read_since`` works; the
+        IMU process uses it to publish through shared memory.
+        """
+        self._rings[ring.sensor] = ring
+
+    def rings(self) -> List[SensorRing]:
+        return list(self._rings.values())
+
+    def latest(self) -> Dict[str, SensorMessage]:
+        return {sensor: ring.latest for sensor, ring in self._rings.items() if ring.latest is not None}
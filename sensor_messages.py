@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any, Dict, Iterable, Optional
 
@@ -9,6 +10,8 @@ class SensorMessage:
     sensor: str
     timestamp: float
     data: Dict[str, Any]
+    # Reloj monotónico al crear el mensaje: es el que usan las alineaciones y los intervalos.
+    monotonic: float = field(default_factory=time.monotonic)
 
     def to_payload(self) -> Dict[str, Any]:
         return {"timestamp": isoformat_utc(self.timestamp), **self.data}
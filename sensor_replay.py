@@ -0,0 +1,282 @@
+"""Replay recorded flights through the pipeline instead of the sensor workers.
+
+Three recordings are understood, picked by their content:
+
+* ``logs/payloads.log``: every sensor entry of every payload, once per reading;
+* ``mpu6050_*.csv`` written by ``acceleration.main``;
+* raw serial captures, one line per serial line, parsed by the same helpers
+  as the workers (``BMP180.parse_line``, ``neo3.parse_sentence``). A line may
+  start with its epoch timestamp (``1715551815.123 T=25.4 P=1013.42`` or the
+  ``Recibido @ ...:`` output of ``BMP180.main``); otherwise lines are spaced
+  ``SERIAL_LINE_PERIOD`` apart, starting at the earliest reading of the
+  timestamped files replayed with it.
+
+All files are merged by timestamp and fed to the aggregator by one worker at
+the recorded pace divided by ``speed``, or as fast as possible.
+"""
+
+from __future__ import annotations
+
+import csv
+import heapq
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import BMP180
+import neo3
+from fast_trigger import TriggerPath
+from logger import log
+from sensor_buffers import SensorBuffers
+from sensor_messages import SensorMessage
+from sensor_workers import fix_data
+
+_REPO_ROOT = Path(__file__).resolve().parent
+
+DEFAULT_SPEED = 1.0
+SPEED_MAX = "max"
+SERIAL_LINE_PERIOD = 0.1
+
+_PAYLOAD_LINE = re.compile(r"^\S+\s+\{")
+_SERIAL_STAMP = re.compile(rb"^(?:Recibido @ )?(\d{9,}(?:\.\d+)?):?\s+(.*)$")
+# Claves que agrega el agregador a cada sensor y que no son parte de la lectura.
+_PAYLOAD_EXTRAS = ("timestamp", "window", "age_ms", "skew_ms")
+
+
+def _utc_seconds(text: str) -> float:
+    return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+
+
+def payload_log_source(path: Path) -> Iterator[SensorMessage]:
+    """Readings found in a payload log, each once and in timestamp order."""
+    seen: Set[Tuple[str, float]] = set()
+    messages: List[SensorMessage] = []
+    skipped = 0
+    with path.open("r", encoding="utf-8") as fp:
+        for line in fp:
+            _, _, body = line.strip().partition(" ")
+            try:
+                sensors = json.loads(body)["sensors"]
+                entries = [(sensor, entry, _utc_seconds(entry["timestamp"])) for sensor, entry in sensors.items() if entry]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            for sensor, entry, timestamp in entries:
+                if (sensor, timestamp) in seen:
+                    continue
+                seen.add((sensor, timestamp))
+                data = {key: value for key, value in entry.items() if key not in _PAYLOAD_EXTRAS}
+                messages.append(SensorMessage(sensor, timestamp, data))
+    if skipped:
+        log("REPLAY", f"{path.name}: {skipped} líneas ilegibles ignoradas", "WARN")
+    messages.sort(key=lambda message: message.timestamp)
+    return iter(messages)
+
+
+def mpu_csv_source(path: Path) -> Iterator[SensorMessage]:
+    """Rows of an ``acceleration.main`` CSV (local wall-clock times)."""
+    with path.open("r", encoding="utf-8", newline="") as fp:
+        for row in csv.DictReader(fp):
+            try:
+                values = [float(row[key]) for key in (
+                    "Acel_X", "Acel_Y", "Acel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z", "Pitch", "Roll", "Yaw",
+                )]
+                timestamp = datetime.fromisoformat(row["Tiempo"]).timestamp()
+            except (ValueError, KeyError, TypeError):
+                continue
+            yield SensorMessage(
+                "mpu6050",
+                timestamp,
+                {
+                    "accel_g": dict(zip(("ax", "ay", "az"), values[0:3])),
+                    "gyro_dps": dict(zip(("gx", "gy", "gz"), values[3:6])),
+                    "attitude_deg": dict(zip(("pitch", "roll", "yaw"), values[6:9])),
+                },
+            )
+
+
+def serial_capture_source(
+    path: Path,
+    period: float = SERIAL_LINE_PERIOD,
+    anchor: float = 0.0,
+) -> Iterator[SensorMessage]:
+    """NMEA lines become NEO6M fixes; anything else is an Arduino (BMP180) line.
+
+    Lines without a timestamp follow the previous one by ``period``; the
+    first of them lands on ``anchor``.
+    """
+    timestamp = anchor - period
+    warned_parser = False
+    with path.open("rb") as fp:
+        for raw in fp:
+            match = _SERIAL_STAMP.match(raw.strip())
+            if match:
+                timestamp = float(match.group(1))
+                raw = match.group(2)
+            else:
+                timestamp += period
+            if raw.lstrip().startswith(b"$GP"):
+                if neo3.pynmea2 is None:
+                    if not warned_parser:
+                        log("REPLAY", f"{path.name}: sin pynmea2, salto las sentencias NMEA uwu", "WARN")
+                        warned_parser = True
+                    continue
+                fix = neo3.parse_sentence(raw)
+                if fix is not None:
+                    yield SensorMessage("neo6m", timestamp, fix_data(fix))
+                continue
+            line = BMP180.parse_line(raw)
+            if line is not None:
+                yield SensorMessage("bmp180", timestamp, {"raw": line})
+
+
+def _first_line(path: Path) -> bytes:
+    with path.open("rb") as fp:
+        return next((line.strip() for line in fp if line.strip()), b"")
+
+
+def unstamped_capture(path: Path) -> bool:
+    """True for a serial capture whose lines carry no timestamp."""
+    if path.suffix.lower() == ".csv":
+        return False
+    first = _first_line(path)
+    return not _PAYLOAD_LINE.match(first.decode("utf-8", errors="replace")) and not _SERIAL_STAMP.match(first)
+
+
+def open_source(path: Path, anchor: float = 0.0) -> Iterator[SensorMessage]:
+    """Pick the reader for ``path`` from its suffix or first line.
+
+    ``anchor`` is where an unstamped serial capture starts.
+    """
+    if path.suffix.lower() == ".csv":
+        return mpu_csv_source(path)
+    if _PAYLOAD_LINE.match(_first_line(path).decode("utf-8", errors="replace")):
+        return payload_log_source(path)
+    return serial_capture_source(path, anchor=anchor)
+
+
+def load_replay(config: Dict[str, Any]) -> Optional[Tuple[List[Path], Optional[float]]]:
+    """``(files, speed)`` from the ``replay`` block of config.json; speed None = as fast as possible."""
+    block = config.get("replay")
+    if block is None:
+        return None
+    if not isinstance(block, dict):
+        log("REPLAY", "'replay' debe ser un objeto; uso los sensores", "WARN")
+        return None
+    raw_files = block.get("files")
+    if isinstance(raw_files, str):
+        raw_files = [raw_files]
+    files: List[Path] = []
+    for raw in raw_files if isinstance(raw_files, list) else ():
+        candidate = Path(raw) if isinstance(raw, str) else None
+        if candidate is not None and not candidate.is_absolute():
+            candidate = _REPO_ROOT / candidate
+        if candidate is None or not candidate.is_file():
+            log("REPLAY", f"no encuentro la grabación {raw!r}, la salto", "WARN")
+            continue
+        files.append(candidate)
+    if not files:
+        log("REPLAY", "'replay' sin grabaciones válidas; uso los sensores", "WARN")
+        return None
+    speed = block.get("speed", DEFAULT_SPEED)
+    if speed == SPEED_MAX:
+        return files, None
+    if isinstance(speed, bool) or not isinstance(speed, (int, float)) or speed <= 0:
+        log("REPLAY", f"speed inválido ({speed!r}); uso {DEFAULT_SPEED}", "WARN")
+        speed = DEFAULT_SPEED
+    return files, float(speed)
+
+
+def simulated_gpio() -> bool:
+    """Actuator used while replaying: never touches the real pins."""
+    log("REPLAY", "GPIO simulado, no activo pines uwu", "WARN")
+    return False
+
+
+def replay_worker(
+    outbox: SensorBuffers,
+    stop_event: threading.Event,
+    files: Sequence[Path],
+    speed: Optional[float] = DEFAULT_SPEED,
+    trigger: Optional[TriggerPath] = None,
+) -> None:
+    """Feed the merged recordings to ``outbox`` like the sensor workers would.
+
+    Recorded times are shifted so the first reading lands now; ``speed``
+    only changes how fast they are delivered, so hold times of the flight
+    rules still see the recorded timeline.
+    """
+    sources: List[Iterator[SensorMessage]] = []
+    unstamped: List[Path] = []
+    firsts: List[float] = []
+    for path in files:
+        try:
+            if unstamped_capture(path):
+                unstamped.append(path)
+                continue
+            source = open_source(path)
+            first = next(source, None)
+        except OSError as exc:
+            log("REPLAY", f"no pude abrir {path.name} uwu: {exc}", "ERROR")
+            continue
+        if first is not None:
+            firsts.append(first.timestamp)
+            sources.append(itertools.chain((first,), source))
+    # Las capturas sin tiempos arrancan junto con la lectura más vieja de las demás.
+    anchor = min(firsts, default=0.0)
+    for path in unstamped:
+        if sources:
+            log("REPLAY", f"{path.name} no trae tiempos: la alineo al inicio de las otras grabaciones", "WARN")
+        try:
+            sources.append(open_source(path, anchor))
+        except OSError as exc:
+            log("REPLAY", f"no pude abrir {path.name} uwu: {exc}", "ERROR")
+    pace = f"{speed:g}x" if speed is not None else "lo más rápido posible"
+    log("REPLAY", f"Reproduciendo {len(sources)} grabaciones a {pace} uwu", "INFO")
+    start_wall = time.time()
+    start_mono = time.monotonic()
+    origin: Optional[float] = None
+    counts: Dict[str, int] = {}
+    late = 0.0
+    elapsed = 0.0
+    for message in heapq.merge(*sources, key=lambda item: item.timestamp):
+        if stop_event.is_set():
+            break
+        if origin is None:
+            origin = message.timestamp
+        elapsed = message.timestamp - origin
+        if speed is not None:
+            delay = start_mono + elapsed / speed - time.monotonic()
+            if delay > 0:
+                if stop_event.wait(delay):
+                    break
+            else:
+                late = max(late, -delay)
+        replayed = SensorMessage(message.sensor, start_wall + elapsed, message.data)
+        if trigger is not None and replayed.sensor == "mpu6050":
+            trigger.feed(replayed, replayed.monotonic)
+        outbox.put(replayed)
+        counts[replayed.sensor] = counts.get(replayed.sensor, 0) + 1
+    took = time.monotonic() - start_mono
+    detail = ", ".join(f"{sensor}={count}" for sensor, count in sorted(counts.items())) or "nada"
+    log(
+        "REPLAY",
+        f"Fin del replay: {detail}; {elapsed:.1f} s grabados en {took:.1f} s"
+        + (f", retraso máximo {late * 1000:.1f} ms" if speed is not None else ""),
+        "INFO",
+    )
+
+
+def replay_thread(
+    inbox: SensorBuffers,
+    stop_event: threading.Event,
+    files: Sequence[Path],
+    speed: Optional[float] = DEFAULT_SPEED,
+    trigger: Optional[TriggerPath] = None,
+) -> threading.Thread:
+    return threading.Thread(target=replay_worker, args=(inbox, stop_event, files, speed, trigger), name="REPLAY")
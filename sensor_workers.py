@@ -1,13 +1,16 @@
 from __future__ import annotations
 
 import math
-import queue
 import sys
 import threading
 import time
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-from logger import log
+import imu_batch
+import imu_calibration
+from fast_trigger import TriggerPath
+from logger import load_config, log
+from sensor_buffers import SensorBuffers
 from sensor_messages import SensorMessage, isoformat_utc
 
 HAS_MPU = True
@@ -31,6 +34,9 @@ except Exception:
     HAS_GPS = False
     neo3 = None
 
+# 1 kHz / (1 + 9) = 100 Hz cuando la FIFO está activa.
+MPU_FIFO_DEFAULT_DIV = 9
+
 SENSORS: Tuple[str, ...] = ("mpu6050", "bmp180", "neo6m")
 CAPS: Dict[str, bool] = {
     "mpu6050": HAS_MPU,
@@ -38,7 +44,86 @@ CAPS: Dict[str, bool] = {
     "neo6m": HAS_GPS,
 }
 
-def mpu6050_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Event) -> None:
+def _mpu_fifo_divider(config: Dict[str, Any]) -> Optional[int]:
+    """Sample-rate divider when config.json enables ``mpu_fifo``; None keeps polling."""
+    if config.get("mpu_fifo") is not True:
+        return None
+    raw = config.get("mpu_sample_rate_div", MPU_FIFO_DEFAULT_DIV)
+    if isinstance(raw, bool) or not isinstance(raw, int) or not 0 <= raw <= 255:
+        log("MPU6050", f"mpu_sample_rate_div inválido ({raw!r}); uso {MPU_FIFO_DEFAULT_DIV}", "WARN")
+        return MPU_FIFO_DEFAULT_DIV
+    return raw
+
+
+def _mpu_temperature() -> Optional[float]:
+    try:
+        return round(mpu.read_temperature(), 2)
+    except Exception as exc:
+        log("MPU6050", f"no pude leer la temperatura uwu: {exc}", "WARN")
+        return None
+
+
+def _mpu_offsets() -> Optional[Dict[str, Dict[str, float]]]:
+    """Cached offsets when still valid, else a fresh calibration saved to disk."""
+    temperature = _mpu_temperature()
+    offsets = imu_calibration.load_cached(temperature)
+    if offsets is not None:
+        log("MPU6050", "Usando la calibración guardada uwu", "INFO")
+        return offsets
+    log("MPU6050", "Calibrando el sensor uwu")
+    try:
+        offsets = mpu.calibrate_sensor()
+    except Exception as exc:
+        log("MPU6050", f"ups, falló la calibración uwu: {exc}", "ERROR", sys.stderr)
+        return None
+    imu_calibration.save(offsets, temperature)
+    return offsets
+
+
+def _mpu_fifo_loop(
+    process_batch: Callable[[List[Tuple[float, ...]], List[float], List[float], float], None],
+    debug_sample: Callable[[], None],
+    offsets: Dict[str, Dict[str, float]],
+    rate: float,
+    stop_event: threading.Event,
+) -> None:
+    """Drain the MPU6050 FIFO in batches, spreading timestamps at the FIFO rate."""
+    period = 1.0 / rate
+    samples_per_fifo = mpu.FIFO_SIZE // mpu.FIFO_SAMPLE_BYTES
+    # Vaciar antes de llegar a la mitad de la FIFO deja margen para hipos del bus.
+    drain_every = min(getattr(mpu, "DT_SLEEP", 0.05), 0.5 * samples_per_fifo * period)
+    overflows = 0
+    log("MPU6050", f"Leyendo la FIFO a {rate:.0f} Hz cada {drain_every * 1000:.0f} ms uwu", "INFO")
+    try:
+        while not stop_event.wait(drain_every):
+            try:
+                batch, overflowed = mpu.read_fifo(offsets)
+            except Exception as exc:
+                log("MPU6050", f"ouch, no pude leer la FIFO uwu: {exc}", "ERROR", sys.stderr)
+                break
+            wall = time.time()
+            mono = time.monotonic()
+            if overflowed:
+                overflows += 1
+                log("MPU6050", f"FIFO desbordada ({overflows}); descarto el lote uwu", "WARN")
+                continue
+            # La FIFO no trae tiempos: la última muestra es la más reciente.
+            backs = [(len(batch) - 1 - index) * period for index in range(len(batch))]
+            process_batch(batch, [wall - back for back in backs], [mono - back for back in backs], period)
+            if batch:
+                debug_sample()
+    finally:
+        try:
+            mpu.disable_fifo()
+        except Exception:
+            pass
+
+
+def mpu6050_worker(
+    outbox: SensorBuffers,
+    stop_event: threading.Event,
+    trigger: Optional[TriggerPath] = None,
+) -> None:
     if not HAS_MPU:
         log("MPU6050", "sin sensor, usando datos dummy uwu", "WARN")
         phase = 0.0
@@ -66,30 +151,44 @@ def mpu6050_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Eve
             if stop_event.wait(0.05):
                 break
         return
-    log("MPU6050", "Calibrando el sensor uwu")
-    try:
-        offsets = mpu.calibrate_sensor()
-    except Exception as exc:
-        log("MPU6050", f"ups, falló la calibración uwu: {exc}", "ERROR", sys.stderr)
+    offsets = _mpu_offsets()
+    if offsets is None:
         return
+    calibrator = imu_calibration.StationaryCalibrator(offsets, mpu.ACCEL_SCALE, mpu.GYRO_SCALE)
     state = {"pitch": 0.0, "roll": 0.0, "yaw": 0.0, "pitch_smooth": 0.0, "roll_smooth": 0.0}
     alpha_filter = {axis: 0.0 for axis in ("ax", "ay", "az", "gx", "gy", "gz")}
-    last_time = time.time()
+    alpha = getattr(mpu, "ALPHA", 0.3)
     dt_sleep = getattr(mpu, "DT_SLEEP", 0.05)
     ciclo = 0
     debug_print_failed = False
-    log("MPU6050", "Arrancó el bucle de captura uwu", "DEBUG")
-    while not stop_event.is_set():
-        now = time.time()
-        dt = max(now - last_time, 1e-3)
-        last_time = now
-        try:
-            ax, ay, az, gx, gy, gz = mpu.read_accel_gyro(offsets)
-        except Exception as exc:
-            log("MPU6050", f"ouch, no pude leer uwu: {exc}", "ERROR", sys.stderr)
-            break
-        alpha = getattr(mpu, "ALPHA", 0.3)
-        for axis, value in zip(alpha_filter.keys(), (ax, ay, az, gx, gy, gz)):
+
+    def recalibrate(sample: Tuple[float, ...], sampled: float) -> None:
+        if calibrator.feed(sample, sampled):
+            imu_calibration.save(offsets, _mpu_temperature())
+            log("MPU6050", f"Recalibré en reposo ({calibrator.updates}) y guardé los offsets uwu", "INFO")
+
+    def publish(filtered: Sequence[float], attitude: Sequence[float], timestamp: float, sampled: float) -> None:
+        ax, ay, az, gx, gy, gz = filtered
+        pitch, roll, yaw = attitude
+        message = SensorMessage(
+            sensor="mpu6050",
+            timestamp=timestamp,
+            data={
+                "accel_g": {"ax": round(ax, 4), "ay": round(ay, 4), "az": round(az, 4)},
+                "gyro_dps": {"gx": round(gx, 3), "gy": round(gy, 3), "gz": round(gz, 3)},
+                "attitude_deg": {"pitch": round(pitch, 2), "roll": round(roll, 2), "yaw": round(yaw, 2)},
+            },
+            monotonic=sampled,
+        )
+        # El disparo se decide aquí, antes de tocar el anillo ni esperar al agregador.
+        if trigger is not None:
+            trigger.feed(message, sampled)
+        outbox.put(message)
+
+    def process(sample: Tuple[float, ...], timestamp: float, sampled: float, dt: float) -> None:
+        nonlocal state
+        recalibrate(sample, sampled)
+        for axis, value in zip(alpha_filter.keys(), sample):
             alpha_filter[axis] = alpha * value + (1 - alpha) * alpha_filter[axis]
         try:
             state = mpu.complementary_filter(
@@ -104,21 +203,39 @@ def mpu6050_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Eve
             )
         except Exception as exc:
             log("MPU6050", f"filtro complementario falló uwu: {exc}", "WARN")
-        outbox.put(
-            SensorMessage(
-                sensor="mpu6050",
-                timestamp=now,
-                data={
-                    "accel_g": {k: round(alpha_filter[k], 4) for k in ("ax", "ay", "az")},
-                    "gyro_dps": {k: round(alpha_filter[k], 3) for k in ("gx", "gy", "gz")},
-                    "attitude_deg": {
-                        "pitch": round(state.get("pitch_smooth", 0.0), 2),
-                        "roll": round(state.get("roll_smooth", 0.0), 2),
-                        "yaw": round(state.get("yaw", 0.0), 2),
-                    },
-                },
-            )
+        publish(
+            alpha_filter.values(),
+            (state.get("pitch_smooth", 0.0), state.get("roll_smooth", 0.0), state.get("yaw", 0.0)),
+            timestamp,
+            sampled,
         )
+
+    def process_batch(
+        batch: Sequence[Tuple[float, ...]],
+        timestamps: Sequence[float],
+        sampled: Sequence[float],
+        dt: float,
+    ) -> None:
+        """Filter a FIFO batch; whole-block NumPy when available, else per sample."""
+        if not imu_batch.HAS_NUMPY or len(batch) < imu_batch.BATCH_MIN:
+            for sample, timestamp, mono in zip(batch, timestamps, sampled):
+                process(sample, timestamp, mono, dt)
+            return
+        try:
+            filtered, attitude = imu_batch.filter_block(
+                batch, dt, alpha, mpu.ALPHA_FUSION, mpu.SMOOTHING, alpha_filter, state
+            )
+        except Exception as exc:
+            log("MPU6050", f"filtro por bloques falló, sigo muestra a muestra uwu: {exc}", "WARN")
+            for sample, timestamp, mono in zip(batch, timestamps, sampled):
+                process(sample, timestamp, mono, dt)
+            return
+        for sample, row, angles, timestamp, mono in zip(batch, filtered.tolist(), attitude.tolist(), timestamps, sampled):
+            recalibrate(sample, mono)
+            publish(row, angles, timestamp, mono)
+
+    def debug_sample() -> None:
+        nonlocal ciclo, debug_print_failed
         if hasattr(mpu, "log_debug_sample"):
             try:
                 mpu.log_debug_sample(alpha_filter, state, ciclo)
@@ -126,12 +243,38 @@ def mpu6050_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Eve
                 if not debug_print_failed:
                     log("MPU6050", f"no pude imprimir el debug uwu: {exc}", "WARN")
                     debug_print_failed = True
+        ciclo += 1
+
+    fifo_div = _mpu_fifo_divider(load_config())
+    if fifo_div is not None and hasattr(mpu, "enable_fifo"):
+        try:
+            rate = mpu.enable_fifo(fifo_div)
+        except Exception as exc:
+            log("MPU6050", f"no pude activar la FIFO, sigo leyendo muestra a muestra uwu: {exc}", "WARN")
+        else:
+            _mpu_fifo_loop(process_batch, debug_sample, offsets, rate, stop_event)
+            log("MPU6050", "Bucle de captura detenido uwu", "DEBUG")
+            return
+
+    last_time = time.time()
+    log("MPU6050", "Arrancó el bucle de captura uwu", "DEBUG")
+    while not stop_event.is_set():
+        now = time.time()
+        dt = max(now - last_time, 1e-3)
+        last_time = now
+        try:
+            sample = mpu.read_accel_gyro(offsets)
+            sampled = time.monotonic()
+        except Exception as exc:
+            log("MPU6050", f"ouch, no pude leer uwu: {exc}", "ERROR", sys.stderr)
+            break
+        process(sample, now, sampled, dt)
+        debug_sample()
         if stop_event.wait(dt_sleep):
             break
-        ciclo += 1
     log("MPU6050", "Bucle de captura detenido uwu", "DEBUG")
 
-def bmp180_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Event) -> None:
+def bmp180_worker(outbox: SensorBuffers, stop_event: threading.Event) -> None:
     if not HAS_BMP:
         log("BMP180", "sin sensor, usando datos dummy uwu", "WARN")
         temp = 25.0
@@ -173,7 +316,17 @@ def bmp180_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Even
                 break
     log("BMP180", "Cerrando el puerto uwu", "DEBUG")
 
-def neo6m_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Event) -> None:
+def fix_data(fix: "neo3.Fix") -> Dict[str, Any]:
+    """Reading of the NEO6M worker for one parsed fix."""
+    return {
+        "latitude": fix.latitude,
+        "longitude": fix.longitude,
+        "altitude": fix.altitude,
+        "fix_time": fix.fix_time,
+        "raw": fix.raw_sentence,
+    }
+
+def neo6m_worker(outbox: SensorBuffers, stop_event: threading.Event) -> None:
     if not HAS_GPS:
         log("NEO6M", "sin GPS, usando datos dummy uwu", "WARN")
         lat = 25.651
@@ -221,29 +374,22 @@ def neo6m_worker(outbox: queue.Queue[SensorMessage], stop_event: threading.Event
                 f"lat={fix.latitude} lon={fix.longitude} alt={fix.altitude} hora={fix.fix_time} uwu",
                 "DEBUG",
             )
-            outbox.put(
-                SensorMessage(
-                    sensor="neo6m",
-                    timestamp=time.time(),
-                    data={
-                        "latitude": fix.latitude,
-                        "longitude": fix.longitude,
-                        "altitude": fix.altitude,
-                        "fix_time": fix.fix_time,
-                        "raw": fix.raw_sentence,
-                    },
-                )
-            )
+            outbox.put(SensorMessage(sensor="neo6m", timestamp=time.time(), data=fix_data(fix)))
             if stop_event.wait(0.1):
                 break
     log("NEO6M", "Me despido del GPS uwu", "DEBUG")
 
 def sensor_threads(
-    inbox: queue.Queue[SensorMessage],
+    inbox: SensorBuffers,
     stop_event: threading.Event,
-) -> Tuple[threading.Thread, threading.Thread, threading.Thread]:
-    return (
-        threading.Thread(target=mpu6050_worker, args=(inbox, stop_event), name="MPU6050"),
+    trigger: Optional[TriggerPath] = None,
+    mpu_thread: bool = True,
+) -> Tuple[threading.Thread, ...]:
+    """Worker threads; ``mpu_thread=False`` leaves the IMU to :mod:`imu_process`."""
+    threads = (
         threading.Thread(target=bmp180_worker, args=(inbox, stop_event), name="BMP180"),
         threading.Thread(target=neo6m_worker, args=(inbox, stop_event), name="NEO6M"),
     )
+    if not mpu_thread:
+        return threads
+    return (threading.Thread(target=mpu6050_worker, args=(inbox, stop_event, trigger), name="MPU6050"),) + threads
@@ -2,12 +2,20 @@ from __future__ import annotations
 
 from pathlib import Path
 import time
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from logger import log
-from lora_transport import get_init_error, has_link_failure, is_ready
+from lora_transport import (
+    get_airtime_stats,
+    get_arq_stats,
+    get_init_error,
+    get_tx_stats,
+    has_link_failure,
+    is_ready,
+)
 from sensor_workers import CAPS
-from aggregator import ActivityTracker
+from aggregator import ActivityTracker, get_scheduler_stats
+from fast_trigger import TRIGGER_LATENCY_BUDGET, TriggerLatency
 from sensor_messages import isoformat_utc
 
 _FINAL_LOG_FILE = Path(__file__).resolve().parent / "logs" / "resumen_final.log"
@@ -20,7 +28,11 @@ def log_start_summary() -> None:
     log("SYSTEM", f"Sensores NO disponibles: {', '.join(inactivos) if inactivos else 'ninguno'}", "WARN")
     log("SYSTEM", f"LoRa: {'LISTO' if is_ready() else 'NO LISTO'}", "INFO")
 
-def log_final_summary(tracker: ActivityTracker) -> None:
+def log_final_summary(
+    tracker: ActivityTracker,
+    triggers: Optional[Sequence[TriggerLatency]] = None,
+) -> Dict[str, Any]:
+    """Log and persist the final summary; return it as a payload for LoRa."""
     records: List[Tuple[str, str]] = []
 
     def record(message: str, level: str) -> None:
@@ -59,7 +71,69 @@ def log_final_summary(tracker: ActivityTracker) -> None:
         record(f"LoRa no se inició correctamente: {detalle}", "ERROR")
     if has_link_failure():
         record("LoRa no se conectó correctamente (módulo sin respuesta)", "ERROR")
+    tx = get_tx_stats()
+    if tx["enqueued"]:
+        record(
+            f"Cola TX: {int(tx['sent'])} enviados, {int(tx['superseded'])} reemplazados, "
+            f"{int(tx['dropped'])} descartados, espera media {tx['wait_mean'] * 1000:.1f} ms "
+            f"(máx {tx['wait_max'] * 1000:.1f} ms)",
+            "INFO",
+        )
+    airtime = get_airtime_stats()
+    if airtime["frames"]:
+        cadence = f"emision cada {airtime['emit_interval']:.2f} s"
+        if airtime["topics"] > 1:
+            cadence += f" en el más rápido de {int(airtime['topics'])} topics"
+        record(
+            f"Airtime: {airtime['airtime_total']:.1f} s en {int(airtime['frames'])} tramas, "
+            f"uso real {airtime['utilisation']:.0%} vs proyectado {airtime['projected_utilisation']:.0%} "
+            f"(duty {airtime['duty_cycle']:.0%}, {cadence})",
+            "INFO",
+        )
+    failed: List[str] = []
+    for trigger in triggers or ():
+        if not trigger.activated or trigger.total is None:
+            failed.append(trigger.event)
+            continue
+        record(
+            f"Disparo '{trigger.event}': muestra→decisión {trigger.decision_delay * 1000:.1f} ms, "
+            f"decisión→pin {(trigger.pin_delay or 0.0) * 1000:.1f} ms, total {trigger.total * 1000:.1f} ms "
+            f"(límite {TRIGGER_LATENCY_BUDGET * 1000:.0f} ms)",
+            "INFO" if trigger.total <= TRIGGER_LATENCY_BUDGET else "ERROR",
+        )
+    if failed:
+        record(
+            f"Disparos FALLIDOS (el GPIO no se activó): {len(failed)} "
+            f"({', '.join(failed)})",
+            "ERROR",
+        )
+    emit_stats = get_scheduler_stats().get("emit")
+    if emit_stats and emit_stats["fired"]:
+        bounds = [f"<{limit}ms" for limit in emit_stats["buckets_ms"]] + [f">={emit_stats['buckets_ms'][-1]}ms"]
+        histogram = " ".join(f"{label}:{count}" for label, count in zip(bounds, emit_stats["histogram"]) if count)
+        record(
+            f"Emisiones programadas: {emit_stats['fired']} (jitter máx {emit_stats['max_jitter_ms']:.1f} ms, "
+            f"{emit_stats['skipped']} periodos saltados; {histogram})",
+            "INFO" if not emit_stats["skipped"] else "WARN",
+        )
+    arq = get_arq_stats()
+    if arq["polls"]:
+        record(
+            f"ARQ: {arq['acked']} confirmados, {arq['failed']} sin confirmar, "
+            f"{arq['retransmitted']} fragmentos reenviados, {arq['timeouts']} ventanas sin respuesta",
+            "INFO" if not arq["failed"] else "WARN",
+        )
     _persist_final_log(header, records)
+    return {
+        "reported_at": isoformat_utc(time.time()),
+        "summary": {
+            "reales": grupos["reales"],
+            "dummy": grupos["dummy"],
+            "sin_datos": grupos["sin_datos"],
+            "zero_accel": bool(zero_signal["sent"]),
+            "lora": lora_ready,
+        },
+    }
 
 
 def _persist_final_log(header: str, records: List[Tuple[str, str]]) -> None:
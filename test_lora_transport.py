@@ -0,0 +1,28 @@
+from lora_transport import _FrameAssembler
+
+
+def _fragments(body: bytes, size: int):
+    return [body[offset : offset + size] for offset in range(0, len(body), size)]
+
+
+def test_v1_lost_tail_does_not_swallow_next_message():
+    # v1 no trae id: si se pierde la cola de A, los fragmentos de B abren otro mensaje.
+    assembler = _FrameAssembler(timeout=5.0)
+    first = _fragments(b"AAAAaaaaAA", 4)
+    second = _fragments(b"BBBBbbbbBB", 4)
+    assert assembler.push("sensors", 1, 3, first[0], 0.0) is None
+    assert assembler.push("sensors", 2, 3, first[1], 0.1) is None
+    assert assembler.push("sensors", 1, 3, second[0], 0.2) is None
+    assert assembler.push("sensors", 2, 3, second[1], 0.3) is None
+    assert assembler.push("sensors", 3, 3, second[2], 0.4) == b"BBBBbbbbBB"
+    assert assembler.stats["duplicates"] == 0
+
+
+def test_v2_repeated_fragment_is_a_duplicate():
+    assembler = _FrameAssembler(timeout=5.0)
+    body = _fragments(b"AAAAaaaaAA", 4)
+    assert assembler.push("sensors", 1, 3, body[0], 0.0, msg_id=7) is None
+    assert assembler.push("sensors", 1, 3, body[0], 0.1, msg_id=7) is None
+    assert assembler.stats["duplicates"] == 1
+    assert assembler.push("sensors", 2, 3, body[1], 0.2, msg_id=7) is None
+    assert assembler.push("sensors", 3, 3, body[2], 0.3, msg_id=7) == b"AAAAaaaaAA"
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from logger import log
+
+LEGACY_TOPIC = "sensors"
+DEFAULT_EMIT_EVERY = 0.5
+MAX_TOPIC_LEN = 15  # la cabecera LoRa guarda el topic con 15 bytes como máximo
+
+
+@dataclass(frozen=True)
+class TopicSpec:
+    """Emission rules of one LoRa topic.
+
+    ``emit_every`` is the minimum period between payloads, ``priority`` orders
+    topics waiting in the TX queue (higher first), ``max_age`` turns readings
+    older than that many seconds into ``null`` and ``on_new`` only emits when
+    at least one sensor produced a reading since the previous payload.
+    ``window_stats`` adds min/max/mean/peak of every sample since the previous
+    payload to each sensor entry, instead of sending only the last reading.
+
+    ``align`` resamples the sensors onto one instant before building the
+    payload (see :mod:`alignment`) and reports each sensor's age and skew.
+
+    ``deadband`` and ``rate_trigger`` (``("sensor.group.key", threshold)``
+    pairs) make the topic event-driven: ``emit_every`` becomes a rate cap and
+    ``heartbeat`` the longest silence, see :class:`emission_policy.EmissionPolicy`.
+    """
+
+    name: str
+    sensors: Tuple[str, ...]
+    emit_every: float = DEFAULT_EMIT_EVERY
+    priority: int = 0
+    max_age: Optional[float] = None
+    on_new: bool = False
+    window_stats: bool = False
+    align: bool = False
+    deadband: Tuple[Tuple[str, float], ...] = ()
+    rate_trigger: Tuple[Tuple[str, float], ...] = ()
+    heartbeat: Optional[float] = None
+
+    @property
+    def event_driven(self) -> bool:
+        return bool(self.deadband or self.rate_trigger)
+
+
+def legacy_topics(
+    sensors: Iterable[str],
+    emit_every: float = DEFAULT_EMIT_EVERY,
+    window_stats: bool = False,
+    align: bool = False,
+) -> List[TopicSpec]:
+    """Single ``sensors`` topic with every sensor, as the Arduino receiver expects."""
+    return [TopicSpec(LEGACY_TOPIC, tuple(sensors), emit_every, window_stats=window_stats, align=align)]
+
+
+def _number(raw: Any, default: Optional[float], minimum: float) -> Optional[float]:
+    if raw is None:
+        return default
+    try:
+        return max(minimum, float(raw))
+    except (TypeError, ValueError):
+        return default
+
+
+def _thresholds(raw: Any, topic: str, key: str, members: Sequence[str]) -> Tuple[Tuple[str, float], ...]:
+    """Validate a ``{"sensor.group.key": threshold}`` object of one topic."""
+    if raw is None:
+        return ()
+    if not isinstance(raw, dict):
+        log("SYSTEM", f"topic '{topic}': '{key}' debe ser un objeto; lo ignoro", "WARN")
+        return ()
+    fields: List[Tuple[str, float]] = []
+    for name, threshold in raw.items():
+        sensor, _, path = str(name).partition(".")
+        value = _number(threshold, None, 0.0)
+        if sensor not in members or not path or value is None:
+            log("SYSTEM", f"topic '{topic}': '{key}.{name}' inválido; lo ignoro", "WARN")
+            continue
+        fields.append((str(name), value))
+    return tuple(fields)
+
+
+def parse_topics(raw: Any, sensors: Sequence[str]) -> List[TopicSpec]:
+    """Validate the ``topics`` object of config.json; invalid entries are skipped."""
+    if not isinstance(raw, dict):
+        log("SYSTEM", "'topics' debe ser un objeto; uso el topic único 'sensors'", "WARN")
+        return legacy_topics(sensors)
+    specs: List[TopicSpec] = []
+    for name, entry in raw.items():
+        if not isinstance(entry, dict):
+            log("SYSTEM", f"topic '{name}' inválido; lo omito", "WARN")
+            continue
+        encoded = str(name).encode("ascii", errors="ignore")
+        if not encoded or len(encoded) > MAX_TOPIC_LEN:
+            log("SYSTEM", f"topic '{name}' debe ser ASCII de 1 a {MAX_TOPIC_LEN} caracteres; lo omito", "WARN")
+            continue
+        members = entry.get("sensors")
+        if isinstance(members, str):
+            members = [members]
+        if not isinstance(members, list):
+            members = []
+        unknown = [sensor for sensor in members if sensor not in sensors]
+        if unknown:
+            log("SYSTEM", f"topic '{name}': ignoro sensores desconocidos {unknown}", "WARN")
+        members = [sensor for sensor in sensors if sensor in members]
+        if not members:
+            log("SYSTEM", f"topic '{name}' no tiene sensores válidos; lo omito", "WARN")
+            continue
+        try:
+            priority = int(entry.get("priority", 0))
+        except (TypeError, ValueError):
+            priority = 0
+        specs.append(
+            TopicSpec(
+                name=encoded.decode("ascii"),
+                sensors=tuple(members),
+                emit_every=_number(entry.get("emit_every"), DEFAULT_EMIT_EVERY, 0.0) or 0.0,
+                priority=priority,
+                max_age=_number(entry.get("max_age"), None, 0.0),
+                on_new=bool(entry.get("on_new", False)),
+                window_stats=bool(entry.get("window_stats", False)),
+                align=bool(entry.get("align", False)),
+                deadband=_thresholds(entry.get("deadband"), name, "deadband", members),
+                rate_trigger=_thresholds(entry.get("rate_trigger"), name, "rate_trigger", members),
+                heartbeat=_number(entry.get("heartbeat"), None, 0.0),
+            )
+        )
+    if not specs:
+        log("SYSTEM", "ningún topic válido en config.json; uso el topic único 'sensors'", "WARN")
+        return legacy_topics(sensors)
+    return specs
+
+
+def load_topics(sensors: Sequence[str], config: Dict[str, Any]) -> List[TopicSpec]:
+    """Read ``topics`` from the parsed config.json, falling back to the legacy single topic.
+
+    Without ``topics``, top-level ``window_stats`` and ``align`` flags apply
+    to that topic.
+    """
+    if "topics" not in config:
+        return legacy_topics(
+            sensors,
+            window_stats=bool(config.get("window_stats", False)),
+            align=bool(config.get("align", False)),
+        )
+    return parse_topics(config["topics"], sensors)